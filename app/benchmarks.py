@@ -0,0 +1,247 @@
+"""
+Benchmarks repetiveis das telas principais (comando 'run_benchmarks').
+
+Para cada escala (tickers x anos), o banco e esvaziado, uma carteira
+sintetica (app/synthetic.py) e importada pelo comando 'import_fiis' (etapa
+'import') e as views sao requisitadas com o Client de testes, logado:
+
+- cold: caches vazios antes de cada repeticao (pior caso, recalcula tudo);
+- warm: caches preenchidos pela repeticao anterior.
+
+De cada etapa sao guardados o minimo, a mediana e a media em milissegundos
+e o numero de queries da requisicao fria. As APIs externas (BrAPI e
+BrasilAPI) ficam desligadas, para que apenas o codigo da aplicacao seja
+medido. O resultado e um dict serializavel em JSON, comparavel entre
+commits com compare().
+"""
+import io
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from services.fees_br import GetFeeBr
+from services.get_ticker_details import Get_ticker_data
+from tickers.models import Ticker
+from . import synthetic
+from .dashboard import DashboardSnapshot
+from .metrics_cache import local_cache
+
+DEFAULT_SCALES = ((10, 2), (50, 5), (200, 10))
+DEFAULT_REPEAT = 5
+
+
+def parse_scale(value):
+    """
+    Converte 'TICKERSxANOS' (ex: 50x5) em (tickers, anos).
+
+    Raises:
+        ValueError: Se o formato ou os valores forem invalidos
+    """
+    tickers, _, years = value.lower().partition("x")
+    tickers, years = int(tickers), int(years)
+    if tickers <= 0 or years <= 0:
+        raise ValueError(f"Escala '{value}' invalida.")
+    return tickers, years
+
+
+def benchmark_urls():
+    """Etapa -> URLs requisitadas, sobre a carteira atual do banco."""
+    ticker = Ticker.objects.filter(category__title="FII").order_by("name").first()
+    return {
+        "dashboard": [reverse("home")] + [
+            reverse("dashboard_series", args=[series]) for series in DashboardSnapshot.SERIES
+        ],
+        "negociations": [reverse("negociations")],
+        "ticker_list": [reverse("ticker_list", args=["FII"])],
+        "ticker_detail": [reverse("ticker_details", args=["FII", ticker.pk])],
+        "dividend_list": [reverse("dividend_list")],
+    }
+
+
+@contextmanager
+def offline_services():
+    """Desliga as chamadas HTTP da BrAPI e da BrasilAPI (respostas vazias)."""
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(GetFeeBr, "_request_taxa", return_value=None))
+        stack.enter_context(mock.patch.object(Get_ticker_data, "_request_quotes", return_value=None))
+        stack.enter_context(mock.patch.object(Get_ticker_data, "get_ticker_dividends", return_value=None))
+        yield
+
+
+def clear_caches():
+    cache.clear()
+    local_cache.clear()
+
+
+def summarize(samples):
+    return dict(
+        min=round(min(samples), 3),
+        median=round(statistics.median(samples), 3),
+        mean=round(statistics.fmean(samples), 3),
+    )
+
+
+def time_urls(client, urls, repeat):
+    """
+    Tempo (ms) para requisitar todas as 'urls', com caches frios e quentes.
+
+    Returns:
+        dict: cold e warm (min, median e mean) e queries da requisicao fria
+    """
+    cold, warm = [], []
+    queries = 0
+    for _ in range(repeat):
+        clear_caches()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            for url in urls:
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} retornou {response.status_code}")
+            cold.append((time.perf_counter() - started) * 1000)
+        queries = len(captured)
+
+        started = time.perf_counter()
+        for url in urls:
+            client.get(url)
+        warm.append((time.perf_counter() - started) * 1000)
+    return dict(cold=summarize(cold), warm=summarize(warm), queries=queries)
+
+
+def time_import(trades):
+    """Tempo (ms) do comando 'import_fiis' sobre as negociacoes gravadas em CSV."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trades.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            synthetic.write_trades_csv(file, trades)
+        started = time.perf_counter()
+        call_command("import_fiis", path, stdout=io.StringIO(), stderr=io.StringIO())
+        elapsed = (time.perf_counter() - started) * 1000
+    return dict(ms=round(elapsed, 3), rows=len(trades))
+
+
+def run_scale(tickers, years, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Gera e importa a carteira de uma escala e mede cada etapa.
+
+    O banco deve estar vazio (ver run_benchmarks).
+
+    Returns:
+        dict: tickers, years, rows (negociacoes e dividendos) e results
+        (etapa -> medicoes)
+    """
+    created = synthetic.create_tickers(tickers)
+    trades, dividends = synthetic.ledger(created, years, seed)
+    results = {"import": time_import(trades)}
+    synthetic.save_dividends(dividends)
+
+    user = get_user_model().objects.create_user(username="benchmark", is_staff=True)
+    client = Client()
+    client.force_login(user)
+    with offline_services():
+        for name, urls in benchmark_urls().items():
+            results[name] = time_urls(client, urls, repeat)
+
+    return dict(
+        tickers=tickers,
+        years=years,
+        rows=dict(trades=len(trades), dividends=len(dividends)),
+        results=results,
+    )
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, seed=0, progress=None):
+    """
+    Roda todas as escalas, esvaziando o banco (flush) antes de cada uma.
+
+    Deve ser chamada sobre um banco descartavel: o comando 'run_benchmarks'
+    cria um banco de testes para isso.
+
+    Args:
+        scales: Pares (tickers, anos)
+        repeat: Repeticoes de cada etapa
+        seed: Semente do gerador da carteira
+        progress: Funcao chamada com uma mensagem ao fim de cada escala
+
+    Returns:
+        dict: Ambiente (commit, versoes, banco) e resultados por escala
+    """
+    report = dict(
+        created_at=timezone.now().isoformat(timespec="seconds"),
+        commit=git_commit(),
+        python=platform.python_version(),
+        django=django.get_version(),
+        database=connection.vendor,
+        repeat=repeat,
+        seed=seed,
+        scales=[],
+    )
+    # Os logs por requisicao distorcem as medicoes e poluem a saida
+    logging.disable(logging.INFO)
+    try:
+        for tickers, years in scales:
+            call_command("flush", interactive=False, verbosity=0)
+            clear_caches()
+            started = time.perf_counter()
+            report["scales"].append(run_scale(tickers, years, repeat, seed))
+            if progress:
+                progress(f"{tickers}x{years}: {time.perf_counter() - started:.1f}s")
+    finally:
+        logging.disable(logging.NOTSET)
+    return report
+
+
+def git_commit():
+    """Commit atual do repositorio (None fora de um checkout do git)."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(baseline, report):
+    """
+    Variacao da mediana de cada etapa em relacao a um relatorio anterior.
+
+    Returns:
+        list: (escala, etapa, mediana anterior, mediana atual, variacao em %),
+        apenas para as escalas e etapas presentes nos dois relatorios
+    """
+    previous = {(scale["tickers"], scale["years"]): scale["results"] for scale in baseline["scales"]}
+    rows = []
+    for scale in report["scales"]:
+        before = previous.get((scale["tickers"], scale["years"]))
+        if before is None:
+            continue
+        for name, result in scale["results"].items():
+            if name not in before:
+                continue
+            old, new = _median(before[name]), _median(result)
+            change = round(100 * (new - old) / old, 1) if old else None
+            rows.append((f"{scale['tickers']}x{scale['years']}", name, old, new, change))
+    return rows
+
+
+def _median(result):
+    """Mediana fria das views ou tempo total da importacao."""
+    return result["cold"]["median"] if "cold" in result else result["ms"]
@@ -0,0 +1,203 @@
+"""
+Snapshot consolidado do dashboard.
+
+Todas as series exibidas em 'home' sao calculadas em poucas queries
+agrupadas e guardadas em uma unica entrada de cache versionada. Os graficos
+leem cada serie pela API (app.views.dashboard_series), com ETag derivado da
+mesma chave versionada.
+"""
+import hashlib
+from collections import defaultdict
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from brokers.fx import get_fx_series
+from dividends.models import Dividend
+from inflows.models import Inflow
+from . import metrics
+from .valuation import convert_total
+
+MONTH_LABELS = ["0", "Jan", "Fev", "Mar", "Abr", "Maio",
+                "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+class DashboardSnapshot:
+    """
+    Conjunto de series do dashboard.
+
+    Use DashboardSnapshot.get() para ler do cache ou construir o snapshot em
+    caso de miss. A chave embute as geracoes dos escopos de metricas, entao
+    qualquer invalidacao relevante (ver app.metrics) gera uma chave nova.
+    Alterar o formato dos dados exige incrementar VERSION, para que entradas
+    antigas sejam ignoradas.
+    """
+    VERSION = 3
+    CACHE_KEY = f"dashboard_snapshot_v{VERSION}"
+    SCOPES = (
+        metrics.SCOPE_INFLOWS, metrics.SCOPE_POSITIONS, metrics.SCOPE_DIVIDENDS,
+        metrics.SCOPE_TICKERS, metrics.SCOPE_FX, metrics.SCOPE_DASHBOARD,
+    )
+    # Series expostas pela API do dashboard
+    SERIES = ("categories", "currencies", "brokers", "applied", "dividends")
+
+    def __init__(self, total_invested, applied_by_currency, applied_by_month,
+                 category_invested, broker_invested, dividends_by_category, last_six_months,
+                 unconverted_currencies=()):
+        self.total_invested = total_invested
+        self.applied_by_currency = applied_by_currency
+        self.applied_by_month = applied_by_month
+        self.category_invested = category_invested
+        self.broker_invested = broker_invested
+        self.dividends_by_category = dividends_by_category
+        self.last_six_months = last_six_months
+        # Moedas sem cotacao: somadas ao total sem conversao
+        self.unconverted_currencies = list(unconverted_currencies)
+
+    @classmethod
+    def get(cls):
+        """
+        Retorna o snapshot em cache ou o constroi e armazena.
+        """
+        data = metrics.get_or_compute(cls.base_key(), cls.SCOPES, cls.build_data)
+        return cls(**data)
+
+    @classmethod
+    def base_key(cls):
+        """Chave sem geracoes (inclui o mes inicial da janela de dividendos)."""
+        return f"{cls.CACHE_KEY}_{metrics.dividend_window_start():%Y%m}"
+
+    @classmethod
+    def cache_key(cls):
+        """Chave atual do snapshot no cache."""
+        return metrics.versioned_key(cls.base_key(), *cls.SCOPES)
+
+    @classmethod
+    def etag(cls, name, currency=None):
+        """
+        ETag de uma serie: muda sempre que a chave versionada do snapshot
+        muda, sem precisar ler o snapshot.
+        """
+        value = f"{cls.cache_key()}:{name}:{currency or ''}"
+        return hashlib.md5(value.encode()).hexdigest()
+
+    @classmethod
+    def invalidate(cls):
+        metrics.bump_generations([metrics.SCOPE_DASHBOARD])
+
+    @classmethod
+    def build_data(cls):
+        """
+        Calcula todas as series do dashboard.
+
+        Aportes por moeda/dia, corretoras, categorias e dividendos por
+        categoria/mes: quatro queries agrupadas, mais a leitura das series de
+        cambio quando nao estao em cache.
+        """
+        today = timezone.now().date()
+        dates = [(today.replace(day=1) - relativedelta(months=i)) for i in range(metrics.DIVIDEND_WINDOW_MONTHS, -1, -1)]
+
+        # Aportes agrupados por moeda e dia: origem do total (convertido pela
+        # cotacao de cada dia), da divisao por moeda e da serie mensal
+        applied_rows = (
+            Inflow.objects
+            .order_by("date")
+            .values("ticker__currency__code", "date")
+            .annotate(total_price=Sum("total_price"))
+            .values_list("ticker__currency__code", "date", "total_price")
+        )
+        applied_rows = [(code, day, total or 0) for code, day, total in applied_rows]
+        fx = get_fx_series()
+        total_invested = convert_total(applied_rows, settings.BASE_CURRENCY, fx)
+        unconverted_currencies = fx.missing({code for code, _, _ in applied_rows} | {settings.BASE_CURRENCY})
+
+        applied_by_currency = defaultdict(float)
+        applied_by_month = defaultdict(dict)
+        for code, day, total in applied_rows:
+            value = float(total)
+            applied_by_currency[code] += value
+            months = applied_by_month[code]
+            months[(day.year, day.month)] = months.get((day.year, day.month), 0.0) + value
+
+        broker_rows = (
+            Inflow.objects
+            .order_by()
+            .values("broker__name")
+            .annotate(total_price=Sum("total_price"))
+        )
+        broker_invested = {
+            item["broker__name"]: float(item["total_price"] or 0)
+            for item in broker_rows
+            if item["broker__name"]
+        }
+
+        month_keys = [(d.year, d.month) for d in dates]
+        dividend_rows = (
+            Dividend.objects
+            .filter(date__range=[dates[0], today])
+            .order_by()
+            .values("ticker__category__title", "date__year", "date__month")
+            .annotate(total=Sum("total_value"))
+        )
+        dividends_by_month = defaultdict(lambda: dict.fromkeys(month_keys, 0.0))
+        for item in dividend_rows:
+            key = (item["date__year"], item["date__month"])
+            months = dividends_by_month[item["ticker__category__title"]]
+            if key in months:
+                months[key] += float(item["total"] or 0)
+
+        return dict(
+            total_invested=round(total_invested, 2),
+            applied_by_currency=dict(applied_by_currency),
+            applied_by_month={
+                code: dict(
+                    labels=[f"{MONTH_LABELS[month]} {year}" for year, month in months],
+                    values=list(months.values()),
+                )
+                for code, months in applied_by_month.items()
+            },
+            category_invested=metrics.chart_total_category_invested(),
+            broker_invested=broker_invested,
+            dividends_by_category={
+                category: dict(values=list(months.values()))
+                for category, months in dividends_by_month.items()
+            },
+            last_six_months=dict(labels=[d.strftime("%b %Y") for d in dates]),
+            unconverted_currencies=unconverted_currencies,
+        )
+
+    def applied_value(self, currency_code):
+        """Serie mensal de aportes na moeda, no formato de get_applied_value."""
+        return self.applied_by_month.get(currency_code, dict(labels=[], values=[]))
+
+    def dividends_category(self, category):
+        """Dividendos dos ultimos meses na categoria, no formato de get_total_dividends_category."""
+        default = dict(values=[0] * len(self.last_six_months["labels"]))
+        return self.dividends_by_category.get(category, default)
+
+    def series(self, name, currency=None):
+        """
+        Dados de uma serie da API do dashboard.
+
+        Args:
+            name: Uma das series em SERIES
+            currency: Moeda da serie 'applied' (BASE_CURRENCY por padrao)
+
+        Raises:
+            KeyError: Se a serie nao existir
+        """
+        if name == "categories":
+            return self.category_invested
+        if name == "currencies":
+            return self.applied_by_currency
+        if name == "brokers":
+            return self.broker_invested
+        if name == "applied":
+            return self.applied_value(currency or settings.BASE_CURRENCY)
+        if name == "dividends":
+            return dict(
+                labels=self.last_six_months["labels"],
+                categories={category: data["values"] for category, data in self.dividends_by_category.items()},
+            )
+        raise KeyError(name)
@@ -0,0 +1,202 @@
+"""
+Exportacao do extrato (compras, vendas e dividendos) em CSV ou XLSX.
+
+As linhas sao lidas com values_list + iterator(chunk_size) e escritas de
+forma incremental: nem a resposta (StreamingHttpResponse) nem o comando
+'export_ledger' guardam o extrato inteiro em memoria. O XLSX e gerado apenas
+com a biblioteca padrao (zipfile gravando em um buffer que e esvaziado a
+cada lote, celulas com strings inline).
+"""
+import csv
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+
+from dividends.filters import filter_dividends
+from dividends.models import Dividend
+from inflows.filters import filter_trades
+from inflows.models import Inflow
+from outflows.models import Outflow
+
+CHUNK_SIZE = 2000
+
+TRADE_COLUMNS = (
+    ("date", "Data"),
+    ("ticker__name", "Ticker"),
+    ("ticker__category__title", "Categoria"),
+    ("ticker__currency__code", "Moeda"),
+    ("broker__name", "Corretora"),
+    ("quantity", "Quantidade"),
+    ("cost_price", "Preco"),
+    ("tax", "Taxas"),
+    ("total_price", "Total"),
+)
+DIVIDEND_COLUMNS = (
+    ("date", "Data"),
+    ("ticker__name", "Ticker"),
+    ("ticker__category__title", "Categoria"),
+    ("currency", "Moeda"),
+    ("income_type", "Tipo"),
+    ("value", "Valor por Cota"),
+    ("quantity_quote", "Quantidade"),
+    ("total_value", "Total"),
+)
+
+# Conjunto exportado -> (modelo, filtros da listagem correspondente, colunas)
+DATASETS = {
+    "inflows": (Inflow, filter_trades, TRADE_COLUMNS),
+    "outflows": (Outflow, filter_trades, TRADE_COLUMNS),
+    "dividends": (Dividend, filter_dividends, DIVIDEND_COLUMNS),
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def export_rows(dataset, params=None):
+    """
+    Cabecalho e linhas (iterador) do conjunto, com os filtros da listagem.
+
+    Raises:
+        KeyError: Se o conjunto nao existir
+        Http404: Se algum filtro for invalido
+    """
+    model, apply_filters, columns = DATASETS[dataset]
+    queryset = apply_filters(model.objects.order_by("date", "id"), params or {})
+    fields, header = zip(*columns)
+    return header, queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+class Echo:
+    """Pseudo-arquivo que devolve o que recebe, para o csv.writer em streaming."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(header, rows):
+    """Gera o CSV linha a linha (str)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class ZipBuffer:
+    """Destino do zipfile sem seek: acumula os bytes ate serem drenados."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = (
+    ("[Content_Types].xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ("_rels/.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ("xl/workbook.xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Extrato" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ("xl/_rels/workbook.xml.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, date):
+        value = value.isoformat()
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def xlsx_stream(header, rows):
+    """Gera o XLSX (bytes) em partes, uma por lote de CHUNK_SIZE linhas."""
+    buffer = ZipBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS:
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            lines = [header]
+            for count, row in enumerate(rows, start=1):
+                lines.append(row)
+                if count % CHUNK_SIZE == 0:
+                    sheet.write(_xlsx_rows(lines))
+                    lines = []
+                    yield buffer.drain()
+            sheet.write(_xlsx_rows(lines))
+            sheet.write(SHEET_TAIL.encode())
+    yield buffer.drain()
+
+
+def _xlsx_rows(rows):
+    return "".join(f"<row>{''.join(xlsx_cell(value) for value in row)}</row>" for row in rows).encode()
+
+
+STREAMS = {"csv": csv_stream, "xlsx": xlsx_stream}
+
+
+def export_stream(dataset, file_format, params=None):
+    """
+    Conteudo do arquivo exportado, em partes.
+
+    Raises:
+        KeyError: Se o conjunto ou o formato nao existirem
+        Http404: Se algum filtro for invalido
+    """
+    stream = STREAMS[file_format]
+    return stream(*export_rows(dataset, params))
+
+
+def streaming_response(dataset, file_format, params=None):
+    """StreamingHttpResponse com o extrato, para download."""
+    response = StreamingHttpResponse(
+        export_stream(dataset, file_format, params), content_type=CONTENT_TYPES[file_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{dataset}_{date.today():%Y%m%d}.{file_format}"'
+    return response
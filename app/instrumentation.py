@@ -0,0 +1,268 @@
+"""
+Instrumentacao das requisicoes: queries SQL, cache, APIs externas e latencia.
+
+O RequestMetricsMiddleware abre um RequestMetrics por requisicao (guardado
+em um ContextVar) e, ao final, registra uma linha de log estruturada no
+logger 'app.requests' e acumula os valores por view no registro do processo,
+exposto em formato texto do Prometheus pela view 'prometheus_metrics'.
+
+- SQL: connection.execute_wrapper conta e cronometra cada query;
+- cache: get_or_compute (metrics_cache) chama record_cache a cada acerto ou
+  falha do cache de metricas;
+- APIs externas: os servicos (BrAPI e BrasilAPI) envolvem as chamadas HTTP
+  em external_call.
+
+Fora de uma requisicao (comandos, threads em segundo plano) nada e
+registrado. O conteudo de uma StreamingHttpResponse e gerado depois que o
+middleware retorna, entao as queries da exportacao nao entram na contagem.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('app.requests')
+
+# Limites (em segundos) dos buckets do histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Requisicoes mais lentas que isso sao registradas como WARNING
+SLOW_REQUEST_MS = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 1000)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Valores medidos durante uma requisicao."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # servico -> [chamadas, segundos]
+        self.external = {}
+        self._lock = threading.Lock()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.sql_time += elapsed
+
+    def add_cache(self, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def add_external(self, service, seconds):
+        with self._lock:
+            calls = self.external.setdefault(service, [0, 0.0])
+            calls[0] += 1
+            calls[1] += seconds
+
+    @property
+    def external_time(self):
+        return sum(seconds for _, seconds in self.external.values())
+
+
+def current_metrics():
+    """RequestMetrics da requisicao em andamento (None fora de uma requisicao)."""
+    return _current.get()
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_cache(hit)
+
+
+@contextmanager
+def external_call(service):
+    """Cronometra uma chamada a uma API externa ('brapi', 'brasilapi')."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_external(service, time.perf_counter() - started)
+
+
+@contextmanager
+def track_queries(metrics):
+    """Registra em 'metrics' as queries de todas as conexoes do bloco."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+        yield metrics
+
+
+class MetricsRegistry:
+    """Contadores e histograma de latencia por view, acumulados no processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.views = {}
+            self.external = {}
+
+    def observe(self, view, method, status, duration, metrics):
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            entry = self.views.get(view)
+            if entry is None:
+                entry = self.views[view] = dict(
+                    buckets=[0] * len(LATENCY_BUCKETS), count=0, duration=0.0,
+                    queries=0, sql_time=0.0, cache_hits=0, cache_misses=0,
+                )
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    entry["buckets"][index] += 1
+            entry["count"] += 1
+            entry["duration"] += duration
+            entry["queries"] += metrics.queries
+            entry["sql_time"] += metrics.sql_time
+            entry["cache_hits"] += metrics.cache_hits
+            entry["cache_misses"] += metrics.cache_misses
+
+            for service, (calls, seconds) in metrics.external.items():
+                totals = self.external.setdefault((view, service), [0, 0.0])
+                totals[0] += calls
+                totals[1] += seconds
+
+    def render(self):
+        """Texto no formato de exposicao do Prometheus (versao 0.0.4)."""
+        from .metrics_cache import cache_stats
+
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        with self._lock:
+            views = sorted(self.views.items())
+            family(
+                "investsio_http_requests_total", "counter", "Requisicoes atendidas por view, metodo e status.",
+                [(dict(view=view, method=method, status=status), count)
+                 for (view, method, status), count in sorted(self.requests.items())],
+            )
+
+            lines.append("# HELP investsio_http_request_duration_seconds Latencia das requisicoes por view.")
+            lines.append("# TYPE investsio_http_request_duration_seconds histogram")
+            for view, entry in views:
+                for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+                    labels = _labels(dict(view=view, le=_number(bound)))
+                    lines.append(f"investsio_http_request_duration_seconds_bucket{labels} {count}")
+                labels = _labels(dict(view=view, le="+Inf"))
+                lines.append(f"investsio_http_request_duration_seconds_bucket{labels} {entry['count']}")
+                lines.append(f"investsio_http_request_duration_seconds_sum{_labels(dict(view=view))} {_number(entry['duration'])}")
+                lines.append(f"investsio_http_request_duration_seconds_count{_labels(dict(view=view))} {entry['count']}")
+
+            for name, field, help_text in (
+                ("investsio_sql_queries_total", "queries", "Queries SQL executadas por view."),
+                ("investsio_sql_duration_seconds_total", "sql_time", "Tempo gasto em queries SQL por view."),
+                ("investsio_cache_hits_total", "cache_hits", "Acertos do cache de metricas por view."),
+                ("investsio_cache_misses_total", "cache_misses", "Falhas do cache de metricas por view."),
+            ):
+                family(name, "counter", help_text, [(dict(view=view), entry[field]) for view, entry in views])
+
+            external = sorted(self.external.items())
+            family(
+                "investsio_external_requests_total", "counter", "Chamadas a APIs externas por view e servico.",
+                [(dict(view=view, service=service), calls) for (view, service), (calls, _) in external],
+            )
+            family(
+                "investsio_external_duration_seconds_total", "counter", "Tempo gasto em APIs externas por view e servico.",
+                [(dict(view=view, service=service), seconds) for (view, service), (_, seconds) in external],
+            )
+
+        family(
+            "investsio_metrics_cache_lookups_total", "counter", "Consultas ao cache de metricas por nivel e resultado.",
+            [(dict(level=name.split("_")[0], result=name.split("_")[1]), count)
+             for name, count in sorted(cache_stats().items())],
+        )
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Mede cada requisicao: queries e tempo de SQL, acertos e falhas do cache
+    de metricas, chamadas a APIs externas e latencia total.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with track_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        view = view_name(request)
+        registry.observe(view, request.method, response.status_code, duration, metrics)
+        self.log(request, view, response.status_code, duration, metrics)
+        return response
+
+    def log(self, request, view, status, duration, metrics):
+        fields = dict(
+            view=view,
+            method=request.method,
+            path=request.path,
+            status=status,
+            duration_ms=round(duration * 1000, 2),
+            queries=metrics.queries,
+            sql_ms=round(metrics.sql_time * 1000, 2),
+            cache_hits=metrics.cache_hits,
+            cache_misses=metrics.cache_misses,
+            external_ms=round(metrics.external_time * 1000, 2),
+        )
+        level = logging.WARNING if fields["duration_ms"] > SLOW_REQUEST_MS else logging.INFO
+        logger.log(level, "request %s", json.dumps(fields), extra={"request_metrics": fields})
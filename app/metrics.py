@@ -1,51 +1,53 @@
-from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
 from django.utils.formats import number_format
 from dateutil.relativedelta import relativedelta
-from django.db.models import Sum
+from django.db.models import Count, Sum
 from collections import defaultdict
+from decimal import Decimal
 
 from categories.models import Category
 from inflows.models import Inflow
-from outflows.models import Outflow
 from dividends.models import Dividend
 from brokers.models import Broker, Currency
-from tickers.models import Ticker
+from tickers.models import Position, Ticker
+from tickers.positions import position_as_of
+from .metrics_cache import (  # noqa: F401
+    CACHE_TTL, SCOPE_ALL, SCOPE_DASHBOARD, SCOPE_DIVIDENDS, SCOPE_FX, SCOPE_INFLOWS, SCOPE_POSITIONS, SCOPE_TICKERS,
+    bump_generations, bump_generations_on_commit, cache_stats, cached_metric, category_scope, currency_scope,
+    get_or_compute, versioned_key,
+)
+from .valuation import get_total_invested_in
 
-# Cache timeout settings
-CACHE_TTL = getattr(settings, 'CACHE_TTL_MEDIUM', 300)  # 5 minutos por padrao
+# Meses exibidos nas series de dividendos (mes atual + 6 anteriores)
+DIVIDEND_WINDOW_MONTHS = 6
+
+
+def dividend_window_start(today=None):
+    """Primeiro dia do mes mais antigo exibido nas series de dividendos."""
+    today = today or timezone.now().date()
+    return today.replace(day=1) - relativedelta(months=DIVIDEND_WINDOW_MONTHS)
 
 
 def get_ticker_metrics(ticker, target_date=None):
     """
     Recebe como argumento um ticker do banco de dados
     e retorna metricas como: total investido, total de cotas, e preco medio.
-    """
-    inflows = Inflow.objects.filter(ticker=ticker)
-    outflows = Outflow.objects.filter(ticker=ticker)
-
-    if target_date:
-        inflows = inflows.filter(date__lte=target_date)
-        outflows = outflows.filter(date__lte=target_date)
-
-    # Aggregate in single query each
-    inflow_totals = inflows.aggregate(
-        total_price=Sum("total_price"),
-        total_quantity=Sum("quantity")
-    )
-    outflow_totals = outflows.aggregate(
-        total_price=Sum("total_price"),
-        total_quantity=Sum("quantity")
-    )
-
-    total_price_inflow = inflow_totals["total_price"] or 0
-    total_price_outflow = outflow_totals["total_price"] or 0
-    total_price = total_price_inflow - total_price_outflow
 
-    total_inflow = inflow_totals["total_quantity"] or 0
-    total_outflow = outflow_totals["total_quantity"] or 0
-    total_quantity = total_inflow - total_outflow
+    Sem target_date a leitura e feita na tabela de posicoes; com target_date,
+    no historico acumulado (PositionHistory). Uma query em ambos os casos.
+    """
+    if target_date is None:
+        position_totals = Position.objects.filter(ticker=ticker).aggregate(
+            total_price=Sum("cost_basis"),
+            total_quantity=Sum("quantity")
+        )
+        total_price = position_totals["total_price"] or 0
+        total_quantity = position_totals["total_quantity"] or 0
+    else:
+        position = position_as_of(ticker, target_date)
+        total_price = position["cost_basis"]
+        total_quantity = position["quantity"]
 
     avarange_price = total_price / total_quantity if total_quantity else 0
 
@@ -56,84 +58,72 @@ def get_ticker_metrics(ticker, target_date=None):
     )
 
 
-def get_total_category_invested(category):
+@cached_metric('category_totals', SCOPE_POSITIONS, SCOPE_TICKERS)
+def get_category_totals():
     """
-    Recebe como argumento a categoria de investimento, e
-    usando a function get_ticker_metrics() para auxiliar no calculo,
-    nos retorna o total investido atualmente.
+    Retorna, em uma unica query agrupada, o total investido (Decimal) e o
+    numero de tickers de todas as categorias.
+    A formatacao para exibicao fica a cargo de quem consome o resultado.
     """
-    cache_key = f'category_invested_{category}'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
+    categories = (
+        Category.objects
+        .order_by()
+        .annotate(
+            total=Sum('tickers__positions__cost_basis'),
+            amount=Count('tickers', distinct=True)
+        )
+        .values('title', 'total', 'amount')
+    )
 
-    category_obj = Category.objects.get(title=category)
-    tickers = Ticker.objects.filter(category=category_obj).only('id', 'name')
+    return {
+        item['title']: dict(
+            total_invested=item['total'] or Decimal('0'),
+            amount_ticker_by_category=item['amount']
+        )
+        for item in categories
+    }
 
-    amount_ticker_by_category = tickers.count()
-    total_invested = sum(
-        get_ticker_metrics(ticker)["total_price"] for ticker in tickers
-    )
 
-    result = dict(
-        total_invested=number_format(total_invested, decimal_pos=2, force_grouping=True),
-        amount_ticker_by_category=amount_ticker_by_category
+def get_total_category_invested(category):
+    """
+    Recebe como argumento a categoria de investimento e nos retorna o total
+    investido atualmente, ja formatado para exibicao.
+    """
+    totals = get_category_totals().get(category)
+    if totals is None:
+        totals = dict(total_invested=Decimal('0'), amount_ticker_by_category=0)
+
+    return dict(
+        total_invested=number_format(totals['total_invested'], decimal_pos=2, force_grouping=True),
+        amount_ticker_by_category=totals['amount_ticker_by_category']
     )
-    cache.set(cache_key, result, CACHE_TTL)
-    return result
 
 
 def chart_total_category_invested():
     """
-    Essa funcao se utiliza da funcao 'get_total_category_invested', para nos retornar em um dicionario
-    a categoria do ativos e o total investido.
+    Retorna em um dicionario a categoria do ativos e o total investido,
+    a partir dos valores brutos de 'get_category_totals'.
     Tendo como principal objetivo alimentar graficos chartjs.
     """
-    cache_key = 'chart_category_invested'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
-    categories = Category.objects.all().only('id', 'title')
-    data = {
-        category.title: get_total_category_invested(category.title)["total_invested"]
-        for category in categories
+    return {
+        title: float(totals['total_invested'])
+        for title, totals in get_category_totals().items()
     }
-    json_data = {
-        key: float(value.replace(".", "").replace(",", "."))
-        for key, value in data.items()
-    }
-    cache.set(cache_key, json_data, CACHE_TTL)
-    return json_data
 
 
-def get_total_invested():
+def get_total_invested(base_currency=None):
     """
-    Nos retorna o total investido.
+    Nos retorna o total investido na moeda base (BASE_CURRENCY por padrao),
+    com cada compra convertida pela cotacao da sua data.
     """
-    cache_key = 'total_invested'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
-    total_inflow = Inflow.objects.aggregate(
-        total=Sum("total_price")
-    )["total"] or 0
-
-    result = round(float(total_inflow), 2)
-    cache.set(cache_key, result, CACHE_TTL)
-    return result
+    return get_total_invested_in(base_currency or settings.BASE_CURRENCY)
 
 
+@cached_metric('total_applied_by_currency', SCOPE_INFLOWS, SCOPE_TICKERS)
 def get_total_applied_by_currency():
     """
     Retorna o total aplicado em cada moeda. Principal objetivo alimentar o grafico chartjs.
     """
-    cache_key = 'total_applied_by_currency'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
     # Single query with annotation instead of N queries
     currency_totals = Inflow.objects.values(
         'ticker__currency__code'
@@ -141,26 +131,19 @@ def get_total_applied_by_currency():
         total_price=Sum("total_price")
     )
 
-    chart_currency_data = {
+    return {
         item['ticker__currency__code']: float(item['total_price'] or 0)
         for item in currency_totals
         if item['ticker__currency__code']
     }
 
-    cache.set(cache_key, chart_currency_data, CACHE_TTL)
-    return chart_currency_data
-
 
+@cached_metric('applied_value_{0}', currency_scope('{0}'))
 def get_applied_value(currency_code):
     """
     Nos retona o volume mensal aplicado em cada moeda. Necessitando de um argumento que no caso e o codigo
     da moeda ja cadastrada pelo usuario.
     """
-    cache_key = f'applied_value_{currency_code}'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
     months = ["0", "Jan", "Fev", "Mar", "Abr", "Maio",
               "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
 
@@ -180,12 +163,10 @@ def get_applied_value(currency_code):
         labels.append(f"{month} {year}")
         values.append(float(item["total_price"] or 0))
 
-    result = dict(
+    return dict(
         labels=labels,
         values=values
     )
-    cache.set(cache_key, result, CACHE_TTL)
-    return result
 
 
 def get_last_six_month():
@@ -198,17 +179,17 @@ def get_last_six_month():
     return dict(labels=labels)
 
 
+# A janela de meses faz parte da chave: virar o mes gera uma chave nova
+@cached_metric(
+    lambda category: f'dividends_category_{category}_{dividend_window_start():%Y%m}',
+    category_scope('{0}'),
+)
 def get_total_dividends_category(category):
     """
     Retorna o total de dividendos por categoria nos ultimos 6 meses.
     """
-    cache_key = f'dividends_category_{category}'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
     today = timezone.now().date()
-    dates = [(today.replace(day=1) - relativedelta(months=i)) for i in range(6, -1, -1)]
+    dates = [(today.replace(day=1) - relativedelta(months=i)) for i in range(DIVIDEND_WINDOW_MONTHS, -1, -1)]
     months = {d.strftime("%m-%Y"): 0 for d in dates}
 
     # Single query with join instead of multiple queries
@@ -229,9 +210,7 @@ def get_total_dividends_category(category):
 
     values = [months[d.strftime("%m-%Y")] for d in dates]
 
-    result = dict(values=values)
-    cache.set(cache_key, result, CACHE_TTL)
-    return result
+    return dict(values=values)
 
 
 def get_currency(currency):
@@ -255,15 +234,11 @@ def get_currency(currency):
     return dict(dividends_dict)
 
 
+@cached_metric('total_applied_by_broker', SCOPE_INFLOWS)
 def get_total_applied_by_broker():
     """
     Retorna o total aplicado por corretora.
     """
-    cache_key = 'total_applied_by_broker'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
-
     # Single query with annotation instead of N queries
     broker_totals = (
         Inflow.objects
@@ -271,37 +246,57 @@ def get_total_applied_by_broker():
         .annotate(total_price=Sum("total_price"))
     )
 
-    total_in_broker = {
+    return {
         item['broker__name']: float(item['total_price'] or 0)
         for item in broker_totals
         if item['broker__name']
     }
 
-    cache.set(cache_key, total_in_broker, CACHE_TTL)
-    return total_in_broker
-
 
 def invalidate_metrics_cache():
     """
-    Invalida todos os caches de metricas.
-    Deve ser chamada apos criar/atualizar/deletar Inflows, Outflows ou Dividends.
+    Invalida todos os caches de metricas de uma vez (O(1), pelo escopo global).
+    Usada apos gravacoes em lote que nao disparam signals (ex: bulk_create).
+    """
+    bump_generations([SCOPE_ALL])
+
+
+def invalidate_trade_metrics(ticker_ids, inflow=True):
+    """
+    Invalida as metricas afetadas por compras (inflow=True) ou vendas dos
+    tickers informados. Chamada pelos signals de Inflow e Outflow.
+    """
+    scopes = {SCOPE_POSITIONS}
+    if inflow:
+        scopes.add(SCOPE_INFLOWS)
+        codes = Ticker.objects.filter(id__in=ticker_ids).values_list('currency__code', flat=True)
+        scopes.update(currency_scope(code) for code in codes)
+    bump_generations_on_commit(scopes)
+
+
+def invalidate_dividend_metrics(ticker_ids, dates):
+    """
+    Invalida as metricas de dividendos das categorias dos tickers, apenas se
+    alguma das datas cair na janela exibida no dashboard.
+    """
+    window_start = dividend_window_start()
+    if not any(d and d >= window_start for d in dates):
+        return
+
+    titles = Ticker.objects.filter(id__in=ticker_ids).values_list('category__title', flat=True)
+    scopes = {SCOPE_DIVIDENDS}
+    scopes.update(category_scope(title) for title in titles)
+    bump_generations_on_commit(scopes)
+
+
+def invalidate_ticker_metrics(category_ids, currency_ids):
+    """
+    Invalida as metricas agrupadas por categoria ou moeda quando um ticker e
+    criado, removido ou muda de categoria/moeda.
     """
-    cache_keys = [
-        'total_invested',
-        'total_applied_by_currency',
-        'total_applied_by_broker',
-        'chart_category_invested',
-    ]
-
-    # Invalida caches baseados em categoria
-    categories = Category.objects.values_list('title', flat=True)
-    for category in categories:
-        cache_keys.append(f'category_invested_{category}')
-        cache_keys.append(f'dividends_category_{category}')
-
-    # Invalida caches baseados em moeda
-    currencies = ['BRL', 'USD', 'EUR']
-    for currency in currencies:
-        cache_keys.append(f'applied_value_{currency}')
-
-    cache.delete_many(cache_keys)
+    scopes = {SCOPE_TICKERS}
+    titles = Category.objects.filter(id__in=category_ids).values_list('title', flat=True)
+    scopes.update(category_scope(title) for title in titles)
+    codes = Currency.objects.filter(id__in=currency_ids).values_list('code', flat=True)
+    scopes.update(currency_scope(code) for code in codes)
+    bump_generations_on_commit(scopes)
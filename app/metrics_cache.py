@@ -0,0 +1,287 @@
+"""
+Infraestrutura de cache das metricas do dashboard.
+
+Chaves versionadas: cada chave embute o contador de geracao dos escopos de
+que depende; incrementar um contador invalida em O(1) todas as chaves
+daquele escopo, sem listar nem apagar entradas.
+
+Protecao contra stampede: ao expirar (ou ser invalidada) uma chave, apenas
+um worker recalcula o valor, sob um lock no cache, enquanto os demais
+recebem o valor anterior. Perto do vencimento a recomputacao e antecipada
+de forma probabilistica (XFetch), para que a chave raramente chegue a expirar.
+
+Dois niveis: um LRU em memoria do processo, com TTL curto, fica na frente do
+Redis. Como as chaves sao versionadas, uma entrada local nunca fica
+desatualizada em relacao as geracoes; apenas os contadores de geracao sao
+mantidos localmente por ate METRICS_LOCAL_CACHE_TTL segundos, o que limita o
+atraso da invalidacao feita por outros workers.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .instrumentation import record_cache
+
+# Cache timeout settings: as chaves sao invalidadas por evento (contadores de
+# geracao), entao o TTL so limita o espaco ocupado por entradas abandonadas
+CACHE_TTL = getattr(settings, 'CACHE_TTL_LONG', 3600)  # 1 hora por padrao
+
+# Ultimo valor calculado de cada chave base, servido enquanto outro worker recalcula
+STALE_TTL = CACHE_TTL * 24
+# Tempo maximo de um recalculo antes de o lock ser liberado
+LOCK_TIMEOUT = getattr(settings, 'METRICS_LOCK_TIMEOUT', 30)
+# Espera maxima por um recalculo alheio quando nao ha valor anterior
+LOCK_WAIT = getattr(settings, 'METRICS_LOCK_WAIT', 2.0)
+LOCK_POLL_INTERVAL = 0.05
+# Agressividade da recomputacao antecipada (XFetch); 1.0 e o valor recomendado
+XFETCH_BETA = getattr(settings, 'METRICS_XFETCH_BETA', 1.0)
+# Nivel local (por processo)
+LOCAL_CACHE_SIZE = getattr(settings, 'METRICS_LOCAL_CACHE_SIZE', 256)
+LOCAL_CACHE_TTL = getattr(settings, 'METRICS_LOCAL_CACHE_TTL', 5)
+
+SCOPE_ALL = "all"
+SCOPE_INFLOWS = "inflows"
+SCOPE_POSITIONS = "positions"
+SCOPE_DIVIDENDS = "dividends"
+SCOPE_TICKERS = "tickers"
+SCOPE_DASHBOARD = "dashboard"
+SCOPE_FX = "fx"
+SCOPE_QUOTES = "quotes"
+SCOPE_TARGETS = "targets"
+
+
+class LocalCache:
+    """
+    LRU em memoria, limitado em numero de entradas e com TTL, seguro para
+    uso entre threads.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+# Contadores de acertos/falhas por nivel (ver cache_stats)
+_stats = dict(local_hits=0, local_misses=0, remote_hits=0, remote_misses=0)
+_stats_lock = threading.Lock()
+
+
+def cache_stats():
+    """Retorna os contadores de acertos e falhas de cada nivel do cache."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def currency_scope(code):
+    return f"currency:{code}"
+
+
+def category_scope(title):
+    return f"category:{title}"
+
+
+def _generation_key(scope):
+    return f"metrics_generation_{scope}"
+
+
+def versioned_key(base_key, *scopes):
+    """
+    Monta a chave de cache de 'base_key' com a geracao atual de cada escopo
+    (e do escopo global). Os contadores vem do nivel local ou, se vencidos,
+    do cache compartilhado com um unico get_many.
+    """
+    scopes = (SCOPE_ALL,) + scopes
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = {}
+    for key in keys:
+        generation = local_cache.get(key)
+        if generation is not None:
+            generations[key] = generation
+
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        generations.update(cache.get_many(missing))
+        for key in missing:
+            if key not in generations:
+                # Inicializa com o relogio: um contador despejado do cache nunca
+                # volta a um valor ja usado por entradas antigas
+                cache.add(key, time.time_ns(), None)
+                generations[key] = cache.get(key)
+            local_cache.set(key, generations[key])
+    return ":".join([base_key] + [str(generations[key]) for key in keys])
+
+
+def bump_generations(scopes):
+    """Incrementa a geracao dos escopos, invalidando as chaves que dependem deles."""
+    for scope in set(scopes):
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        local_cache.delete(key)
+
+
+def bump_generations_on_commit(scopes):
+    """
+    Incrementa as geracoes apenas apos o commit, para que uma leitura
+    concorrente nao guarde dados antigos sob a geracao nova.
+    """
+    scopes = set(scopes)
+    if scopes:
+        transaction.on_commit(lambda: bump_generations(scopes))
+
+
+def get_or_compute(base_key, scopes, compute, ttl=CACHE_TTL):
+    """
+    Retorna o valor em cache de 'base_key' (versionado pelos escopos) ou o
+    calcula com 'compute', garantindo um unico recalculo concorrente.
+
+    Args:
+        base_key: Chave sem as geracoes (ex: "total_invested")
+        scopes: Escopos de invalidacao de que o valor depende
+        compute: Funcao sem argumentos que calcula o valor
+        ttl: Tempo de vida da entrada em segundos
+    """
+    key = versioned_key(base_key, *scopes)
+    entry = local_cache.get(key)
+    if entry is not None:
+        _count("local_hits")
+        record_cache(hit=True)
+        return entry["value"]
+    _count("local_misses")
+
+    entry = cache.get(key)
+    _count("remote_hits" if entry is not None else "remote_misses")
+    record_cache(hit=entry is not None)
+    if entry is not None and not _should_refresh_early(entry):
+        local_cache.set(key, entry)
+        return entry["value"]
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Outro worker ja esta recalculando: serve o valor atual ou o anterior
+        if entry is None:
+            entry = cache.get(_stale_key(base_key)) or _wait_for(key)
+        if entry is not None:
+            return entry["value"]
+        lock_key = None
+
+    try:
+        started = time.monotonic()
+        value = compute()
+        entry = dict(value=value, delta=time.monotonic() - started, expiry=time.time() + ttl)
+        cache.set(key, entry, ttl)
+        cache.set(_stale_key(base_key), entry, STALE_TTL)
+        local_cache.set(key, entry)
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    return value
+
+
+def cached_metric(key, *scopes, ttl=CACHE_TTL):
+    """
+    Decorator que guarda o resultado da funcao com get_or_compute.
+
+    'key' e cada escopo podem ser strings (formatadas com os argumentos da
+    funcao, ex: "applied_value_{0}") ou funcoes que recebem os mesmos
+    argumentos e retornam a string.
+
+    Exemplo:
+        @cached_metric("applied_value_{0}", "currency:{0}")
+        def get_applied_value(currency_code):
+            ...
+    """
+    def resolve(template, args, kwargs):
+        if callable(template):
+            return template(*args, **kwargs)
+        return template.format(*args, **kwargs)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(
+                resolve(key, args, kwargs),
+                [resolve(scope, args, kwargs) for scope in scopes],
+                lambda: func(*args, **kwargs),
+                ttl,
+            )
+        return wrapper
+    return decorator
+
+
+def _should_refresh_early(entry):
+    """
+    XFetch: quanto mais perto do vencimento e mais caro o recalculo, maior a
+    chance de antecipa-lo (Vattani et al., "Optimal Probabilistic Cache
+    Stampede Prevention").
+    """
+    gap = entry["delta"] * XFETCH_BETA * -math.log(1.0 - random.random())
+    return time.time() + gap >= entry["expiry"]
+
+
+def _stale_key(base_key):
+    return f"{base_key}:stale"
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
@@ -0,0 +1,249 @@
+"""
+Planejador de rebalanceamento por pesos alvo (TargetAllocation).
+
+A carteira (posicoes consolidadas, cotacoes, lotes e pesos) e lida da tabela
+Position e de Quote em duas queries e guardada no cache como arrays NumPy.
+Um plano apenas converte os precos para a moeda base e distribui o aporte:
+
+1. o valor alvo de cada ticker e peso * (carteira + aporte); a falta e o
+   quanto o ticker esta abaixo do alvo (vendas nao sao sugeridas);
+2. se o aporte nao cobre todas as faltas, elas sao reduzidas na mesma
+   proporcao e cada ticker recebe os lotes inteiros que cabem na sua parte;
+3. o troco e gasto de forma gulosa: o ticker com a maior falta restante
+   recebe lotes ate cobri-la, enquanto couberem no saldo, e assim por diante.
+
+O peso de um ticker e o peso da sua categoria vezes o seu peso dentro dela.
+Categorias sem alvo nao recebem aportes; numa categoria sem alvos por
+ticker, o peso e dividido igualmente entre os tickers em carteira.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from brokers.fx import get_fx_series
+from tickers.models import TargetAllocation, Ticker
+from .metrics_cache import (
+    SCOPE_POSITIONS, SCOPE_QUOTES, SCOPE_TARGETS, SCOPE_TICKERS, cached_metric,
+)
+
+# Folga para erros de arredondamento ao comparar valores em ponto flutuante
+EPSILON = 1e-9
+
+
+class AllocationSnapshot:
+    """
+    Carteira atual e pesos alvo, um item por ticker.
+
+    Attributes:
+        names: codigo de cada ticker
+        codes: moeda de cada ticker
+        categories: titulos das categorias
+        category: indice da categoria de cada ticker em 'categories'
+        quantity: quantidade em carteira
+        price: cotacao na moeda do ticker (custo medio sem cotacao; NaN sem nenhum dos dois)
+        lot_size: lote de negociacao
+        weight: fracao alvo da carteira (soma no maximo 1)
+    """
+
+    def __init__(self, names, codes, categories, category, quantity, price, lot_size, weight):
+        self.names = names
+        self.codes = codes
+        self.categories = categories
+        self.category = category
+        self.quantity = quantity
+        self.price = price
+        self.lot_size = lot_size
+        self.weight = weight
+
+    @classmethod
+    def load(cls):
+        """Le tickers, posicoes e cotacoes em uma query e os pesos em outra."""
+        rows = list(
+            Ticker.objects
+            .order_by("name")
+            .annotate(position_quantity=Sum("positions__quantity"), position_cost=Sum("positions__cost_basis"))
+            .values_list(
+                "id", "name", "currency__code", "category_id", "category__title", "lot_size",
+                "quote__price", "position_quantity", "position_cost",
+            )
+        )
+        category_weights, ticker_weights = {}, {}
+        for category_id, ticker_id, weight in TargetAllocation.objects.values_list("category_id", "ticker_id", "weight"):
+            if category_id is not None:
+                category_weights[category_id] = float(weight)
+            else:
+                ticker_weights[ticker_id] = float(weight)
+
+        if not rows:
+            empty = np.zeros(0)
+            return cls([], [], [], np.zeros(0, dtype=np.int64), empty, empty, empty, empty)
+
+        ids, names, codes, category_ids, titles, lot_size, quote, quantity, cost = zip(*rows)
+        quantity = np.array([value or 0 for value in quantity], dtype=float)
+        cost = np.array([float(value or 0) for value in cost])
+        quote = np.array([np.nan if value is None else float(value) for value in quote])
+        held = quantity > 0
+        average = np.divide(cost, quantity, out=np.full(quantity.shape, np.nan), where=held)
+        price = np.where(np.isnan(quote), average, quote)
+
+        category_keys, category = np.unique(np.array(category_ids), return_inverse=True)
+        category_titles = dict(zip(category_ids, titles))
+        n_categories = len(category_keys)
+
+        # Peso de cada categoria na carteira
+        category_weight = np.array([category_weights.get(key, 0.0) for key in category_keys.tolist()])
+        if category_weight.sum() > 0:
+            category_weight /= category_weight.sum()
+
+        # Peso de cada ticker dentro da categoria: alvo proprio ou divisao igual entre os tickers em carteira
+        own = np.array([ticker_weights.get(ticker_id, np.nan) for ticker_id in ids])
+        has_own = ~np.isnan(own)
+        own = np.where(has_own, own, 0.0)
+        own_total = np.bincount(category, weights=own, minlength=n_categories)
+        own_count = np.bincount(category, weights=has_own, minlength=n_categories)
+        held_count = np.bincount(category, weights=held, minlength=n_categories)
+        inner = np.where(
+            own_count[category] > 0,
+            np.divide(own, own_total[category], out=np.zeros(own.shape), where=own_total[category] > 0),
+            np.divide(held, held_count[category], out=np.zeros(own.shape), where=held_count[category] > 0),
+        )
+
+        return cls(
+            list(names),
+            list(codes),
+            [category_titles[key] for key in category_keys.tolist()],
+            category,
+            quantity,
+            price,
+            np.array(lot_size, dtype=float),
+            category_weight[category] * inner,
+        )
+
+
+@cached_metric("allocation_snapshot", SCOPE_POSITIONS, SCOPE_TICKERS, SCOPE_QUOTES, SCOPE_TARGETS)
+def get_allocation_snapshot():
+    """Carteira e pesos alvo em cache, invalidados por negociacoes, cotacoes e alvos."""
+    return AllocationSnapshot.load()
+
+
+def allocate(values, prices, lot_sizes, weights, cash):
+    """
+    Distribui 'cash' em lotes inteiros para aproximar a carteira dos pesos.
+
+    Args:
+        values: Valor atual de cada ticker
+        prices: Preco de cada ticker (NaN ou <= 0 para tickers sem preco)
+        lot_sizes: Lote de cada ticker
+        weights: Fracao alvo de cada ticker
+        cash: Valor a aportar
+
+    Returns:
+        tuple: (lotes comprados de cada ticker, saldo nao utilizado)
+    """
+    values = np.asarray(values, dtype=float)
+    lot_cost = np.asarray(prices, dtype=float) * np.asarray(lot_sizes, dtype=float)
+    buyable = np.isfinite(lot_cost) & (lot_cost > 0)
+    lot_cost = np.where(buyable, lot_cost, np.inf)
+
+    target = np.asarray(weights, dtype=float) * (values.sum() + cash)
+    shortfall = np.where(buyable, np.maximum(target - values, 0.0), 0.0)
+    needed = shortfall.sum()
+    if needed <= 0:
+        return np.zeros(values.shape, dtype=np.int64), cash
+
+    # Lotes inteiros dentro da parte proporcional de cada ticker
+    share = shortfall * min(1.0, cash / needed)
+    lots = np.floor(share / lot_cost + EPSILON).astype(np.int64)
+    spent = lots * np.where(buyable, lot_cost, 0.0)
+    remaining = cash - spent.sum()
+    shortfall -= spent
+
+    # Troco: o ticker com a maior falta restante recebe lotes ate cobri-la (ou acabar o saldo);
+    # cada ticker e escolhido no maximo uma vez
+    while True:
+        candidates = (shortfall > EPSILON) & (lot_cost <= remaining + EPSILON)
+        if not candidates.any():
+            break
+        index = np.argmax(np.where(candidates, shortfall, -np.inf))
+        count = min(np.ceil(shortfall[index] / lot_cost[index] - EPSILON), np.floor(remaining / lot_cost[index] + EPSILON))
+        lots[index] += int(count)
+        remaining -= count * lot_cost[index]
+        shortfall[index] = 0.0
+    return lots, max(remaining, 0.0)
+
+
+def plan_rebalance(cash, base_currency=None, quotes=None):
+    """
+    Lista de compras para aproximar a carteira dos pesos alvo com o aporte.
+
+    Args:
+        cash: Valor do aporte na moeda base
+        base_currency: Moeda do aporte e do plano (BASE_CURRENCY por padrao)
+        quotes: Cotacoes que substituem as gravadas ({codigo: preco na moeda do ticker})
+
+    Returns:
+        dict: base_currency, cash, spent, leftover, orders (ticker, category,
+        currency, lots, quantity, price e value na moeda base, do maior para
+        o menor valor) e allocation ({categoria: target, current e planned,
+        em % da carteira})
+
+    Raises:
+        ValueError: Se o aporte nao for positivo
+        FxRateMissing: Se algum ticker (ou a moeda base) nao tiver cotacao de cambio
+    """
+    cash = float(cash)
+    if cash <= 0:
+        raise ValueError("O valor do aporte deve ser positivo.")
+    base_currency = base_currency or settings.BASE_CURRENCY
+
+    snapshot = get_allocation_snapshot()
+    price = snapshot.price.copy()
+    if quotes:
+        positions = {name: index for index, name in enumerate(snapshot.names)}
+        for name, value in quotes.items():
+            if name in positions:
+                price[positions[name]] = float(value)
+
+    today = np.full(len(price), np.datetime64(timezone.localdate(), "D"))
+    price = get_fx_series().convert(price, snapshot.codes, today, base_currency, strict=True) if len(price) else price
+    values = snapshot.quantity * np.nan_to_num(price)
+    lots, leftover = allocate(values, price, snapshot.lot_size, snapshot.weight, cash)
+
+    quantity = lots * snapshot.lot_size
+    bought = quantity * np.nan_to_num(price)
+    orders = [
+        dict(
+            ticker=snapshot.names[index],
+            category=snapshot.categories[snapshot.category[index]],
+            currency=snapshot.codes[index],
+            lots=int(lots[index]),
+            quantity=int(quantity[index]),
+            price=round(float(price[index]), 2),
+            value=round(float(bought[index]), 2),
+        )
+        for index in np.flatnonzero(lots)
+    ]
+    orders.sort(key=lambda order: -order["value"])
+
+    n_categories = len(snapshot.categories)
+    current = np.bincount(snapshot.category, weights=values, minlength=n_categories)
+    planned = current + np.bincount(snapshot.category, weights=bought, minlength=n_categories)
+    target = np.bincount(snapshot.category, weights=snapshot.weight, minlength=n_categories)
+    allocation = {
+        title: dict(
+            target=round(100 * float(target[index]), 2),
+            current=round(100 * float(current[index] / current.sum()), 2) if current.sum() else 0.0,
+            planned=round(100 * float(planned[index] / planned.sum()), 2) if planned.sum() else 0.0,
+        )
+        for index, title in enumerate(snapshot.categories)
+    }
+
+    return dict(
+        base_currency=base_currency,
+        cash=round(cash, 2),
+        spent=round(float(bought.sum()), 2),
+        leftover=round(float(leftover), 2),
+        orders=orders,
+        allocation=allocation,
+    )
@@ -0,0 +1,303 @@
+"""
+Rentabilidade da carteira: TWR, MWR e XIRR por ticker.
+
+O extrato (compras, vendas e dividendos) e lido uma unica vez, agrupado por
+(ticker, data) no banco, convertido para a moeda base e guardado em arrays
+NumPy. Todos os calculos operam sobre esses arrays: o XIRR de todos os
+tickers e resolvido de uma vez, com iteracoes de Newton vetorizadas e somas
+por ticker via np.bincount.
+
+Sem historico de precos, cada ticker e avaliado pelo ultimo preco negociado
+(valor / quantidade da ultima compra ou venda) e, no fim do periodo, pela
+cotacao mais recente (Quote) quando existir.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from brokers.fx import get_fx_series
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Quote, Ticker
+from .metrics_cache import (
+    SCOPE_DIVIDENDS, SCOPE_FX, SCOPE_INFLOWS, SCOPE_POSITIONS, SCOPE_QUOTES, SCOPE_TICKERS, cached_metric,
+)
+
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+# Espaco reservado para as datas na chave combinada (ticker, dia)
+DAY_SPAN = 1 << 20
+
+
+class Ledger:
+    """
+    Fluxos do investidor na moeda base, um por (ticker, data, tipo).
+
+    Attributes:
+        ticker: id do ticker de cada fluxo
+        day: data de cada fluxo em dias desde 1970-01-01
+        amount: valor do fluxo (compras negativas, vendas e dividendos positivos)
+        quantity: cotas negociadas (compras positivas, vendas negativas, 0 em dividendos)
+        income: True para dividendos
+    """
+
+    def __init__(self, ticker, day, amount, quantity, income):
+        self.ticker = ticker
+        self.day = day
+        self.amount = amount
+        self.quantity = quantity
+        self.income = income
+
+    @classmethod
+    def load(cls, base_currency, end=None, fx=None):
+        """Le o extrato ate 'end' com uma query agrupada por tabela."""
+        fx = fx or get_fx_series()
+        sources = (
+            (Inflow.objects.all(), "ticker__currency__code", "total_price", -1.0),
+            (Outflow.objects.all(), "ticker__currency__code", "total_price", 1.0),
+            (Dividend.objects.all(), "currency", "total_value", 0.0),
+        )
+        ticker_ids, codes, dates, amounts, quantities = [], [], [], [], []
+        for queryset, currency_field, value_field, direction in sources:
+            if end is not None:
+                queryset = queryset.filter(date__lte=end)
+            totals = dict(total=Sum(value_field))
+            if direction:
+                totals["shares"] = Sum("quantity")
+            rows = (
+                queryset
+                .order_by()
+                .values("ticker_id", currency_field, "date")
+                .annotate(**totals)
+            )
+            for row in rows:
+                ticker_ids.append(row["ticker_id"])
+                codes.append(row[currency_field])
+                dates.append(row["date"])
+                # Compras sao fluxos negativos e aumentam a posicao
+                amounts.append((direction or 1.0) * float(row["total"] or 0))
+                quantities.append(-direction * float(row.get("shares") or 0))
+
+        dates = np.array(dates, dtype="datetime64[D]")
+        amounts = fx.convert(amounts, codes, dates, base_currency) if amounts else np.zeros(0)
+        quantities = np.array(quantities, dtype=float)
+        return cls(np.array(ticker_ids, dtype=np.int64), dates.astype(np.int64), amounts, quantities, quantities == 0)
+
+
+class TradePrices:
+    """
+    Eventos de negociacao por (ticker, dia), ordenados por ticker e data,
+    com o preco do dia e a quantidade acumulada antes e depois dele.
+    """
+
+    def __init__(self, ledger):
+        trades = ledger.quantity != 0
+        keys = ledger.ticker[trades] * DAY_SPAN + ledger.day[trades]
+        self.keys, index = np.unique(keys, return_inverse=True)
+        self.ticker = self.keys // DAY_SPAN
+        self.day = self.keys % DAY_SPAN
+
+        quantity = ledger.quantity[trades]
+        net = np.bincount(index, weights=quantity, minlength=len(self.keys))
+        gross_quantity = np.bincount(index, weights=np.abs(quantity), minlength=len(self.keys))
+        gross_value = np.bincount(index, weights=np.abs(ledger.amount[trades]), minlength=len(self.keys))
+        self.price = gross_value / gross_quantity
+
+        # Acumulado por ticker: cumsum global menos o acumulado antes do primeiro evento do ticker
+        starts = np.ones(len(self.keys), dtype=bool)
+        starts[1:] = self.ticker[1:] != self.ticker[:-1]
+        first = np.maximum.accumulate(np.where(starts, np.arange(len(self.keys)), 0))
+        total = np.cumsum(net)
+        self.after = total - (total[first] - net[first])
+        self.before = self.after - net
+
+        previous_price = np.concatenate([[0.0], self.price[:-1]])
+        # Ganho de marcacao: posicao anterior reavaliada pelo preco do dia
+        self.gain = np.where(starts, 0.0, self.before * (self.price - previous_price))
+
+    def as_of(self, day):
+        """Tickers com posicao aberta em 'day', com a quantidade e o ultimo preco."""
+        tickers = np.unique(self.ticker)
+        index = np.searchsorted(self.keys, tickers * DAY_SPAN + day, side="right") - 1
+        found = (index >= 0) & (self.ticker[np.maximum(index, 0)] == tickers)
+        tickers, index = tickers[found], index[found]
+        held = self.after[index] > 0
+        return tickers[held], self.after[index][held], self.price[index][held]
+
+
+def xirr(groups, days, amounts, n_groups):
+    """
+    Taxa interna de retorno anual de cada grupo, resolvida para todos os
+    grupos ao mesmo tempo (Newton com derivada analitica).
+
+    Args:
+        groups: Grupo (indice 0..n_groups-1) de cada fluxo
+        days: Data de cada fluxo em dias
+        amounts: Valor de cada fluxo (aportes negativos)
+        n_groups: Numero de grupos
+
+    Returns:
+        numpy.ndarray: Taxa de cada grupo (NaN quando nao ha aporte e
+        retorno, ou quando o metodo nao converge)
+    """
+    rates = np.full(n_groups, np.nan)
+    if not len(amounts):
+        return rates
+
+    first = np.full(n_groups, np.iinfo(np.int64).max)
+    np.minimum.at(first, groups, days)
+    years = (days - first[groups]) / 365.0
+
+    has_inflow = np.bincount(groups, weights=amounts < 0, minlength=n_groups) > 0
+    has_outflow = np.bincount(groups, weights=amounts > 0, minlength=n_groups) > 0
+    valid = has_inflow & has_outflow
+
+    rate = np.full(n_groups, 0.1)
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        for _ in range(XIRR_MAX_ITERATIONS):
+            base = 1.0 + rate[groups]
+            discounted = amounts * base ** -years
+            npv = np.bincount(groups, weights=discounted, minlength=n_groups)
+            slope = np.bincount(groups, weights=-years * discounted / base, minlength=n_groups)
+            step = np.where(slope != 0, npv / slope, 0.0)
+            rate = np.clip(rate - step, -0.9999, 1e6)
+            if np.all(~valid | (np.abs(step) < XIRR_TOLERANCE)):
+                break
+        converged = np.abs(step) < XIRR_TOLERANCE * 1e3
+
+    ok = valid & converged & np.isfinite(rate)
+    rates[ok] = rate[ok]
+    return rates
+
+
+def time_weighted_return(days, gains, contributions, income, start_day=None):
+    """
+    Retorno ponderado pelo tempo (cumulativo), encadeando os subperiodos
+    entre datas com fluxo.
+
+    Args:
+        days: Datas (ordenadas, sem repeticao)
+        gains: Ganho de marcacao da carteira em cada data, antes dos fluxos
+        contributions: Aportes liquidos em cada data (compras - vendas)
+        income: Dividendos recebidos em cada data
+        start_day: Primeira data do periodo (subperiodos anteriores sao ignorados)
+
+    Returns:
+        float: Retorno do periodo, ou None sem capital investido
+    """
+    after = np.cumsum(gains + contributions)
+    previous = np.concatenate([[0.0], after[:-1]])
+    in_period = previous > 0
+    if start_day is not None:
+        in_period &= days >= start_day
+    if not in_period.any():
+        return None
+    period_returns = (gains[in_period] + income[in_period]) / previous[in_period]
+    return float(np.prod(1.0 + period_returns) - 1.0)
+
+
+def get_portfolio_returns(start=None, end=None, base_currency=None):
+    """
+    Rentabilidade da carteira no periodo (desde o inicio e ate hoje por
+    padrao), na moeda base.
+
+    Returns:
+        dict: start, end, base_currency, twr (cumulativo), twr_annualized
+        (apenas para periodos de um ano ou mais), mwr (TIR anual da carteira)
+        e tickers ({codigo: XIRR anual}); taxas sem solucao sao None
+    """
+    end = end or timezone.localdate()
+    return _portfolio_returns(start, end, base_currency or settings.BASE_CURRENCY)
+
+
+@cached_metric(
+    "portfolio_returns_{2}_{0}_{1}",
+    SCOPE_INFLOWS, SCOPE_POSITIONS, SCOPE_DIVIDENDS, SCOPE_TICKERS, SCOPE_FX, SCOPE_QUOTES,
+)
+def _portfolio_returns(start, end, base_currency):
+    fx = get_fx_series()
+    ledger = Ledger.load(base_currency, end, fx)
+    trades = TradePrices(ledger)
+    tickers = {
+        ticker_id: (name, code)
+        for ticker_id, name, code in Ticker.objects.values_list("id", "name", "currency__code")
+    }
+    end_day = _day(end)
+    start_day = _day(start) if start else None
+
+    # Posicoes abertas no fim, pela cotacao mais recente (ou ultimo preco negociado)
+    closing_ids, closing_quantity, last_price = trades.as_of(end_day)
+    closing_price = last_price.copy()
+    quotes = dict(Quote.objects.filter(ticker_id__in=closing_ids.tolist()).values_list("ticker_id", "price"))
+    quoted = np.array([ticker_id in quotes for ticker_id in closing_ids.tolist()], dtype=bool)
+    if quoted.any():
+        quoted_ids = closing_ids[quoted].tolist()
+        closing_price[quoted] = fx.convert(
+            [float(quotes[ticker_id]) for ticker_id in quoted_ids],
+            [tickers[ticker_id][1] for ticker_id in quoted_ids],
+            np.full(len(quoted_ids), end_day, dtype="datetime64[D]"),
+            base_currency,
+        )
+    closing_values = closing_quantity * closing_price
+
+    # Serie diaria da carteira: ganhos de marcacao, aportes e dividendos
+    days = np.unique(np.concatenate([ledger.day, [end_day]]))
+    trade_rows = ledger.quantity != 0
+    gains = _by_day(days, trades.day, trades.gain)
+    gains[-1] += np.sum(closing_values - closing_quantity * last_price)
+    contributions = _by_day(days, ledger.day[trade_rows], -ledger.amount[trade_rows])
+    income = _by_day(days, ledger.day[ledger.income], ledger.amount[ledger.income])
+
+    twr = time_weighted_return(days, gains, contributions, income, start_day)
+    first_day = start_day if start_day is not None else (ledger.day.min() if len(ledger.day) else end_day)
+    twr_annualized = None
+    if twr is not None and end_day - first_day >= 365:
+        twr_annualized = float((1.0 + twr) ** (365.0 / (end_day - first_day)) - 1.0)
+
+    # Fluxos do periodo, com as posicoes de abertura como aporte e as de fechamento como resgate
+    in_period = ledger.day >= start_day if start_day is not None else np.ones(len(ledger.day), dtype=bool)
+    flow_ticker, flow_day, flow_amount = [ledger.ticker[in_period]], [ledger.day[in_period]], [ledger.amount[in_period]]
+    if start_day is not None:
+        opening_ids, opening_quantity, opening_price = trades.as_of(start_day - 1)
+        flow_ticker.append(opening_ids)
+        flow_day.append(np.full(len(opening_ids), start_day, dtype=np.int64))
+        flow_amount.append(-opening_quantity * opening_price)
+    flow_ticker.append(closing_ids)
+    flow_day.append(np.full(len(closing_ids), end_day, dtype=np.int64))
+    flow_amount.append(closing_values)
+
+    flow_day = np.concatenate(flow_day)
+    flow_amount = np.concatenate(flow_amount)
+    ticker_ids, groups = np.unique(np.concatenate(flow_ticker), return_inverse=True)
+
+    mwr = xirr(np.zeros(len(flow_day), dtype=np.int64), flow_day, flow_amount, 1)[0]
+    ticker_rates = xirr(groups, flow_day, flow_amount, len(ticker_ids))
+
+    return dict(
+        start=start,
+        end=end,
+        base_currency=base_currency,
+        twr=twr,
+        twr_annualized=twr_annualized,
+        mwr=_rate(mwr),
+        tickers={
+            tickers[ticker_id][0]: _rate(rate)
+            for ticker_id, rate in zip(ticker_ids.tolist(), ticker_rates)
+        },
+    )
+
+
+def _by_day(days, event_days, values):
+    """Soma os valores de cada evento na sua posicao em 'days'."""
+    return np.bincount(np.searchsorted(days, event_days), weights=values, minlength=len(days))
+
+
+def _day(value):
+    """Data em dias desde 1970-01-01."""
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def _rate(value):
+    return None if value is None or np.isnan(value) else float(value)
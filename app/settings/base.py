@@ -24,6 +24,21 @@ SECRET_KEY = env('SECRET_KEY')
 BRAPI_TOKEN = env('BRAPI_TOKEN', default='')
 API_TIMEOUT = env.int('API_TIMEOUT', default=10)
 API_MAX_RETRIES = env.int('API_MAX_RETRIES', default=3)
+BRAPI_URL = env('BRAPI_URL', default='https://brapi.dev/api/quote')
+BRAPI_BATCH_SIZE = env.int('BRAPI_BATCH_SIZE', default=20)
+BRASILAPI_TAXAS_URL = env('BRASILAPI_TAXAS_URL', default='https://brasilapi.com.br/api/taxas/v1')
+
+# Taxas economicas: frescas por FEE_CACHE_TTL, servidas vencidas ate FEE_CACHE_STALE_TTL
+FEE_CACHE_TTL = env.int('FEE_CACHE_TTL', default=3600)
+FEE_CACHE_STALE_TTL = env.int('FEE_CACHE_STALE_TTL', default=86400)
+
+# Circuit breaker das APIs externas
+API_CIRCUIT_FAILURES = env.int('API_CIRCUIT_FAILURES', default=3)
+API_CIRCUIT_COOLDOWN = env.int('API_CIRCUIT_COOLDOWN', default=60)
+
+# Instrumentacao: token (Bearer) do endpoint do Prometheus e limite de requisicao lenta
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+REQUEST_METRICS_SLOW_MS = env.int('REQUEST_METRICS_SLOW_MS', default=1000)
 
 # Application definition
 INSTALLED_APPS = [
@@ -52,6 +67,8 @@ INSTALLED_APPS = [
 TAILWIND_APP_NAME = 'theme'
 
 MIDDLEWARE = [
+    # Primeiro da lista: a latencia medida inclui todos os outros middlewares
+    "app.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -133,6 +150,13 @@ CACHE_TTL_SHORT = 60  # 1 minuto
 CACHE_TTL_MEDIUM = 300  # 5 minutos
 CACHE_TTL_LONG = 3600  # 1 hora
 
+# Nivel local (LRU por processo) na frente do Redis para as metricas do dashboard
+METRICS_LOCAL_CACHE_SIZE = env.int('METRICS_LOCAL_CACHE_SIZE', default=256)
+METRICS_LOCAL_CACHE_TTL = env.int('METRICS_LOCAL_CACHE_TTL', default=5)
+
+# Moeda em que os totais consolidados (todas as moedas) sao apresentados
+BASE_CURRENCY = env('BASE_CURRENCY', default='BRL')
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
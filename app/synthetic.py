@@ -0,0 +1,251 @@
+"""
+Carteiras sinteticas para os benchmarks (comandos 'generate_portfolio' e
+'run_benchmarks').
+
+O extrato imita lista_de_fiis.csv: compras mensais de poucas cotas (FIIs,
+com subscricoes ocasionais) ou de lotes de 100 acoes, vendas raras de parte
+da posicao e dividendos mensais (FIIs) ou trimestrais (demais categorias).
+Os precos seguem um passeio aleatorio a partir de um preco tipico de cada
+categoria. Com a mesma semente o extrato gerado e sempre o mesmo.
+"""
+import csv
+import math
+import random
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+
+from app.metrics import invalidate_metrics_cache
+from brokers.models import Broker, Currency
+from categories.models import Category
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Ticker
+from tickers.positions import rebuild_positions
+
+CURRENCIES = (
+    ("BRL", "Real Brasileiro", None),
+    ("USD", "Dolar Americano", Decimal("5.50")),
+)
+
+# Categoria -> moeda, sufixo do codigo, faixa do preco inicial, faixa de lotes
+# por compra, tamanho do lote, meses entre dividendos e rendimento por pagamento
+CATEGORIES = {
+    "FII": dict(
+        description="Fundos Imobiliarios", currency="BRL", suffix="11", price=(80, 150),
+        lots=(1, 10), lot_size=1, dividend_every=1, dividend_yield=0.008,
+    ),
+    "Acao": dict(
+        description="Acoes Brasileiras", currency="BRL", suffix="3", price=(5, 60),
+        lots=(1, 3), lot_size=100, dividend_every=3, dividend_yield=0.015,
+    ),
+    "Stock": dict(
+        description="Acoes Americanas", currency="USD", suffix="", price=(20, 300),
+        lots=(1, 5), lot_size=1, dividend_every=3, dividend_yield=0.004,
+    ),
+    "ETF": dict(
+        description="Exchange Traded Funds", currency="USD", suffix="", price=(50, 450),
+        lots=(1, 3), lot_size=1, dividend_every=3, dividend_yield=0.003,
+    ),
+}
+# Distribuicao dos tickers entre as categorias (40% FII, 30% Acao, 20% Stock, 10% ETF)
+CATEGORY_CYCLE = ("FII", "Acao", "FII", "Stock", "Acao", "FII", "ETF", "Stock", "Acao", "FII")
+
+BROKERS = {"BRL": ("Rico Investimentos", "Banco Inter"), "USD": ("Avenue",)}
+
+BUY_PROBABILITY = 0.7
+SUBSCRIPTION_PROBABILITY = 0.25
+SELL_PROBABILITY = 0.03
+MONTHLY_DRIFT = 0.005
+MONTHLY_VOLATILITY = 0.05
+
+TRADE_FIELDS = ("ticker", "date", "type", "quantity", "cost_price", "broker")
+
+
+def ticker_code(index, category):
+    """Codigo unico do ticker de numero 'index' (ex: AAAB11, AAAC3)."""
+    letters = ""
+    for _ in range(4):
+        index, remainder = divmod(index, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters + CATEGORIES[category]["suffix"]
+
+
+@transaction.atomic
+def create_tickers(count):
+    """
+    Cria 'count' tickers sinteticos (e as categorias, moedas e corretoras
+    que faltarem), numerados a partir dos tickers ja existentes.
+
+    Returns:
+        list: Tickers criados
+    """
+    currencies = {}
+    for code, name, exchange_rate in CURRENCIES:
+        currencies[code], _ = Currency.objects.get_or_create(
+            code=code, defaults=dict(name=name, exchange_rate=exchange_rate)
+        )
+    categories = {}
+    for title, profile in CATEGORIES.items():
+        categories[title], _ = Category.objects.get_or_create(
+            title=title, defaults=dict(description=profile["description"])
+        )
+    for code, names in BROKERS.items():
+        for name in names:
+            Broker.objects.get_or_create(name=name, defaults=dict(currency=currencies[code]))
+
+    offset = Ticker.objects.count()
+    tickers = []
+    for index in range(offset, offset + count):
+        title = CATEGORY_CYCLE[index % len(CATEGORY_CYCLE)]
+        profile = CATEGORIES[title]
+        tickers.append(Ticker(
+            name=ticker_code(index, title),
+            category=categories[title],
+            currency=currencies[profile["currency"]],
+            lot_size=profile["lot_size"],
+        ))
+    return Ticker.objects.bulk_create(tickers)
+
+
+def month_starts(years, today=None):
+    """Primeiro dia de cada um dos ultimos 'years' anos de meses completos."""
+    today = today or timezone.localdate()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(12 * years):
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+        months.append(date(year, month, 1))
+    return months[::-1]
+
+
+def ledger(tickers, years, seed=0, today=None):
+    """
+    Gera compras, vendas e dividendos mensais de cada ticker.
+
+    Args:
+        tickers: Tickers (com category e currency carregados)
+        years: Anos de historico, terminando no ultimo mes completo
+        seed: Semente do gerador aleatorio
+        today: Data de referencia (hoje por padrao)
+
+    Returns:
+        tuple: (negociacoes no formato de lista_de_fiis.csv, em ordem de data,
+        dividendos como dicts com ticker, date, value e quantity_quote)
+    """
+    rng = random.Random(seed)
+    months = month_starts(years, today)
+    trades, dividends = [], []
+    for ticker in tickers:
+        profile = CATEGORIES[ticker.category.title]
+        brokers = BROKERS[ticker.currency.code]
+        price = rng.uniform(*profile["price"])
+        held = 0
+        for number, month in enumerate(months):
+            price *= math.exp(rng.gauss(MONTHLY_DRIFT, MONTHLY_VOLATILITY))
+            day = month.replace(day=rng.randint(1, 28))
+            cost_price = Decimal(str(round(price, 2)))
+
+            if held and rng.random() < SELL_PROBABILITY:
+                lots = rng.randint(1, max(1, held // profile["lot_size"] // 2))
+                quantity = lots * profile["lot_size"]
+                trades.append(dict(
+                    ticker=ticker.name, date=day, type="venda", quantity=quantity,
+                    cost_price=cost_price, broker=brokers[0],
+                ))
+                held -= quantity
+            elif rng.random() < BUY_PROBABILITY:
+                quantity = rng.randint(*profile["lots"]) * profile["lot_size"]
+                subscription = ticker.category.title == "FII" and rng.random() < SUBSCRIPTION_PROBABILITY
+                trades.append(dict(
+                    ticker=ticker.name, date=day, type="subscrição" if subscription else "compra",
+                    quantity=quantity, cost_price=cost_price, broker=rng.choice(brokers),
+                ))
+                held += quantity
+
+            if held and number % profile["dividend_every"] == profile["dividend_every"] - 1:
+                dividends.append(dict(
+                    ticker=ticker.name, date=month.replace(day=28),
+                    value=Decimal(str(round(price * profile["dividend_yield"], 4))), quantity_quote=held,
+                ))
+
+    trades.sort(key=lambda trade: trade["date"])
+    return trades, dividends
+
+
+def write_trades_csv(file, trades):
+    """Grava as negociacoes no formato de lista_de_fiis.csv (lido por 'import_fiis')."""
+    writer = csv.writer(file)
+    writer.writerow(TRADE_FIELDS)
+    for trade in trades:
+        writer.writerow([
+            trade["ticker"], trade["date"].strftime("%d/%m/%Y"), trade["type"],
+            trade["quantity"], trade["cost_price"], trade["broker"],
+        ])
+
+
+@transaction.atomic
+def save_trades(trades):
+    """Grava as negociacoes com bulk_create e recalcula as posicoes dos tickers."""
+    tickers = dict(Ticker.objects.filter(name__in={trade["ticker"] for trade in trades}).values_list("name", "id"))
+    brokers = dict(Broker.objects.values_list("name", "id"))
+    inflows, outflows = [], []
+    for trade in trades:
+        values = dict(
+            ticker_id=tickers[trade["ticker"]], broker_id=brokers[trade["broker"]], date=trade["date"],
+            quantity=trade["quantity"], cost_price=trade["cost_price"],
+            # bulk_create nao chama save(), entao o total e calculado aqui
+            total_price=trade["cost_price"] * trade["quantity"],
+        )
+        if trade["type"] == "venda":
+            outflows.append(Outflow(**values))
+        else:
+            inflows.append(Inflow(type="Subscrição" if trade["type"] == "subscrição" else "Compra", **values))
+    Inflow.objects.bulk_create(inflows, batch_size=1000)
+    Outflow.objects.bulk_create(outflows, batch_size=1000)
+    if tickers:
+        rebuild_positions(ticker_ids=set(tickers.values()))
+    invalidate_metrics_cache()
+    return len(inflows), len(outflows)
+
+
+def save_dividends(dividends):
+    """Grava os dividendos com bulk_create, com a quantidade ja calculada pelo gerador."""
+    tickers = dict(Ticker.objects.filter(name__in={item["ticker"] for item in dividends}).values_list("name", "id"))
+    created = Dividend.objects.bulk_create(
+        [
+            Dividend(
+                ticker_id=tickers[item["ticker"]], date=item["date"], value=item["value"],
+                quantity_quote=item["quantity_quote"],
+                total_value=(item["value"] * item["quantity_quote"]).quantize(Decimal("0.01")),
+            )
+            for item in dividends
+        ],
+        batch_size=1000,
+    )
+    invalidate_metrics_cache()
+    return len(created)
+
+
+def generate_portfolio(tickers, years, seed=0):
+    """
+    Cria uma carteira sintetica completa no banco.
+
+    Args:
+        tickers: Numero de tickers, distribuidos entre as quatro categorias
+        years: Anos de historico mensal
+        seed: Semente do gerador aleatorio
+
+    Returns:
+        dict: Quantidade de tickers, compras, vendas e dividendos criados
+    """
+    created = create_tickers(tickers)
+    trades, dividends = ledger(created, years, seed)
+    inflows, outflows = save_trades(trades)
+    return dict(
+        tickers=len(created), inflows=inflows, outflows=outflows, dividends=save_dividends(dividends),
+    )
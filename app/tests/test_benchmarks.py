@@ -0,0 +1,116 @@
+"""
+Tests for the synthetic portfolio generator and the benchmark runner.
+"""
+import io
+import json
+from datetime import date
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from app import benchmarks, synthetic
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Position, Ticker
+from tickers.positions import position_as_of
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestSyntheticPortfolio:
+    """Tests for app.synthetic."""
+
+    def test_generate_portfolio(self, db):
+        """Test the tickers spread over the four categories with a consistent ledger."""
+        stats = synthetic.generate_portfolio(10, 2, seed=1)
+
+        assert stats["tickers"] == 10
+        assert (Inflow.objects.count(), Outflow.objects.count(), Dividend.objects.count()) == (
+            stats["inflows"], stats["outflows"], stats["dividends"]
+        )
+        counts = {title: Ticker.objects.filter(category__title=title).count() for title in synthetic.CATEGORIES}
+        assert counts == {"FII": 4, "Acao": 3, "Stock": 2, "ETF": 1}
+        assert set(Ticker.objects.filter(category__title="Stock").values_list("currency__code", flat=True)) == {"USD"}
+        assert not Inflow.objects.filter(ticker__category__title="Acao", quantity__lt=100).exists()
+        assert not Position.objects.filter(quantity__lt=0).exists()
+
+        dividend = Dividend.objects.order_by("id").first()
+        assert dividend.quantity_quote == position_as_of(dividend.ticker_id, dividend.date)["quantity"]
+
+    def test_ledger_is_deterministic(self, db):
+        """Test the same seed generates the same ledger, and new tickers get new codes."""
+        first = synthetic.create_tickers(5)
+        second = synthetic.create_tickers(5)
+        assert len({ticker.name for ticker in first + second}) == 10
+
+        today = date(2025, 1, 10)
+        assert synthetic.ledger(first, 2, seed=7, today=today) == synthetic.ledger(first, 2, seed=7, today=today)
+        trades, dividends = synthetic.ledger(first, 2, seed=7, today=today)
+        assert date(2023, 1, 1) <= trades[0]["date"] and trades[-1]["date"] < date(2025, 1, 1)
+        assert dividends
+
+    def test_csv_is_imported_by_import_fiis(self, db, tmp_path):
+        """Test the generated CSV follows the lista_de_fiis.csv format."""
+        path = tmp_path / "trades.csv"
+        call_command("generate_portfolio", "--tickers", "8", "--years", "1", "--csv", str(path), stdout=io.StringIO())
+        assert path.read_text(encoding="utf-8").startswith("ticker,date,type,quantity,cost_price,broker\n")
+        assert Inflow.objects.count() == 0
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_fiis", str(path), stdout=out, stderr=err)
+
+        rows = len(path.read_text(encoding="utf-8").splitlines()) - 1
+        assert Inflow.objects.count() + Outflow.objects.count() == rows
+        assert err.getvalue() == ""
+
+    def test_command(self, db):
+        """Test the command creates the portfolio and rejects invalid sizes."""
+        out = io.StringIO()
+        call_command("generate_portfolio", "--tickers", "4", "--years", "1", stdout=out)
+
+        assert Ticker.objects.count() == 4
+        assert "4 tickers" in out.getvalue()
+        with pytest.raises(CommandError):
+            call_command("generate_portfolio", "--tickers", "0")
+
+
+class TestBenchmarks:
+    """Tests for app.benchmarks."""
+
+    def test_parse_scale(self):
+        """Test scales are read as TICKERSxYEARS."""
+        assert benchmarks.parse_scale("50x5") == (50, 5)
+        for value in ("50", "0x2", "ax2"):
+            with pytest.raises(ValueError):
+                benchmarks.parse_scale(value)
+
+    def test_run_benchmarks(self, db):
+        """Test every stage is measured and the report is JSON serializable."""
+        report = benchmarks.run_benchmarks([(4, 1)], repeat=1)
+
+        [scale] = json.loads(json.dumps(report))["scales"]
+        assert (scale["tickers"], scale["years"]) == (4, 1)
+        assert set(scale["results"]) == {
+            "import", "dashboard", "negociations", "ticker_list", "ticker_detail", "dividend_list",
+        }
+        assert scale["results"]["import"]["rows"] == scale["rows"]["trades"]
+        assert scale["results"]["dashboard"]["queries"] > 0
+        assert scale["results"]["dashboard"]["cold"]["median"] > 0
+
+    def test_compare(self):
+        """Test the median change of each stage present in both reports."""
+        def report(dashboard, imported):
+            results = {"dashboard": {"cold": {"median": dashboard}}, "import": {"ms": imported}}
+            return dict(scales=[dict(tickers=10, years=2, results=results)])
+
+        rows = benchmarks.compare(report(100.0, 50.0), report(80.0, 50.0))
+
+        assert rows == [("10x2", "dashboard", 100.0, 80.0, -20.0), ("10x2", "import", 50.0, 50.0, 0.0)]
@@ -0,0 +1,80 @@
+"""
+Tests for the dashboard snapshot builder.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from django.core.cache import cache
+
+from app import metrics
+from app.dashboard import DashboardSnapshot
+from dividends.models import Dividend
+from inflows.models import Inflow
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def portfolio(ticker_fii, ticker_acao, ticker_stock, broker_xp, broker_inter):
+    """Create trades and dividends across currencies, brokers and categories."""
+    Inflow.objects.create(
+        ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("150.00"), quantity=10,
+        date=date.today() - timedelta(days=40),
+    )
+    Inflow.objects.create(
+        ticker=ticker_acao, broker=broker_inter, cost_price=Decimal("35.00"), quantity=100,
+        date=date.today() - timedelta(days=10),
+    )
+    Inflow.objects.create(
+        ticker=ticker_stock, broker=broker_inter, cost_price=Decimal("180.00"), quantity=5,
+        date=date.today() - timedelta(days=5),
+    )
+    Dividend.objects.create(
+        ticker=ticker_fii, value=Decimal("1.10"), date=date.today() - timedelta(days=20),
+    )
+
+
+class TestDashboardSnapshot:
+    """Tests for DashboardSnapshot."""
+
+    def test_snapshot_matches_individual_metrics(self, portfolio):
+        """Test the snapshot series match the per-metric functions."""
+        snapshot = DashboardSnapshot.get()
+
+        assert snapshot.total_invested == metrics.get_total_invested()
+        assert snapshot.applied_by_currency == metrics.get_total_applied_by_currency()
+        assert snapshot.broker_invested == metrics.get_total_applied_by_broker()
+        assert snapshot.category_invested == metrics.chart_total_category_invested()
+        assert snapshot.applied_value("BRL") == metrics.get_applied_value("BRL")
+        assert snapshot.last_six_months == metrics.get_last_six_month()
+        assert snapshot.dividends_category("FII") == metrics.get_total_dividends_category("FII")
+
+    def test_unknown_category_returns_zeros(self, portfolio):
+        """Test categories without dividends get a zeroed series."""
+        snapshot = DashboardSnapshot.get()
+        assert snapshot.dividends_category("ETF") == {"values": [0] * 7}
+
+    def test_cold_build_uses_grouped_queries(self, portfolio, django_assert_max_num_queries):
+        """Test a cold snapshot costs a handful of queries (plus the FX series)."""
+        with django_assert_max_num_queries(5):
+            DashboardSnapshot.get()
+
+    def test_warm_snapshot_hits_no_database(self, portfolio, django_assert_num_queries):
+        """Test a cached snapshot is served without queries."""
+        DashboardSnapshot.get()
+        with django_assert_num_queries(0):
+            DashboardSnapshot.get()
+
+    def test_invalidate_metrics_cache_drops_snapshot(self, portfolio):
+        """Test invalidating the metrics cache also drops the snapshot."""
+        DashboardSnapshot.get()
+        key = DashboardSnapshot.cache_key()
+        metrics.invalidate_metrics_cache()
+        assert DashboardSnapshot.cache_key() != key
+        assert cache.get(DashboardSnapshot.cache_key()) is None
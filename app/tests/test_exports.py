@@ -0,0 +1,153 @@
+"""
+Tests for the streaming ledger export.
+"""
+import csv
+import io
+import tracemalloc
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from app import exports
+from app.exports import export_stream
+from dividends.models import Dividend
+from inflows.models import Inflow
+
+
+@pytest.fixture
+def authenticated_client(client, db):
+    """Return an authenticated client."""
+    User.objects.create_user(username="testuser", password="testpass123")
+    client.login(username="testuser", password="testpass123")
+    return client
+
+
+@pytest.fixture
+def ledger(ticker_fii, ticker_acao, broker_xp, broker_inter):
+    """Create trades and dividends across tickers, brokers and years."""
+    Inflow.objects.create(ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("150.00"), quantity=10, date=date(2023, 5, 2))
+    Inflow.objects.create(ticker=ticker_acao, broker=broker_inter, cost_price=Decimal("35.00"), quantity=100, date=date(2024, 3, 1))
+    Dividend.objects.create(ticker=ticker_fii, value=Decimal("1.10"), date=date(2023, 6, 15))
+    Dividend.objects.create(ticker=ticker_fii, value=Decimal("1.20"), date=date(2024, 6, 15))
+
+
+def read_csv(response):
+    content = b"".join(response.streaming_content).decode()
+    return list(csv.reader(io.StringIO(content)))
+
+
+class TestExportViews:
+    """Tests for the export endpoints."""
+
+    def test_inflows_csv_with_list_filters(self, authenticated_client, ledger, ticker_acao):
+        """Test the CSV export applies the InflowListView filters."""
+        url = reverse("export_ledger", args=["inflows", "csv"])
+
+        rows = read_csv(authenticated_client.get(url))
+        assert rows[0] == ["Data", "Ticker", "Categoria", "Moeda", "Corretora", "Quantidade", "Preco", "Taxas", "Total"]
+        assert [row[1] for row in rows[1:]] == ["HGLG11", "PETR4"]
+
+        response = authenticated_client.get(url, {"ticker": ticker_acao.id, "date_from": "2024-01-01"})
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        assert "attachment" in response["Content-Disposition"]
+        assert read_csv(response)[1:] == [
+            ["2024-03-01", "PETR4", "Acao", "BRL", "Banco Inter", "100", "35.00", "0.00", "3500.00"]
+        ]
+
+    def test_dividends_csv_with_list_filters(self, authenticated_client, ledger):
+        """Test the CSV export applies the DividendListView filters."""
+        response = authenticated_client.get(reverse("export_ledger", args=["dividends", "csv"]), {"year": "2024"})
+
+        rows = read_csv(response)
+        assert [(row[0], row[1], row[7]) for row in rows[1:]] == [("2024-06-15", "HGLG11", "12.00")]
+
+    def test_xlsx(self, authenticated_client, ledger):
+        """Test the XLSX export is a valid workbook with one row per record."""
+        response = authenticated_client.get(reverse("export_ledger", args=["outflows", "xlsx"]))
+        assert response.streaming
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        assert archive.testzip() is None
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        assert sheet.count("<row>") == 1
+        assert "<t>Corretora</t>" in sheet
+
+        response = authenticated_client.get(reverse("export_ledger", args=["inflows", "xlsx"]))
+        sheet = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))).read("xl/worksheets/sheet1.xml")
+        assert sheet.count(b"<row>") == 3
+        assert b"<c><v>3500.00</v></c>" in sheet
+
+    def test_invalid_requests(self, authenticated_client, ledger):
+        """Test unknown datasets, formats and invalid filters return 404."""
+        assert authenticated_client.get(reverse("export_ledger", args=["quotes", "csv"])).status_code == 404
+        assert authenticated_client.get(reverse("export_ledger", args=["inflows", "pdf"])).status_code == 404
+        assert authenticated_client.get(reverse("export_ledger", args=["inflows", "csv"]), {"ticker": "x"}).status_code == 404
+        assert authenticated_client.get(reverse("export_ledger", args=["dividends", "csv"]), {"month": "13"}).status_code == 404
+
+
+class TestExportCommand:
+    """Tests for the export_ledger command."""
+
+    def test_csv_to_stdout(self, ledger):
+        """Test the CSV is written to the standard output."""
+        out = io.StringIO()
+        call_command("export_ledger", "dividends", "--year", "2023", stdout=out)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        assert len(rows) == 2
+        assert rows[1][1] == "HGLG11"
+
+    def test_xlsx_to_file(self, ledger, tmp_path):
+        """Test the XLSX is written to the output file."""
+        output = tmp_path / "inflows.xlsx"
+        call_command("export_ledger", "inflows", "--format", "xlsx", "--output", str(output), stdout=io.StringIO())
+
+        assert zipfile.ZipFile(output).read("xl/worksheets/sheet1.xml").count(b"<row>") == 3
+
+    def test_errors(self, ledger):
+        """Test XLSX without an output file and invalid filters are rejected."""
+        with pytest.raises(CommandError):
+            call_command("export_ledger", "inflows", "--format", "xlsx")
+        with pytest.raises(CommandError):
+            call_command("export_ledger", "dividends", "--currency", "X1")
+
+
+class TestExportMemory:
+    """Tests for the streaming behaviour on large ledgers."""
+
+    def test_memory_stays_flat(self, ticker_fii, monkeypatch):
+        """Test an export holds one chunk of rows in memory, never the whole ledger."""
+        monkeypatch.setattr(exports, "CHUNK_SIZE", 500)
+        start = date(2000, 1, 1)
+        Dividend.objects.bulk_create(
+            [
+                Dividend(
+                    ticker=ticker_fii, value=Decimal("1.00"), quantity_quote=10, total_value=Decimal("10.00"),
+                    date=start + timedelta(days=i % 9000),
+                )
+                for i in range(25_000)
+            ],
+            batch_size=5000,
+        )
+
+        sizes = {}
+        for file_format in ("csv", "xlsx"):
+            tracemalloc.start()
+            try:
+                size = chunks = 0
+                for chunk in export_stream("dividends", file_format):
+                    size += len(chunk)
+                    chunks += 1
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            sizes[file_format] = size
+            assert chunks > 1
+            assert peak < 1024 * 1024
+        assert sizes["csv"] > 1024 * 1024
@@ -0,0 +1,200 @@
+"""
+Tests for the request instrumentation middleware and the per-view query budgets.
+"""
+import json
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from app.benchmarks import offline_services
+from app.instrumentation import RequestMetricsMiddleware, external_call, registry
+from categories.models import Category
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from services.fees_br import GetFeeBr
+from tickers.models import Ticker
+
+# Maximum queries per view with cold caches, whatever the portfolio size
+# (includes the session and user lookups)
+QUERY_BUDGETS = {
+    "home": 7,
+    "negociations": 3,
+    "ticker_list": 6,
+    "ticker_details": 5,
+    "inflow_list": 6,
+    "outflow_list": 4,
+    "dividend_list": 6,
+    "dashboard_series": 7,
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache and registry."""
+    cache.clear()
+    registry.reset()
+    yield
+    cache.clear()
+    registry.reset()
+
+
+def build_portfolio(size, brokers, currency):
+    """Create 'size' tickers per category, each with monthly buys, a sale and dividends."""
+    start = date.today() - timedelta(days=400)
+    offset = Ticker.objects.count()
+    for category in Category.objects.all():
+        for number in range(offset, offset + size):
+            ticker = Ticker.objects.create(name=f"{category.title[:3].upper()}{number}", category=category, currency=currency)
+            for month in range(3):
+                Inflow.objects.create(
+                    ticker=ticker, broker=brokers[month % len(brokers)], cost_price=Decimal("10.00"), quantity=10,
+                    date=start + timedelta(days=30 * month),
+                )
+            Outflow.objects.create(
+                ticker=ticker, broker=brokers[0], cost_price=Decimal("12.00"), quantity=5, date=start + timedelta(days=120),
+            )
+            Dividend.objects.create(ticker=ticker, value=Decimal("0.10"), date=start + timedelta(days=150))
+
+
+@pytest.fixture
+def authenticated_client(client, db):
+    """Return an authenticated client."""
+    User.objects.create_user(username="testuser", password="testpass123")
+    client.login(username="testuser", password="testpass123")
+    return client
+
+
+def logged_requests(caplog):
+    return [record.request_metrics for record in caplog.records if hasattr(record, "request_metrics")]
+
+
+class TestRequestMetricsMiddleware:
+    """Tests for the per-request measurements."""
+
+    def test_logs_one_structured_line_per_request(self, authenticated_client, inflow_fii, caplog):
+        """Test the log line carries the view, the SQL counters and the latency."""
+        with caplog.at_level(logging.INFO, logger="app.requests"):
+            authenticated_client.get(reverse("negociations"))
+
+        [fields] = logged_requests(caplog)
+        assert (fields["view"], fields["method"], fields["status"]) == ("negociations", "GET", 200)
+        assert fields["queries"] == 3
+        assert fields["duration_ms"] >= fields["sql_ms"] > 0
+        assert json.loads(caplog.records[-1].getMessage().removeprefix("request ")) == fields
+
+    def test_measures_responses_from_other_middlewares(self, client, settings, caplog):
+        """Test the middleware wraps the whole stack, so short-circuited requests are measured too."""
+        settings.SECURE_SSL_REDIRECT = True
+        with caplog.at_level(logging.INFO, logger="app.requests"):
+            response = client.get(reverse("negociations"))
+
+        assert response.status_code == 301
+        [fields] = logged_requests(caplog)
+        assert (fields["path"], fields["status"]) == (reverse("negociations"), 301)
+
+    def test_slow_requests_are_warnings(self, authenticated_client, caplog, monkeypatch):
+        """Test requests above REQUEST_METRICS_SLOW_MS are logged as WARNING."""
+        monkeypatch.setattr("app.instrumentation.SLOW_REQUEST_MS", -1)
+        with caplog.at_level(logging.INFO, logger="app.requests"):
+            authenticated_client.get(reverse("negociations"))
+
+        assert caplog.records[-1].levelno == logging.WARNING
+
+    def test_counts_metrics_cache_hits_and_misses(self, authenticated_client, inflow_fii, caplog):
+        """Test a cold dashboard request misses the metrics cache and a warm one hits it."""
+        url = reverse("dashboard_series", args=["categories"])
+        with caplog.at_level(logging.INFO, logger="app.requests"):
+            authenticated_client.get(url)
+            authenticated_client.get(url)
+
+        cold, warm = logged_requests(caplog)
+        assert cold["cache_misses"] > 0
+        assert (warm["cache_hits"], warm["cache_misses"]) == (1, 0)
+        assert warm["queries"] < cold["queries"]
+
+    def test_times_external_calls_made_in_worker_threads(self, stub_server, settings):
+        """Test BrasilAPI calls fetched in parallel are charged to the request."""
+        settings.BRASILAPI_TAXAS_URL = f"{stub_server.url}/taxas"
+        for sigla in ("IPCA", "SELIC", "CDI"):
+            stub_server.routes[f"/taxas/{sigla}"] = {"nome": sigla, "valor": 1.0}
+
+        def view(request):
+            GetFeeBr().get_taxas(["IPCA", "SELIC", "CDI"])
+            return HttpResponse()
+
+        RequestMetricsMiddleware(view)(RequestFactory().get("/"))
+
+        [((name, service), (calls, seconds))] = registry.external.items()
+        assert (name, service, calls) == ("<unresolved>", "brasilapi", 3)
+        assert seconds > 0
+
+    def test_nothing_is_recorded_outside_requests(self):
+        """Test external_call is a no-op in commands and background threads."""
+        with external_call("brapi"):
+            pass
+        assert registry.external == {}
+
+
+class TestPrometheusEndpoint:
+    """Tests for the Prometheus text endpoint."""
+
+    def test_requires_staff_or_token(self, authenticated_client, client, settings):
+        """Test regular users are denied and the scraper token is accepted."""
+        url = reverse("prometheus_metrics")
+        assert authenticated_client.get(url).status_code == 403
+
+        settings.METRICS_TOKEN = "secret"
+        assert client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+        assert client.get(url, HTTP_AUTHORIZATION="Bearer secret").status_code == 200
+
+    def test_exposition_format(self, admin_client, inflow_fii):
+        """Test the counters and the latency histogram of each view are exposed."""
+        admin_client.get(reverse("negociations"))
+        admin_client.get(reverse("negociations"))
+        response = admin_client.get(reverse("prometheus_metrics"))
+
+        assert response["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+        body = response.content.decode()
+        assert 'investsio_http_requests_total{view="negociations",method="GET",status="200"} 2' in body
+        assert 'investsio_http_request_duration_seconds_bucket{view="negociations",le="+Inf"} 2' in body
+        assert 'investsio_sql_queries_total{view="negociations"} 6' in body
+        assert "# TYPE investsio_metrics_cache_lookups_total counter" in body
+
+
+class TestQueryBudgets:
+    """The query count of each view must stay within budget and not grow with the rows."""
+
+    @pytest.fixture
+    def urls(self, category_fii, category_acao, category_stock, category_etf):
+        def build(ticker):
+            return {
+                "home": reverse("home"),
+                "negociations": reverse("negociations"),
+                "ticker_list": reverse("ticker_list", args=["FII"]),
+                "ticker_details": reverse("ticker_details", args=["FII", ticker.pk]),
+                "inflow_list": reverse("inflow_list"),
+                "outflow_list": reverse("outflow_list"),
+                "dividend_list": reverse("dividend_list"),
+                "dashboard_series": reverse("dashboard_series", args=["categories"]),
+            }
+        return build
+
+    def test_views_within_budget(self, urls, assert_query_budget, broker_xp, broker_inter, currency_brl):
+        """Test each view stays within QUERY_BUDGETS with 4 and with 24 tickers."""
+        counts = []
+        for size in (1, 6):
+            build_portfolio(size, [broker_xp, broker_inter], currency_brl)
+            ticker = Ticker.objects.filter(category__title="FII").first()
+            with offline_services():
+                counts.append({
+                    name: assert_query_budget(url, QUERY_BUDGETS[name]) for name, url in urls(ticker).items()
+                })
+        assert counts[0] == counts[1]
+        assert registry.external == {}
@@ -0,0 +1,184 @@
+"""
+Tests for app.metrics functions.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from django.core.cache import cache
+
+from app import metrics
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestCategoryTotals:
+    """Tests for the grouped category totals."""
+
+    def test_totals_for_all_categories(self, ticker_fii, ticker_acao, category_stock, broker_xp):
+        """Test every category is returned with raw Decimal totals."""
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("100.00"), quantity=10,
+            date=date.today() - timedelta(days=20),
+        )
+        Outflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("110.00"), quantity=2,
+            date=date.today() - timedelta(days=10),
+        )
+        Inflow.objects.create(
+            ticker=ticker_acao, broker=broker_xp, cost_price=Decimal("35.50"), quantity=100,
+            date=date.today() - timedelta(days=5),
+        )
+
+        totals = metrics.get_category_totals()
+
+        assert totals["FII"]["total_invested"] == Decimal("780.00")
+        assert totals["Acao"]["total_invested"] == Decimal("3550.00")
+        assert totals["Stock"] == dict(total_invested=Decimal("0"), amount_ticker_by_category=0)
+        assert totals["FII"]["amount_ticker_by_category"] == 1
+
+    def test_totals_use_single_query(self, ticker_fii, ticker_acao, django_assert_num_queries):
+        """Test the totals of all categories cost one query."""
+        with django_assert_num_queries(1):
+            metrics.get_category_totals()
+
+    def test_chart_values_are_not_rounded_through_strings(self, ticker_fii, broker_xp):
+        """Test the chart receives the raw value, without pt-BR string parsing."""
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("1234.56"), quantity=1000,
+            date=date.today() - timedelta(days=1),
+        )
+        assert metrics.chart_total_category_invested() == {"FII": 1234560.0}
+
+    def test_total_category_invested_is_formatted(self, ticker_fii, broker_xp):
+        """Test the per category helper returns a display string."""
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("1234.56"), quantity=1,
+            date=date.today() - timedelta(days=1),
+        )
+        result = metrics.get_total_category_invested("FII")
+        assert result["total_invested"] == "1.234,56"
+        assert result["amount_ticker_by_category"] == 1
+
+
+class TestEventInvalidation:
+    """Tests for the generation based, signal driven invalidation."""
+
+    def test_inflow_invalidates_only_its_currency(
+        self, ticker_fii, ticker_stock, broker_xp, django_capture_on_commit_callbacks
+    ):
+        """Test a BRL trade bumps the BRL series and totals, not the USD series."""
+        brl_key = metrics.versioned_key("applied_value_BRL", metrics.currency_scope("BRL"))
+        usd_key = metrics.versioned_key("applied_value_USD", metrics.currency_scope("USD"))
+        total_key = metrics.versioned_key("total_invested", metrics.SCOPE_INFLOWS)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Inflow.objects.create(
+                ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today() - timedelta(days=1),
+            )
+
+        assert metrics.versioned_key("applied_value_BRL", metrics.currency_scope("BRL")) != brl_key
+        assert metrics.versioned_key("applied_value_USD", metrics.currency_scope("USD")) == usd_key
+        assert metrics.versioned_key("total_invested", metrics.SCOPE_INFLOWS) != total_key
+
+    def test_cached_total_is_refreshed_after_trade(self, ticker_fii, broker_xp, django_capture_on_commit_callbacks):
+        """Test the dashboard totals are not stale after a new trade."""
+        assert metrics.get_total_invested() == 0
+        with django_capture_on_commit_callbacks(execute=True):
+            Inflow.objects.create(
+                ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("10.00"), quantity=3,
+                date=date.today() - timedelta(days=1),
+            )
+        assert metrics.get_total_invested() == 30.0
+
+    def test_outflow_keeps_inflow_totals(self, inflow_fii, django_capture_on_commit_callbacks):
+        """Test a sale refreshes positions but not the inflow based totals."""
+        total_key = metrics.versioned_key("total_invested", metrics.SCOPE_INFLOWS)
+        positions_key = metrics.versioned_key("category_totals", metrics.SCOPE_POSITIONS)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Outflow.objects.create(
+                ticker=inflow_fii.ticker, broker=inflow_fii.broker, cost_price=Decimal("155.00"), quantity=1,
+                date=date.today(),
+            )
+
+        assert metrics.versioned_key("total_invested", metrics.SCOPE_INFLOWS) == total_key
+        assert metrics.versioned_key("category_totals", metrics.SCOPE_POSITIONS) != positions_key
+
+    def test_dividend_outside_window_is_ignored(self, inflow_fii, ticker_acao, django_capture_on_commit_callbacks):
+        """Test only dividends inside the dashboard window bump their category."""
+        fii_key = metrics.versioned_key("dividends_FII", metrics.category_scope("FII"))
+        acao_key = metrics.versioned_key("dividends_Acao", metrics.category_scope("Acao"))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Dividend.objects.create(
+                ticker=inflow_fii.ticker, value=Decimal("1"), date=date.today() - timedelta(days=400),
+            )
+        assert metrics.versioned_key("dividends_FII", metrics.category_scope("FII")) == fii_key
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Dividend.objects.create(ticker=inflow_fii.ticker, value=Decimal("1"), date=date.today())
+        assert metrics.versioned_key("dividends_FII", metrics.category_scope("FII")) != fii_key
+        assert metrics.versioned_key("dividends_Acao", metrics.category_scope("Acao")) == acao_key
+
+    def test_ticker_category_change_bumps_both_categories(
+        self, ticker_fii, category_acao, category_stock, django_capture_on_commit_callbacks
+    ):
+        """Test moving a ticker invalidates the old and new categories only."""
+        keys = {
+            title: metrics.versioned_key(title, metrics.category_scope(title))
+            for title in ("FII", "Acao", "Stock")
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            ticker_fii.category = category_acao
+            ticker_fii.save()
+
+        assert metrics.versioned_key("FII", metrics.category_scope("FII")) != keys["FII"]
+        assert metrics.versioned_key("Acao", metrics.category_scope("Acao")) != keys["Acao"]
+        assert metrics.versioned_key("Stock", metrics.category_scope("Stock")) == keys["Stock"]
+
+    def test_ticker_quantity_update_does_not_invalidate(self, ticker_fii, django_capture_on_commit_callbacks):
+        """Test quantity-only ticker saves keep the grouped metrics cached."""
+        key = metrics.versioned_key("category_totals", metrics.SCOPE_TICKERS)
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            ticker_fii.quantity = 5
+            ticker_fii.save(update_fields=["quantity"])
+
+        assert callbacks == []
+        assert metrics.versioned_key("category_totals", metrics.SCOPE_TICKERS) == key
+
+    def test_invalidate_metrics_cache_bumps_every_key(self, ticker_fii):
+        """Test the global invalidation reaches every scope in O(1)."""
+        key = metrics.versioned_key("applied_value_BRL", metrics.currency_scope("BRL"))
+        metrics.invalidate_metrics_cache()
+        assert metrics.versioned_key("applied_value_BRL", metrics.currency_scope("BRL")) != key
+
+
+class TestTickerMetrics:
+    """Tests for get_ticker_metrics."""
+
+    def test_target_date_reads_position_history(self, ticker_fii, broker_xp, django_assert_num_queries):
+        """Test a historical date is answered with one lookup, matching the history."""
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("100.00"), quantity=10,
+            date=date.today() - timedelta(days=20),
+        )
+        Outflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("110.00"), quantity=2,
+            date=date.today() - timedelta(days=10),
+        )
+
+        with django_assert_num_queries(1):
+            past = metrics.get_ticker_metrics(ticker_fii, target_date=date.today() - timedelta(days=15))
+
+        assert past == dict(total_price=1000.0, total_quantity=10.0, avarange_price=100.0)
+        assert metrics.get_ticker_metrics(ticker_fii, target_date=date.today()) == metrics.get_ticker_metrics(ticker_fii)
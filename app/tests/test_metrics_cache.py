@@ -0,0 +1,163 @@
+"""
+Tests for the metrics cache infrastructure (versioned keys and stampede protection).
+"""
+import threading
+import time
+import pytest
+from django.core.cache import cache
+
+from app import metrics_cache
+from app.metrics_cache import cached_metric, get_or_compute, versioned_key
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestGetOrCompute:
+    """Tests for get_or_compute."""
+
+    def test_value_is_computed_once(self):
+        """Test the second call is served from the cache."""
+        calls = []
+        for _ in range(2):
+            assert get_or_compute("answer", ["s"], lambda: calls.append(1) or 42) == 42
+        assert len(calls) == 1
+
+    def test_concurrent_cold_miss_computes_once(self):
+        """Test concurrent workers wait for a single recomputation."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute("slow", ["s"], compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ["value"] * 5
+
+    def test_previous_value_served_while_locked(self):
+        """Test an invalidated key serves the previous value while another worker recomputes."""
+        get_or_compute("metric", ["s"], lambda: "old")
+        metrics_cache.bump_generations(["s"])
+        cache.add(f"{versioned_key('metric', 's')}:lock", 1)
+
+        assert get_or_compute("metric", ["s"], lambda: "new") == "old"
+
+    def test_recomputes_without_lock_after_wait(self, monkeypatch):
+        """Test a worker computes by itself if the lock holder never finishes."""
+        monkeypatch.setattr(metrics_cache, "LOCK_WAIT", 0.1)
+        cache.add(f"{versioned_key('orphan', 's')}:lock", 1)
+
+        assert get_or_compute("orphan", ["s"], lambda: "value") == "value"
+
+
+class TestEarlyRefresh:
+    """Tests for the XFetch probabilistic early expiration."""
+
+    def test_fresh_entry_is_kept(self):
+        """Test an entry far from expiring is not refreshed."""
+        entry = dict(value=1, delta=0.01, expiry=time.time() + 3600)
+        assert not metrics_cache._should_refresh_early(entry)
+
+    def test_expired_entry_is_refreshed(self):
+        """Test an entry past its expiry is always refreshed."""
+        entry = dict(value=1, delta=0.01, expiry=time.time() - 1)
+        assert metrics_cache._should_refresh_early(entry)
+
+    def test_early_refresh_recomputes(self, monkeypatch):
+        """Test an entry selected for early refresh is recomputed."""
+        get_or_compute("early", ["s"], lambda: "old")
+        metrics_cache.local_cache.clear()
+        monkeypatch.setattr(metrics_cache, "_should_refresh_early", lambda entry: True)
+        assert get_or_compute("early", ["s"], lambda: "new") == "new"
+
+
+class TestCachedMetric:
+    """Tests for the cached_metric decorator."""
+
+    def test_key_and_scopes_are_formatted_with_arguments(self):
+        """Test each argument gets its own entry and scope."""
+        calls = []
+
+        @cached_metric("metric_{0}", "currency:{0}")
+        def metric(code):
+            calls.append(code)
+            return code.lower()
+
+        assert metric("BRL") == "brl"
+        assert metric("USD") == "usd"
+        assert metric("BRL") == "brl"
+        assert calls == ["BRL", "USD"]
+
+        metrics_cache.bump_generations(["currency:BRL"])
+        metric("BRL")
+        metric("USD")
+        assert calls == ["BRL", "USD", "BRL"]
+
+
+class TestTwoTierCache:
+    """Tests for the in-process tier in front of the shared cache."""
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Test a warm key is served locally, without reading the shared cache."""
+        metrics_cache.reset_cache_stats()
+        get_or_compute("hot", ["s"], lambda: "value")
+        cache.delete(versioned_key("hot", "s"))
+
+        assert get_or_compute("hot", ["s"], lambda: "other") == "value"
+        stats = metrics_cache.cache_stats()
+        assert stats["local_hits"] == 1
+        assert stats["remote_misses"] == 1
+
+    def test_remote_hit_fills_local_tier(self):
+        """Test a value found in the shared cache is copied to the local tier."""
+        get_or_compute("warm", ["s"], lambda: "value")
+        metrics_cache.local_cache.clear()
+        metrics_cache.reset_cache_stats()
+
+        get_or_compute("warm", ["s"], lambda: "other")
+        get_or_compute("warm", ["s"], lambda: "other")
+        assert metrics_cache.cache_stats() == dict(local_hits=1, local_misses=1, remote_hits=1, remote_misses=0)
+
+    def test_bump_in_process_is_seen_immediately(self):
+        """Test the local generation is dropped when this process bumps it."""
+        get_or_compute("metric", ["s"], lambda: "old")
+        metrics_cache.bump_generations(["s"])
+        assert get_or_compute("metric", ["s"], lambda: "new") == "new"
+
+    def test_bump_from_other_worker_is_seen_after_local_ttl(self, monkeypatch):
+        """Test a generation bumped elsewhere is picked up once the local copy expires."""
+        monkeypatch.setattr(metrics_cache.local_cache, "ttl", 0.05)
+        get_or_compute("metric", ["s"], lambda: "old")
+        cache.incr("metrics_generation_s")  # outro worker
+
+        assert get_or_compute("metric", ["s"], lambda: "new") == "old"
+        time.sleep(0.06)
+        assert get_or_compute("metric", ["s"], lambda: "new") == "new"
+
+    def test_lru_is_bounded(self):
+        """Test the least recently used entries are evicted."""
+        lru = metrics_cache.LocalCache(maxsize=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        assert lru.get("a") == 1
+        assert lru.get("b") is None
+        assert len(lru) == 2
@@ -0,0 +1,146 @@
+"""
+Tests for the target allocation rebalancing planner.
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from app.rebalance import allocate, get_allocation_snapshot, plan_rebalance
+from inflows.models import Inflow
+from tickers.models import Quote, TargetAllocation, Ticker
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestAllocate:
+    """Tests for the lot allocation kernel."""
+
+    def test_splits_cash_in_proportion_to_shortfalls(self):
+        """Test whole lots follow the shortfalls and the change tops up the largest one."""
+        lots, leftover = allocate([0, 0], [10.0, 10.0], [1, 1], [0.75, 0.25], 100)
+
+        assert lots.tolist() == [8, 2]
+        assert leftover == pytest.approx(0)
+
+    def test_respects_lot_sizes(self):
+        """Test a ticker is skipped when a full lot does not fit."""
+        lots, leftover = allocate([0, 0], [10.0, 30.0], [1, 100], [0.5, 0.5], 1000)
+
+        assert lots.tolist() == [50, 0]
+        assert leftover == pytest.approx(500)
+
+    def test_tickers_without_price_are_not_bought(self):
+        """Test NaN prices are left out and their share stays as leftover."""
+        lots, leftover = allocate([0, 0], [np.nan, 10.0], [1, 1], [0.5, 0.5], 100)
+
+        assert lots.tolist() == [0, 5]
+        assert leftover == pytest.approx(50)
+
+    def test_overweight_portfolio_buys_nothing(self):
+        """Test tickers above target are never bought."""
+        lots, leftover = allocate([1000, 0], [10.0, 10.0], [1, 1], [1.0, 0.0], 0)
+
+        assert lots.tolist() == [0, 0]
+        assert leftover == 0
+
+    def test_hundreds_of_tickers_in_milliseconds(self):
+        """Test the planner scales to large portfolios."""
+        rng = np.random.default_rng(42)
+        n = 1000
+        values = rng.uniform(0, 10000, n)
+        prices = rng.uniform(1, 200, n)
+        lot_sizes = rng.choice([1, 100], n)
+        weights = rng.dirichlet(np.ones(n))
+
+        started = time.perf_counter()
+        lots, leftover = allocate(values, prices, lot_sizes, weights, 250000)
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.1
+        assert (lots * prices * lot_sizes).sum() + leftover == pytest.approx(250000)
+
+
+class TestPlanRebalance:
+    """Tests for the planner over the stored positions and targets."""
+
+    @pytest.fixture
+    def portfolio(self, ticker_fii, ticker_acao, ticker_stock, broker_xp, category_fii, category_acao):
+        """FII at R$ 1.600 (quoted) and a 100-share lot of PETR4 at R$ 3.000 (average cost), 50/50 targets."""
+        day = date.today() - timedelta(days=30)
+        Inflow.objects.create(ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("150.00"), quantity=10, date=day)
+        Inflow.objects.create(ticker=ticker_acao, broker=broker_xp, cost_price=Decimal("30.00"), quantity=100, date=day)
+        Quote.objects.create(ticker=ticker_fii, price=Decimal("160.00"), updated_at=timezone.now())
+        ticker_acao.lot_size = 100
+        ticker_acao.save()
+        TargetAllocation.objects.create(category=category_fii, weight=Decimal("50"))
+        TargetAllocation.objects.create(category=category_acao, weight=Decimal("50"))
+
+    def test_plan(self, portfolio):
+        """Test the plan buys the underweight category within whole lots."""
+        plan = plan_rebalance(Decimal("5000"), "BRL")
+
+        assert plan["orders"] == [dict(
+            ticker="HGLG11", category="FII", currency="BRL", lots=20, quantity=20, price=160.0, value=3200.0
+        )]
+        assert (plan["spent"], plan["leftover"]) == (3200.0, 1800.0)
+        assert plan["allocation"]["FII"] == dict(target=50.0, current=34.78, planned=61.54)
+        assert plan["allocation"]["Stock"]["target"] == 0.0
+
+    def test_plan_with_current_quotes(self, portfolio):
+        """Test quotes passed in replace the stored ones."""
+        plan = plan_rebalance(5000, "BRL", quotes={"PETR4": Decimal("15.00")})
+
+        assert [(order["ticker"], order["quantity"]) for order in plan["orders"]] == [("HGLG11", 16), ("PETR4", 100)]
+        assert plan["leftover"] == 940.0
+
+    def test_ticker_targets_inside_category(self, portfolio, currency_brl, category_fii):
+        """Test ticker weights split their category and tickers without one get nothing."""
+        other = Ticker.objects.create(name="KNRI11", category=category_fii, currency=currency_brl)
+        Quote.objects.create(ticker=other, price=Decimal("100.00"), updated_at=timezone.now())
+        TargetAllocation.objects.create(ticker=other, weight=Decimal("100"))
+
+        plan = plan_rebalance(5000, "BRL")
+
+        assert [order["ticker"] for order in plan["orders"]] == ["KNRI11"]
+
+    def test_snapshot_is_cached_and_invalidated(
+        self, portfolio, category_fii, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        """Test plans reuse the cached snapshot until a target changes."""
+        plan_rebalance(5000, "BRL")
+        with django_assert_num_queries(0):
+            plan_rebalance(1000, "BRL")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TargetAllocation.objects.filter(category=category_fii).get().delete()
+        with django_assert_num_queries(2):
+            snapshot = get_allocation_snapshot()
+        assert dict(zip(snapshot.names, snapshot.weight.tolist())) == {"AAPL": 0.0, "HGLG11": 0.0, "PETR4": 1.0}
+
+    def test_cash_must_be_positive(self, portfolio):
+        """Test a zero contribution is rejected."""
+        with pytest.raises(ValueError):
+            plan_rebalance(0)
+
+    def test_command(self, portfolio):
+        """Test the command prints the orders and the totals."""
+        out = StringIO()
+        call_command("plan_rebalance", "5000,00", "--currency", "brl", stdout=out)
+
+        assert "HGLG11" in out.getvalue()
+        assert "1 ordens, BRL 3200.00 investidos, BRL 1800.00 de sobra" in out.getvalue()
+        with pytest.raises(CommandError):
+            call_command("plan_rebalance", "abc")
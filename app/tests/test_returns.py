@@ -0,0 +1,148 @@
+"""
+Tests for the portfolio returns engine.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from app.returns import get_portfolio_returns, time_weighted_return, xirr
+from app.metrics_cache import SCOPE_QUOTES, bump_generations
+from brokers.models import ExchangeRate
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Quote, Ticker
+from tickers.positions import rebuild_positions
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestReturnMath:
+    """Tests for the vectorized XIRR and TWR kernels."""
+
+    def test_xirr_solves_every_group_at_once(self):
+        """Test each group gets its own rate and groups without a sign change get NaN."""
+        groups = np.array([0, 0, 1, 1, 2])
+        days = np.array([0, 365, 0, 365, 0])
+        amounts = np.array([-1000.0, 1100.0, -100.0, 50.0, -10.0])
+
+        rates = xirr(groups, days, amounts, 3)
+
+        np.testing.assert_allclose(rates[:2], [0.10, -0.50], atol=1e-8)
+        assert np.isnan(rates[2])
+
+    def test_xirr_with_intermediate_flows(self):
+        """Test the rate zeroes the NPV of irregular flows."""
+        days = np.array([0, 90, 200, 500])
+        amounts = np.array([-1000.0, -500.0, 40.0, 1700.0])
+
+        rate = xirr(np.zeros(4, dtype=np.int64), days, amounts, 1)[0]
+
+        npv = np.sum(amounts * (1 + rate) ** (-days / 365.0))
+        assert abs(npv) < 1e-6
+
+    def test_time_weighted_return_chains_sub_periods(self):
+        """Test dividends and mark-to-market gains are chained per sub-period, independent of contributions."""
+        days = np.array([0, 100, 200, 300])
+        gains = np.array([0.0, 0.0, 0.0, 200.0])
+        contributions = np.array([1000.0, 0.0, 1000.0, 0.0])
+        income = np.array([0.0, 50.0, 0.0, 0.0])
+
+        assert time_weighted_return(days, gains, contributions, income) == pytest.approx(0.155)
+        assert time_weighted_return(days, gains, contributions, income, start_day=150) == pytest.approx(0.10)
+
+
+class TestPortfolioReturns:
+    """Tests for get_portfolio_returns over the ledger."""
+
+    @pytest.fixture
+    def portfolio(self, ticker_fii, ticker_stock, broker_xp, currency_usd):
+        ExchangeRate.objects.create(currency=currency_usd, date=date(2023, 1, 2), rate=Decimal("5.00"))
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("100.00"), quantity=10, date=date(2023, 1, 2),
+        )
+        Outflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("110.00"), quantity=10, date=date(2024, 1, 2),
+        )
+        Inflow.objects.create(
+            ticker=ticker_stock, broker=broker_xp, cost_price=Decimal("100.00"), quantity=2, date=date(2023, 1, 2),
+        )
+        Quote.objects.create(ticker=ticker_stock, price=Decimal("120.00"), updated_at=timezone.now())
+
+    def test_returns_per_ticker_and_portfolio(self, portfolio):
+        """Test per-ticker XIRR and portfolio MWR/TWR on a known ledger."""
+        returns = get_portfolio_returns(end=date(2024, 1, 2))
+
+        # 1000 -> 1100 em 365 dias; 200 USD -> 240 USD (cambio constante)
+        assert returns["tickers"]["HGLG11"] == pytest.approx(0.10)
+        assert returns["tickers"]["AAPL"] == pytest.approx(0.20)
+        assert returns["mwr"] == pytest.approx((1100 + 1200) / (1000 + 1000) - 1)
+        assert returns["twr"] == pytest.approx(returns["mwr"])
+        assert returns["twr_annualized"] == pytest.approx(returns["twr"])
+        assert returns["base_currency"] == "BRL"
+
+    def test_currency_without_rate(self, portfolio, ticker_unrated, broker_xp):
+        """Test a ticker in a currency with no rate at all is valued unconverted."""
+        Inflow.objects.create(
+            ticker=ticker_unrated, broker=broker_xp, cost_price=Decimal("10.00"), quantity=3, date=date(2023, 1, 2),
+        )
+        Quote.objects.create(ticker=ticker_unrated, price=Decimal("11.00"), updated_at=timezone.now())
+
+        returns = get_portfolio_returns(end=date(2024, 1, 2))
+
+        assert returns["tickers"]["SAP"] == pytest.approx(0.10)
+        assert returns["tickers"]["HGLG11"] == pytest.approx(0.10)
+
+    def test_period_starts_with_open_positions_at_cost(self, portfolio, ticker_fii):
+        """Test positions opened before the period enter as a contribution on its first day."""
+        returns = get_portfolio_returns(start=date(2023, 6, 1), end=date(2024, 1, 2))
+
+        assert returns["tickers"]["HGLG11"] > 0.10
+        assert returns["twr_annualized"] is None
+
+    def test_results_are_cached_per_period(self, portfolio, django_assert_num_queries):
+        """Test a repeated period is served from cache and quotes invalidate it."""
+        first = get_portfolio_returns(end=date(2024, 1, 2))
+        with django_assert_num_queries(0):
+            assert get_portfolio_returns(end=date(2024, 1, 2)) == first
+
+        Quote.objects.filter(ticker__name="AAPL").update(price=Decimal("150.00"))
+        bump_generations([SCOPE_QUOTES])
+        assert get_portfolio_returns(end=date(2024, 1, 2))["tickers"]["AAPL"] == pytest.approx(0.50)
+
+    def test_large_ledger_uses_constant_queries(self, category_fii, currency_brl, broker_xp, django_assert_max_num_queries):
+        """Test tens of thousands of flows are read with a fixed number of queries."""
+        tickers = Ticker.objects.bulk_create([
+            Ticker(name=f"T{i:03d}11", category=category_fii, currency=currency_brl) for i in range(50)
+        ])
+        start = date(2015, 1, 1)
+        Inflow.objects.bulk_create([
+            Inflow(
+                ticker=tickers[i % 50], broker=broker_xp, cost_price=Decimal("10.00"), quantity=1,
+                total_price=Decimal("10.00"), date=start + timedelta(days=i // 10),
+            )
+            for i in range(20000)
+        ])
+        Dividend.objects.bulk_create([
+            Dividend(
+                ticker=tickers[i % 50], value=Decimal("0.1"), quantity_quote=1, total_value=Decimal("0.10"),
+                date=start + timedelta(days=30 + i // 5),
+            )
+            for i in range(5000)
+        ])
+        rebuild_positions()
+
+        with django_assert_max_num_queries(7):
+            returns = get_portfolio_returns(end=date(2024, 1, 1))
+
+        assert len(returns["tickers"]) == 50
+        assert all(rate is not None for rate in returns["tickers"].values())
@@ -0,0 +1,93 @@
+"""
+Tests for the unified, keyset paginated transaction feed.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from django.http import Http404
+
+from app.transactions import TransactionFeed, decode_cursor
+from inflows.models import Inflow
+from outflows.models import Outflow
+
+
+@pytest.fixture
+def trades(ticker_fii, ticker_acao, broker_xp):
+    """Create alternating inflows and outflows over ten days."""
+    start = date.today() - timedelta(days=20)
+    for day in range(10):
+        Inflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("100.00"), quantity=10,
+            date=start + timedelta(days=day),
+        )
+        Outflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("110.00"), quantity=1,
+            date=start + timedelta(days=day),
+        )
+    Inflow.objects.create(
+        ticker=ticker_acao, broker=None, cost_price=Decimal("35.00"), quantity=100,
+        date=start, type="Subscrição",
+    )
+
+
+def walk(feed):
+    """Collect every row following the next cursors."""
+    rows = []
+    page = feed.page()
+    rows.extend(page)
+    while page.has_next:
+        page = feed.page(after=page.next_cursor)
+        rows.extend(page)
+    return rows
+
+
+class TestTransactionFeed:
+    """Tests for TransactionFeed."""
+
+    def test_rows_are_ordered_newest_first(self, trades):
+        """Test the merged feed is ordered by date, then outflows before inflows."""
+        rows = walk(TransactionFeed(page_size=4))
+        keys = [(row["date"], row["kind"], row["id"]) for row in rows]
+
+        assert len(rows) == 21
+        assert keys == sorted(keys, reverse=True)
+        assert rows[0]["transaction_type"] == "Venda"
+        assert rows[1]["transaction_type"] == "Compra"
+
+    def test_keyset_pages_do_not_overlap(self, trades):
+        """Test walking the cursors returns every transaction once."""
+        rows = walk(TransactionFeed(page_size=3))
+        assert len({(row["kind"], row["id"]) for row in rows}) == 21
+
+    def test_previous_page_returns_same_rows(self, trades):
+        """Test the before cursor returns the page that was left."""
+        feed = TransactionFeed(page_size=5)
+        first = feed.page()
+        second = feed.page(after=first.next_cursor)
+        back = feed.page(before=second.previous_cursor)
+
+        assert [row["id"] for row in back] == [row["id"] for row in first]
+        assert [row["kind"] for row in back] == [row["kind"] for row in first]
+        assert back.has_previous is False
+        assert back.has_next is True
+
+    def test_each_page_is_one_query(self, trades, django_assert_num_queries):
+        """Test a page costs a single bounded query."""
+        feed = TransactionFeed(page_size=5)
+        page = feed.page()
+        with django_assert_num_queries(1):
+            feed.page(after=page.next_cursor)
+
+    def test_filters(self, trades, ticker_acao):
+        """Test type, ticker and date filters are applied on both sides."""
+        assert len(walk(TransactionFeed(transaction_type="Venda"))) == 10
+        assert [row["ticker"] for row in walk(TransactionFeed(transaction_type="Subscrição"))] == ["PETR4"]
+        assert len(walk(TransactionFeed(ticker=ticker_acao))) == 1
+        assert len(walk(TransactionFeed(date_from=date.today() - timedelta(days=12)))) == 4
+        with pytest.raises(Http404):
+            TransactionFeed(transaction_type="Dividendo")
+
+    def test_invalid_cursor_raises_404(self):
+        """Test malformed cursors are rejected."""
+        with pytest.raises(Http404):
+            decode_cursor("not-a-cursor")
@@ -0,0 +1,92 @@
+"""
+Tests for the multi-currency valuation engine.
+"""
+from datetime import date
+from decimal import Decimal
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from app import metrics
+from app.valuation import get_portfolio_valuation
+from brokers.models import ExchangeRate
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Quote
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def portfolio(ticker_fii, ticker_stock, broker_xp, currency_usd):
+    """BRL and USD trades on days with different USD rates."""
+    ExchangeRate.objects.create(currency=currency_usd, date=date(2024, 1, 2), rate=Decimal("4.90"))
+    ExchangeRate.objects.create(currency=currency_usd, date=date(2024, 2, 1), rate=Decimal("5.00"))
+    Inflow.objects.create(
+        ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("150.00"), quantity=10, date=date(2024, 1, 10),
+    )
+    Inflow.objects.create(
+        ticker=ticker_stock, broker=broker_xp, cost_price=Decimal("180.00"), quantity=5, date=date(2024, 1, 10),
+    )
+    Inflow.objects.create(
+        ticker=ticker_stock, broker=broker_xp, cost_price=Decimal("100.00"), quantity=2, date=date(2024, 2, 5),
+    )
+
+
+class TestValuation:
+    """Tests for conversion of flows and positions into a base currency."""
+
+    def test_total_invested_converts_at_trade_date(self, portfolio):
+        """Test USD inflows are converted with the rate of their own date."""
+        assert metrics.get_total_invested() == 6910.0
+        assert metrics.get_total_invested("USD") == pytest.approx(1406.12)
+
+    def test_total_invested_cost_does_not_grow_with_rows(self, portfolio, django_assert_num_queries):
+        """Test a cold total reads the FX series and the grouped inflows only."""
+        with django_assert_num_queries(2):
+            metrics.get_total_invested()
+
+    def test_new_rate_invalidates_totals(self, portfolio, currency_usd, django_capture_on_commit_callbacks):
+        """Test saving a rate refreshes the converted totals."""
+        assert metrics.get_total_invested() == 6910.0
+        with django_capture_on_commit_callbacks(execute=True):
+            ExchangeRate.objects.create(currency=currency_usd, date=date(2024, 1, 8), rate=Decimal("5.10"))
+        assert metrics.get_total_invested() == 7090.0
+
+    def test_currency_without_rate_is_not_converted(self, portfolio, ticker_unrated, broker_xp):
+        """Test flows and positions in a currency with no rate at all are kept unconverted."""
+        Inflow.objects.create(
+            ticker=ticker_unrated, broker=broker_xp, cost_price=Decimal("10.00"), quantity=3, date=date(2024, 1, 10),
+        )
+
+        assert metrics.get_total_invested() == 6940.0
+        valuation = get_portfolio_valuation()
+        # posicao em USD pela cotacao mais recente (1100 * 5.00) + 30 EUR sem conversao
+        assert (valuation["invested"], valuation["cost_basis"]) == (6940.0, 1500.0 + 5500.0 + 30.0)
+
+    def test_portfolio_valuation(self, portfolio, ticker_fii, ticker_stock, broker_xp):
+        """Test flows use dated rates and positions the latest rate and quote."""
+        Outflow.objects.create(
+            ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("160.00"), quantity=5, date=date(2024, 3, 1),
+        )
+        Dividend.objects.create(ticker=ticker_fii, value=Decimal("1.10"), date=date(2024, 1, 20))
+        Quote.objects.create(ticker=ticker_stock, price=Decimal("200.00"), updated_at=timezone.now())
+
+        valuation = get_portfolio_valuation()
+
+        assert valuation == dict(
+            base_currency="BRL",
+            invested=6910.0,
+            sold=800.0,
+            dividends=11.0,
+            cost_basis=6200.0,
+            market_value=7700.0,
+        )
+        assert get_portfolio_valuation("USD")["market_value"] == 1540.0
@@ -1,10 +1,17 @@
 """
-Tests for app views (home, negociations).
+Tests for app views (home, negociations, dashboard API).
 """
+import gzip
+import json
+from datetime import date, timedelta
+from decimal import Decimal
 import pytest
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 
+from inflows.models import Inflow
+
 
 @pytest.fixture
 def user(db):
@@ -42,6 +49,19 @@ class TestHomeView:
         assert "total_inflows" in response.context
         assert "total_applied" in response.context
 
+    def test_home_warns_about_currencies_without_rate(self, authenticated_client, ticker_unrated, broker_xp):
+        """Test amounts in a currency with no rate are summed unconverted and flagged."""
+        cache.clear()
+        Inflow.objects.create(
+            ticker=ticker_unrated, broker=broker_xp, cost_price=Decimal("10.00"), quantity=3, date=date(2024, 1, 2),
+        )
+
+        response = authenticated_client.get(reverse("home"))
+
+        assert response.status_code == 200
+        assert response.context["total_applied"] == {"EUR": 30.0}
+        assert "Sem cotação cadastrada para EUR" in response.content.decode()
+
 
 class TestNegociationsView:
     """Tests for negociations view."""
@@ -75,3 +95,117 @@ class TestErrorHandlers:
         """Test 404 error handler."""
         response = authenticated_client.get("/nonexistent-page/")
         assert response.status_code == 404
+
+
+class TestNegociationsCursorPagination:
+    """Tests for the cursor pagination of the negociations view."""
+
+    def test_next_cursor_moves_to_older_transactions(self, authenticated_client, ticker_fii, broker_xp):
+        """Test the after cursor returns the following page."""
+        for day in range(30):
+            Inflow.objects.create(
+                ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today() - timedelta(days=day),
+            )
+        first = authenticated_client.get(reverse("negociations")).context["page_obj"]
+        assert len(first) == 25
+        assert first.has_next
+
+        response = authenticated_client.get(reverse("negociations"), {"after": first.next_cursor})
+        second = response.context["page_obj"]
+        assert len(second) == 5
+        assert not second.has_next
+        assert second.has_previous
+
+    def test_type_filter(self, authenticated_client, inflow_fii, outflow_fii):
+        """Test the type filter from the template form is applied."""
+        response = authenticated_client.get(reverse("negociations"), {"type": "Venda"})
+        assert [row["transaction_type"] for row in response.context["transactions"]] == ["Venda"]
+
+    def test_type_filter_offers_only_trades(self, authenticated_client, inflow_fii):
+        """Test dividend types are not offered and are rejected instead of returning an empty list."""
+        response = authenticated_client.get(reverse("negociations"))
+        assert 'value="Dividendo"' not in response.content.decode()
+
+        for transaction_type in ("Dividendo", "JCP", "Rendimento"):
+            response = authenticated_client.get(reverse("negociations"), {"type": transaction_type})
+            assert response.status_code == 404
+
+    def test_invalid_cursor_returns_404(self, authenticated_client):
+        """Test a malformed cursor returns 404."""
+        response = authenticated_client.get(reverse("negociations"), {"after": "x"})
+        assert response.status_code == 404
+
+
+class TestDashboardSeriesApi:
+    """Tests for the dashboard series JSON endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty cache."""
+        cache.clear()
+        yield
+        cache.clear()
+
+    def test_series_payloads(self, authenticated_client, inflow_fii):
+        """Test each series returns its data from the snapshot."""
+        def get(series, **params):
+            return json.loads(authenticated_client.get(reverse("dashboard_series", args=[series]), params).content)
+
+        assert get("categories") == {"FII": 1500.0}
+        assert get("currencies") == {"BRL": 1500.0}
+        assert get("brokers") == {"XP Investimentos": 1500.0}
+        assert get("applied", currency="usd") == {"labels": [], "values": []}
+        assert get("applied")["values"] == [1500.0]
+        assert len(get("dividends")["labels"]) == 7
+
+    def test_currency_without_rate(self, authenticated_client, inflow_fii, ticker_unrated, broker_xp):
+        """Test a currency with no rate at all does not break the series."""
+        Inflow.objects.create(
+            ticker=ticker_unrated, broker=broker_xp, cost_price=Decimal("10.00"), quantity=3, date=date(2024, 1, 2),
+        )
+
+        response = authenticated_client.get(reverse("dashboard_series", args=["categories"]))
+
+        assert response.status_code == 200
+        assert json.loads(response.content) == {"FII": 1500.0, "Stock": 30.0}
+
+    def test_conditional_get(self, authenticated_client, inflow_fii, django_capture_on_commit_callbacks):
+        """Test a matching If-None-Match gets 304 until the metrics change."""
+        url = reverse("dashboard_series", args=["categories"])
+        response = authenticated_client.get(url)
+        etag = response["ETag"]
+        assert "no-cache" in response["Cache-Control"]
+
+        assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert authenticated_client.get(url + "?currency=BRL", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Inflow.objects.create(
+                ticker=inflow_fii.ticker, broker=inflow_fii.broker, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today(),
+            )
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert json.loads(response.content) == {"FII": 1510.0}
+
+    def test_gzip(self, authenticated_client, ticker_fii, broker_xp):
+        """Test responses are compressed when the client accepts gzip."""
+        for month in range(24):
+            Inflow.objects.create(
+                ticker=ticker_fii, broker=broker_xp, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today() - timedelta(days=31 * month),
+            )
+
+        response = authenticated_client.get(
+            reverse("dashboard_series", args=["applied"]), HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        assert response["Content-Encoding"] == "gzip"
+        assert sum(json.loads(gzip.decompress(response.content))["values"]) == 240.0
+
+    def test_invalid_requests(self, authenticated_client, client):
+        """Test unknown series, invalid currencies and writes are rejected."""
+        assert authenticated_client.get(reverse("dashboard_series", args=["unknown"])).status_code == 404
+        assert authenticated_client.get(reverse("dashboard_series", args=["applied"]), {"currency": "X1"}).status_code == 404
+        assert authenticated_client.post(reverse("dashboard_series", args=["brokers"])).status_code == 405
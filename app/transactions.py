@@ -0,0 +1,206 @@
+"""
+Feed unificado de negociacoes (compras e vendas).
+
+Inflows e Outflows sao combinados no banco com UNION ALL, ordenados por
+(data, tipo, id) e paginados por cursor (keyset). Cada pagina custa uma
+unica query limitada, independente do tamanho do historico.
+"""
+from datetime import date
+from django.db.models import Case, CharField, F, IntegerField, Q, Value, When
+from django.http import Http404
+
+from inflows.models import Inflow
+from outflows.models import Outflow
+
+INFLOW_KIND = 0
+OUTFLOW_KIND = 1
+# Tipos aceitos no filtro; proventos ficam fora do feed (ver dividends)
+TRANSACTION_TYPES = ("Compra", "Subscrição", "Venda")
+
+COLUMNS = ("tx_date", "kind", "tx_id", "ticker_name", "broker_name",
+           "tx_type", "quantity", "cost_price", "total_price")
+
+
+def encode_cursor(row):
+    """Gera o cursor de uma linha do feed."""
+    return f"{row['date'].isoformat()}.{row['kind']}.{row['id']}"
+
+
+def decode_cursor(cursor):
+    """
+    Converte o cursor recebido na URL em (data, tipo, id).
+
+    Raises:
+        Http404: Se o cursor for invalido
+    """
+    try:
+        raw_date, kind, pk = cursor.split(".")
+        return date.fromisoformat(raw_date), int(kind), int(pk)
+    except (AttributeError, ValueError):
+        raise Http404("Cursor invalido")
+
+
+class TransactionPage:
+    """Pagina do feed, com os cursores para navegar entre paginas."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous and self.object_list else None
+
+
+class TransactionFeed:
+    """
+    Historico de compras e vendas ordenado da negociacao mais recente para a
+    mais antiga.
+
+    Args:
+        ticker: Ticker (ou id) para restringir o feed
+        ticker_name: Codigo do ticker para restringir o feed
+        transaction_type: "Compra", "Subscrição" ou "Venda"
+        date_from, date_to: Intervalo de datas (inclusivo)
+        page_size: Numero de linhas por pagina
+
+    Raises:
+        Http404: Se o tipo nao estiver em TRANSACTION_TYPES
+    """
+
+    def __init__(self, ticker=None, ticker_name=None, transaction_type=None,
+                 date_from=None, date_to=None, page_size=25):
+        if transaction_type is not None and transaction_type not in TRANSACTION_TYPES:
+            raise Http404("Tipo de negociacao invalido")
+        self.ticker = ticker
+        self.ticker_name = ticker_name
+        self.transaction_type = transaction_type
+        self.date_from = date_from
+        self.date_to = date_to
+        self.page_size = page_size
+
+    def page(self, after=None, before=None):
+        """
+        Retorna a pagina seguinte a 'after' ou anterior a 'before' (cursores).
+        Sem cursor, retorna a primeira pagina.
+        """
+        cursor = decode_cursor(before or after) if (before or after) else None
+        backwards = bool(before)
+
+        branches = [
+            self._keyset(queryset, kind, cursor, backwards)
+            for queryset, kind in self._branches()
+        ]
+        if not branches:
+            return TransactionPage([], has_next=False, has_previous=False)
+
+        combined = branches[0]
+        if len(branches) > 1:
+            combined = combined.union(*branches[1:], all=True)
+
+        ordering = ("tx_date", "kind", "tx_id") if backwards else ("-tx_date", "-kind", "-tx_id")
+        rows = list(combined.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = [self._row(values) for values in rows[:self.page_size]]
+
+        if backwards:
+            rows.reverse()
+            return TransactionPage(rows, has_next=True, has_previous=has_more)
+        return TransactionPage(rows, has_next=has_more, has_previous=cursor is not None)
+
+    def _branches(self):
+        """Querysets de Inflow/Outflow ja filtrados, com colunas alinhadas."""
+        branches = []
+        if self.transaction_type in (None, "Compra", "Subscrição"):
+            inflows = Inflow.objects.annotate(
+                tx_type=Case(
+                    When(type="Compra", then=Value("Compra")),
+                    default=Value("Subscrição"),
+                    output_field=CharField()
+                )
+            )
+            if self.transaction_type == "Compra":
+                inflows = inflows.filter(type="Compra")
+            elif self.transaction_type == "Subscrição":
+                inflows = inflows.exclude(type="Compra")
+            branches.append((inflows, INFLOW_KIND))
+
+        if self.transaction_type in (None, "Venda"):
+            outflows = Outflow.objects.annotate(tx_type=Value("Venda", output_field=CharField()))
+            branches.append((outflows, OUTFLOW_KIND))
+
+        return [(self._filter(queryset), kind) for queryset, kind in branches]
+
+    def _filter(self, queryset):
+        if self.ticker is not None:
+            queryset = queryset.filter(ticker=self.ticker)
+        if self.ticker_name:
+            queryset = queryset.filter(ticker__name=self.ticker_name)
+        if self.date_from:
+            queryset = queryset.filter(date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(date__lte=self.date_to)
+        return queryset
+
+    def _keyset(self, queryset, kind, cursor, backwards):
+        """
+        Aplica a condicao do cursor em cada lado do UNION, ja que o banco nao
+        permite filtrar o resultado combinado.
+        """
+        if cursor is not None:
+            cursor_date, cursor_kind, cursor_id = cursor
+            if backwards:
+                if kind > cursor_kind:
+                    condition = Q(date__gte=cursor_date)
+                elif kind < cursor_kind:
+                    condition = Q(date__gt=cursor_date)
+                else:
+                    condition = Q(date__gt=cursor_date) | Q(date=cursor_date, id__gt=cursor_id)
+            else:
+                if kind < cursor_kind:
+                    condition = Q(date__lte=cursor_date)
+                elif kind > cursor_kind:
+                    condition = Q(date__lt=cursor_date)
+                else:
+                    condition = Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id)
+            queryset = queryset.filter(condition)
+
+        return (
+            queryset
+            .order_by()
+            .annotate(
+                tx_date=F("date"),
+                kind=Value(kind, output_field=IntegerField()),
+                tx_id=F("id"),
+                ticker_name=F("ticker__name"),
+                broker_name=F("broker__name"),
+            )
+            .values(*COLUMNS)
+        )
+
+    def _row(self, values):
+        """Converte uma linha do UNION no formato usado pelos templates."""
+        return dict(
+            id=values["tx_id"],
+            date=values["tx_date"],
+            kind=values["kind"],
+            ticker=values["ticker_name"],
+            broker=values["broker_name"] or "",
+            transaction_type=values["tx_type"],
+            quantity=values["quantity"],
+            cost_price=values["cost_price"],
+            total_price=values["total_price"],
+            total=values["total_price"],
+        )
@@ -14,6 +14,9 @@ urlpatterns = [
 
     path("", views.home, name="home"),
     path("negociations/", views.negociations, name="negociations"),
+    path("api/dashboard/<slug:series>/", views.dashboard_series, name="dashboard_series"),
+    path("export/<slug:dataset>.<slug:file_format>", views.export_ledger, name="export_ledger"),
+    path("metrics/", views.prometheus_metrics, name="prometheus_metrics"),
 
     path("", include("brokers.urls")),
     path("", include("tickers.urls")),
@@ -2,6 +2,7 @@
 Tests for input validators.
 """
 
+from datetime import date
 import pytest
 from django.http import Http404
 from app.utils.validators import (
@@ -12,6 +13,7 @@ from app.utils.validators import (
     validate_year,
     validate_month,
     validate_currency_code,
+    validate_date,
 )
 
 
@@ -204,3 +206,24 @@ class TestValidateCurrencyCode:
     def test_whitespace_is_trimmed(self):
         """Test whitespace is trimmed from currency codes."""
         assert validate_currency_code("  BRL  ") == "BRL"
+
+
+class TestValidateDate:
+    """Tests for validate_date function."""
+
+    def test_valid_date(self):
+        """Test ISO dates are parsed."""
+        assert validate_date("2025-01-31") == date(2025, 1, 31)
+
+    def test_none_returns_none(self):
+        """Test empty input returns None."""
+        assert validate_date(None) is None
+        assert validate_date("") is None
+
+    def test_invalid_date_raises_404(self):
+        """Test malformed dates raise Http404."""
+        with pytest.raises(Http404):
+            validate_date("31/01/2025")
+
+        with pytest.raises(Http404):
+            validate_date("2025-02-30")
@@ -5,6 +5,7 @@ Provides validation functions to prevent injection attacks and ensure data integ
 """
 
 import re
+from datetime import date
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
@@ -195,3 +196,25 @@ def validate_currency_code(currency):
         raise Http404("Codigo de moeda invalido")
 
     return currency
+
+
+def validate_date(value):
+    """
+    Validate date parameter (ISO format, YYYY-MM-DD).
+
+    Args:
+        value: String to validate as date
+
+    Returns:
+        datetime.date object
+
+    Raises:
+        Http404: If date is invalid
+    """
+    if not value:
+        return None
+
+    try:
+        return date.fromisoformat(value.strip())
+    except (ValueError, TypeError, AttributeError):
+        raise Http404("Data invalida")
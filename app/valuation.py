@@ -0,0 +1,104 @@
+"""
+Avaliacao da carteira em uma unica moeda base.
+
+Aportes, vendas e dividendos sao agregados no banco por (moeda, data) e
+convertidos de uma vez, de forma vetorizada, pela cotacao de cada data
+(brokers.fx). Posicoes sao avaliadas pela cotacao mais recente.
+"""
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from brokers.fx import get_fx_series
+from dividends.models import Dividend
+from inflows.models import Inflow
+from outflows.models import Outflow
+from tickers.models import Position
+from .metrics_cache import (
+    SCOPE_DIVIDENDS, SCOPE_FX, SCOPE_INFLOWS, SCOPE_POSITIONS, SCOPE_QUOTES, SCOPE_TICKERS, cached_metric,
+)
+
+
+def convert_total(rows, base_currency, fx=None):
+    """
+    Soma as linhas (moeda, data, valor) convertidas para 'base_currency'
+    pela cotacao de cada data.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0.0
+    fx = fx or get_fx_series()
+    codes, dates, amounts = zip(*rows)
+    return float(fx.convert(amounts, codes, dates, base_currency).sum())
+
+
+def _flows_by_currency_and_date(queryset, currency_field, value_field):
+    return (
+        queryset
+        .order_by()
+        .values(currency_field, "date")
+        .annotate(total=Sum(value_field))
+        .values_list(currency_field, "date", "total")
+    )
+
+
+@cached_metric("total_invested_{0}", SCOPE_INFLOWS, SCOPE_TICKERS, SCOPE_FX)
+def get_total_invested_in(base_currency):
+    """
+    Total aportado em 'base_currency', com cada compra convertida pela
+    cotacao da sua data.
+    """
+    rows = _flows_by_currency_and_date(Inflow.objects.all(), "ticker__currency__code", "total_price")
+    return round(convert_total(rows, base_currency), 2)
+
+
+def get_portfolio_valuation(base_currency=None):
+    """
+    Consolida a carteira em uma moeda (BASE_CURRENCY por padrao).
+
+    Returns:
+        dict: base_currency, invested (compras), sold (vendas) e dividends
+        convertidos pela cotacao da data; cost_basis e market_value das
+        posicoes atuais pela cotacao mais recente (sem cotacao de mercado,
+        o ticker entra pelo custo)
+    """
+    return _portfolio_valuation(base_currency or settings.BASE_CURRENCY)
+
+
+@cached_metric(
+    "portfolio_valuation_{0}",
+    SCOPE_INFLOWS, SCOPE_POSITIONS, SCOPE_DIVIDENDS, SCOPE_TICKERS, SCOPE_FX, SCOPE_QUOTES,
+)
+def _portfolio_valuation(base_currency):
+    fx = get_fx_series()
+    today = timezone.localdate()
+
+    invested = _flows_by_currency_and_date(Inflow.objects.all(), "ticker__currency__code", "total_price")
+    sold = _flows_by_currency_and_date(Outflow.objects.all(), "ticker__currency__code", "total_price")
+    dividends = _flows_by_currency_and_date(Dividend.objects.all(), "currency", "total_value")
+
+    market_value = ExpressionWrapper(
+        F("quantity") * F("ticker__quote__price"), output_field=DecimalField(max_digits=20, decimal_places=4)
+    )
+    positions = (
+        Position.objects
+        .filter(quantity__gt=0)
+        .order_by()
+        .values("ticker__currency__code")
+        .annotate(total_cost=Sum("cost_basis"), total_market=Sum(Coalesce(market_value, F("cost_basis"))))
+    )
+    cost_basis, market = [], []
+    for item in positions:
+        code = item["ticker__currency__code"]
+        cost_basis.append((code, today, item["total_cost"] or 0))
+        market.append((code, today, item["total_market"] or 0))
+
+    return dict(
+        base_currency=base_currency,
+        invested=round(convert_total(invested, base_currency, fx), 2),
+        sold=round(convert_total(sold, base_currency, fx), 2),
+        dividends=round(convert_total(dividends, base_currency, fx), 2),
+        cost_basis=round(convert_total(cost_basis, base_currency, fx), 2),
+        market_value=round(convert_total(market, base_currency, fx), 2),
+    )
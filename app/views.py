@@ -1,15 +1,19 @@
-import json
 import logging
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
-from django.views.decorators.cache import cache_page
-from inflows.models import Inflow
-from outflows.models import Outflow
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control, cache_page
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
 from services.fees_br import GetFeeBr
-from itertools import chain
-from . import metrics
+from . import exports
+from .dashboard import DashboardSnapshot
+from .instrumentation import registry
+from .transactions import TransactionFeed
+from .utils.validators import validate_currency_code, validate_date, validate_ticker_name
 
 # Cache timeout para a pagina home (5 minutos)
 CACHE_TTL = getattr(settings, 'CACHE_TTL_MEDIUM', 300)
@@ -18,8 +22,8 @@ logger = logging.getLogger('app')
 get_fee = GetFeeBr()
 
 
-# Nota: O caching da pagina home e feito a nivel de funcoes em metrics.py
-# para permitir invalidacao granular quando dados sao alterados.
+# Nota: O caching da pagina home e feito pelo DashboardSnapshot (app/dashboard.py),
+# uma unica entrada de cache invalidada junto com as metricas.
 # Se preferir cachear a pagina inteira, descomente o decorator abaixo:
 # @cache_page(CACHE_TTL)
 @login_required
@@ -39,38 +43,27 @@ def home(request):
     logger.info(f"Usuario {request.user.username} acessando dashboard")
 
     try:
-        total_inflows = metrics.get_total_invested()
-        inflows_datas = metrics.get_applied_value("BRL")
-        last_six_months = metrics.get_last_six_month()
-        total_dividends_fiis = metrics.get_total_dividends_category("FII")
-        total_dividends_acoes = metrics.get_total_dividends_category("Ação")
-        total_dividends_stocks = metrics.get_total_dividends_category("Stock")
-        total_dividends_etfs = metrics.get_total_dividends_category("ETF")
-        total_applied = metrics.get_total_applied_by_currency()
-        chart_diversity = metrics.chart_total_category_invested()
-        brokers = metrics.get_total_applied_by_broker()
-
-        # Busca taxas com tratamento de erro
-        ipca = get_fee.get_taxa("IPCA")
-        selic = get_fee.get_taxa("SELIC")
-        cdi = get_fee.get_taxa("CDI")
+        snapshot = DashboardSnapshot.get()
 
+        # Busca taxas em paralelo (cache com revalidacao em segundo plano)
+        taxas = get_fee.get_taxas(["IPCA", "SELIC", "CDI"])
+        ipca = taxas["IPCA"]
+        selic = taxas["SELIC"]
+        cdi = taxas["CDI"]
+
+        # As series dos graficos sao carregadas pela API (dashboard_series)
         context = {
-            "total_inflows": total_inflows,
-            "total_applied": total_applied,
-            "last_six_months": json.dumps(last_six_months),
-            "inflows_datas": json.dumps(inflows_datas),
-            "total_fiis": json.dumps(total_dividends_fiis),
-            "total_acoes": json.dumps(total_dividends_acoes),
-            "total_stocks": json.dumps(total_dividends_stocks),
-            "total_etfs": json.dumps(total_dividends_etfs),
-            "chart_diversity": json.dumps(chart_diversity),
-            "chart_total_applied": json.dumps(total_applied),
-            "chart_broker": json.dumps(brokers),
+            "total_inflows": snapshot.total_invested,
+            "total_applied": snapshot.applied_by_currency,
             "ipca": ipca.get("valor"),
             "selic": selic.get("valor"),
             "cdi": cdi.get("valor"),
         }
+        if snapshot.unconverted_currencies:
+            context["fx_warning"] = (
+                f"Sem cotação cadastrada para {', '.join(snapshot.unconverted_currencies)}: "
+                "esses valores foram somados ao total sem conversão."
+            )
 
         logger.debug(f"Dashboard carregado com sucesso para {request.user.username}")
         return render(request, "home.html", context)
@@ -80,13 +73,94 @@ def home(request):
         return render(request, "errors/500.html", status=500)
 
 
+def dashboard_series_etag(request, series):
+    currency = (request.GET.get("currency") or "").strip().upper()
+    return DashboardSnapshot.etag(series, currency)
+
+
+@login_required
+@require_GET
+@gzip_page
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_series_etag)
+def dashboard_series(request, series):
+    """
+    Uma serie do dashboard em JSON.
+
+    O ETag vem da chave versionada do snapshot: enquanto nenhuma metrica for
+    invalidada, um If-None-Match igual recebe 304 sem ler o snapshot.
+
+    Args:
+        request: HttpRequest do usuario autenticado
+        series: Nome da serie (DashboardSnapshot.SERIES)
+
+    Returns:
+        JsonResponse com a serie (comprimida com gzip quando aceito)
+
+    Raises:
+        Http404: Se a serie ou a moeda forem invalidas
+    """
+    if series not in DashboardSnapshot.SERIES:
+        raise Http404("Serie invalida")
+    currency = validate_currency_code(request.GET.get("currency"))
+    return JsonResponse(DashboardSnapshot.get().series(series, currency))
+
+
+@login_required
+@require_GET
+def export_ledger(request, dataset, file_format):
+    """
+    Exporta compras, vendas ou dividendos em CSV ou XLSX, em streaming.
+
+    Aceita os mesmos filtros das listagens (InflowListView para compras e
+    vendas, DividendListView para dividendos).
+
+    Args:
+        request: HttpRequest do usuario autenticado
+        dataset: inflows, outflows ou dividends
+        file_format: csv ou xlsx
+
+    Returns:
+        StreamingHttpResponse com o arquivo
+
+    Raises:
+        Http404: Se o conjunto, o formato ou algum filtro forem invalidos
+    """
+    try:
+        return exports.streaming_response(dataset, file_format, request.GET)
+    except (KeyError, ValueError, ValidationError):
+        raise Http404("Exportacao invalida")
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Metricas das requisicoes (RequestMetricsMiddleware) no formato do Prometheus.
+
+    Liberado para usuarios staff ou para o header 'Authorization: Bearer
+    <METRICS_TOKEN>', usado pelo coletor.
+
+    Returns:
+        HttpResponse em text/plain (formato de exposicao 0.0.4)
+
+    Raises:
+        PermissionDenied: Sem usuario staff nem token valido
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    authorized = bool(token) and constant_time_compare(header, f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @login_required
 def negociations(request):
     """
     View da lista de negociacoes (compras e vendas).
 
     Exibe todas as transacoes (inflows e outflows) ordenadas por data,
-    com paginacao de 25 itens por pagina.
+    combinadas no banco e paginadas por cursor, 25 itens por pagina.
 
     Args:
         request: HttpRequest do usuario autenticado
@@ -97,29 +171,31 @@ def negociations(request):
     logger.info(f"Usuario {request.user.username} acessando negociacoes")
 
     try:
-        # Otimizar queries com select_related
-        inflow = Inflow.objects.select_related('ticker', 'broker').all()
-        outflow = Outflow.objects.select_related('ticker', 'broker').all()
-
-        transactions = sorted(
-            chain(inflow, outflow),
-            key=lambda obj: obj.date,
-            reverse=True
+        feed = TransactionFeed(
+            ticker_name=validate_ticker_name(request.GET.get("ticker")),
+            transaction_type=request.GET.get("type") or None,
+            date_from=validate_date(request.GET.get("date_from")),
+            date_to=validate_date(request.GET.get("date_to")),
+            page_size=25,
         )
+        page_obj = feed.page(after=request.GET.get("after"), before=request.GET.get("before"))
 
-        # Paginacao
-        paginator = Paginator(transactions, 25)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # Parametros de filtro preservados nos links de paginacao
+        filters = request.GET.copy()
+        for key in ("after", "before", "page"):
+            filters.pop(key, None)
 
         context = {
             "transactions": page_obj,
             "page_obj": page_obj,
+            "filter_query": filters.urlencode(),
         }
 
-        logger.debug(f"Negociacoes carregadas: {paginator.count} transacoes, pagina {page_obj.number}")
+        logger.debug(f"Negociacoes carregadas: {len(page_obj)} transacoes na pagina")
         return render(request, "negociations.html", context)
 
+    except Http404:
+        raise
     except Exception as e:
         logger.exception(f"Erro ao carregar negociacoes para {request.user.username}: {str(e)}")
         return render(request, "errors/500.html", status=500)
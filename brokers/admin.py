@@ -10,5 +10,12 @@ class CurrencyAdmin(admin.ModelAdmin):
     list_display = ("name", "code")
     search_fields = ("code",)
 
+
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ("currency", "date", "rate")
+    list_filter = ("currency",)
+    date_hierarchy = "date"
+
 admin.site.register(models.Broker, BrokerAdmin)
 admin.site.register(models.Currency, CurrencyAdmin)
+admin.site.register(models.ExchangeRate, ExchangeRateAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BrokersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "brokers"
+
+    def ready(self):
+        import brokers.signals # noqa:F401
@@ -0,0 +1,146 @@
+"""
+Series de cambio para conversao vetorizada entre moedas.
+
+As cotacoes diarias (ExchangeRate) sao carregadas uma unica vez em arrays
+NumPy por moeda e guardadas no cache de metricas (escopo "fx"). A taxa de
+uma data e a ultima cotacao ate ela; datas anteriores a primeira cotacao
+usam a primeira. Moedas sem serie usam Currency.exchange_rate; moedas sem
+nenhuma cotacao ficam sem conversao em convert() (com um aviso no log), a
+menos que strict=True.
+"""
+import logging
+import numpy as np
+
+from app.metrics_cache import SCOPE_FX, cached_metric
+from .models import Currency
+
+# Moeda em que as cotacoes sao expressas (convencao de Currency.exchange_rate)
+REFERENCE_CURRENCY = "BRL"
+
+logger = logging.getLogger('app')
+
+
+class FxRateMissing(LookupError):
+    """Moeda sem cotacao cadastrada."""
+    pass
+
+
+class FxSeries:
+    """
+    Cotacoes em reais de cada moeda, como arrays (datas, taxas) ordenados
+    por data.
+    """
+
+    def __init__(self, series, fallback):
+        self.series = series
+        self.fallback = fallback
+
+    @classmethod
+    def load(cls):
+        """Carrega moedas e cotacoes em uma unica query (LEFT JOIN)."""
+        rows = (
+            Currency.objects
+            .order_by("code", "rates__date")
+            .values_list("code", "exchange_rate", "rates__date", "rates__rate")
+        )
+        dates, rates, fallback = {}, {}, {}
+        for code, exchange_rate, day, rate in rows:
+            if exchange_rate is not None:
+                fallback[code] = float(exchange_rate)
+            if day is not None:
+                dates.setdefault(code, []).append(day)
+                rates.setdefault(code, []).append(float(rate))
+
+        series = {
+            code: (np.array(dates[code], dtype="datetime64[D]"), np.array(rates[code], dtype=float))
+            for code in dates
+        }
+        return cls(series, fallback)
+
+    def rates(self, code, dates):
+        """
+        Taxa (em reais) de 'code' em cada uma das datas.
+
+        Raises:
+            FxRateMissing: Se a moeda nao tiver cotacao
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if code == REFERENCE_CURRENCY:
+            return np.ones(dates.shape)
+
+        series = self.series.get(code)
+        if series is None:
+            if code not in self.fallback:
+                raise FxRateMissing(f"Moeda '{code}' sem cotacao cadastrada.")
+            return np.full(dates.shape, self.fallback[code])
+
+        series_dates, series_rates = series
+        index = np.searchsorted(series_dates, dates, side="right") - 1
+        return series_rates[np.maximum(index, 0)]
+
+    def latest(self, code):
+        """Cotacao mais recente de 'code' em reais."""
+        if code == REFERENCE_CURRENCY:
+            return 1.0
+        series = self.series.get(code)
+        if series is not None:
+            return float(series[1][-1])
+        if code not in self.fallback:
+            raise FxRateMissing(f"Moeda '{code}' sem cotacao cadastrada.")
+        return self.fallback[code]
+
+    def has_rate(self, code):
+        return code == REFERENCE_CURRENCY or code in self.series or code in self.fallback
+
+    def missing(self, codes):
+        """Moedas de 'codes' sem nenhuma cotacao, em ordem alfabetica."""
+        return sorted({code for code in codes if not self.has_rate(code)})
+
+    def convert(self, amounts, codes, dates, to, strict=False):
+        """
+        Converte cada valor da sua moeda para 'to' pela cotacao da data
+        correspondente. Uma operacao vetorizada por moeda distinta.
+
+        Valores em moedas sem cotacao (ou com 'to' sem cotacao) ficam sem
+        conversao, com um aviso no log.
+
+        Args:
+            amounts: Valores (sequencia de numeros)
+            codes: Moeda de cada valor
+            dates: Data de cada valor
+            to: Moeda de destino
+            strict: Levanta FxRateMissing em vez de deixar valores sem conversao
+
+        Returns:
+            numpy.ndarray: Valores convertidos
+
+        Raises:
+            FxRateMissing: Se strict=True e alguma moeda nao tiver cotacao
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        codes = np.asarray(codes, dtype=object)
+        dates = np.asarray(dates, dtype="datetime64[D]")
+
+        missing = self.missing(set(codes.tolist()) | {to})
+        if missing:
+            if strict:
+                raise FxRateMissing(f"Moeda '{missing[0]}' sem cotacao cadastrada.")
+            logger.warning(f"Moedas sem cotacao cadastrada, valores nao convertidos: {', '.join(missing)}")
+            if to in missing:
+                return amounts.copy()
+
+        converted = np.empty(amounts.shape)
+        for code in set(codes.tolist()):
+            mask = codes == code
+            if code in missing:
+                # Cancela a divisao abaixo: o valor segue sem conversao
+                converted[mask] = amounts[mask] * self.rates(to, dates[mask])
+            else:
+                converted[mask] = amounts[mask] * self.rates(code, dates[mask])
+        return converted / self.rates(to, dates)
+
+
+@cached_metric("fx_series", SCOPE_FX)
+def get_fx_series():
+    """Series de cambio em cache, invalidadas quando cotacoes ou moedas mudam."""
+    return FxSeries.load()
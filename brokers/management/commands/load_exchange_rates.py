@@ -0,0 +1,86 @@
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.metrics_cache import SCOPE_FX, bump_generations
+from brokers.models import Currency, ExchangeRate
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+class RowError(Exception):
+    """Linha do arquivo invalida."""
+    pass
+
+
+class Command(BaseCommand):
+    help = "Carrega cotacoes diarias de um arquivo CSV (date,currency,rate), com a taxa em reais."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_name", type=str, help="arquivo com as cotacoes")
+        parser.add_argument("--batch-size", type=int, default=1000, help="linhas gravadas por lote")
+
+    def handle(self, *args, **options):
+        self.currencies = dict(Currency.objects.values_list("code", "id"))
+        rates = {}
+        errors = 0
+
+        with open(options["file_name"], "r", encoding="utf-8") as file:
+            for line_number, row in enumerate(csv.DictReader(file), start=2):
+                try:
+                    currency_id, day, rate = self.parse_row(row)
+                except RowError as e:
+                    errors += 1
+                    self.stderr.write(self.style.ERROR(f"Linha {line_number}: {e}"))
+                    continue
+                # A ultima linha de uma mesma moeda e data prevalece
+                rates[(currency_id, day)] = rate
+
+        with transaction.atomic():
+            ExchangeRate.objects.bulk_create(
+                [ExchangeRate(currency_id=currency_id, date=day, rate=rate) for (currency_id, day), rate in rates.items()],
+                batch_size=options["batch_size"],
+                update_conflicts=True,
+                unique_fields=["currency", "date"],
+                update_fields=["rate"],
+            )
+            # Currency.exchange_rate acompanha a cotacao mais recente
+            for currency_id in {currency_id for currency_id, _ in rates}:
+                latest = ExchangeRate.objects.filter(currency_id=currency_id).latest("date")
+                Currency.objects.filter(id=currency_id).update(exchange_rate=latest.rate.quantize(Decimal("0.0001")))
+
+        if rates:
+            bump_generations([SCOPE_FX])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(rates)} cotacoes carregadas, {errors} linhas com erro"))
+
+    def parse_row(self, row):
+        """
+        Converte uma linha em (currency_id, data, taxa).
+
+        Raises:
+            RowError: Se algum campo for invalido
+        """
+        code = (row.get("currency") or "").strip().upper()
+        currency_id = self.currencies.get(code)
+        if currency_id is None:
+            raise RowError(f"Moeda '{code}' não encontrada.")
+
+        day = self.parse_date((row.get("date") or "").strip())
+        try:
+            # Aceita virgula decimal (formato das planilhas do Banco Central)
+            rate = Decimal((row.get("rate") or "").strip().replace(",", ".")).quantize(Decimal("0.000001"))
+        except InvalidOperation:
+            raise RowError(f"Cotação '{row.get('rate')}' inválida.")
+        if rate <= 0:
+            raise RowError("Cotação deve ser maior que zero.")
+        return currency_id, day, rate
+
+    def parse_date(self, value):
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        raise RowError(f"Data '{value}' inválida.")
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("brokers", "0003_alter_broker_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("rate", models.DecimalField(decimal_places=6, max_digits=14)),
+                ("currency", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="rates", to="brokers.currency")),
+            ],
+            options={
+                "ordering": ["currency", "date"],
+                "constraints": [models.UniqueConstraint(fields=("currency", "date"), name="exchange_rate_currency_date_uniq")],
+            },
+        ),
+    ]
@@ -12,6 +12,25 @@ class Currency(models.Model):
         return self.code
 
 
+class ExchangeRate(models.Model):
+    """
+    Cotacao diaria de uma moeda em reais, na mesma convencao de
+    Currency.exchange_rate (1 USD = 5.50 BRL).
+    """
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name="rates")
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=14, decimal_places=6)
+
+    class Meta:
+        ordering = ["currency", "date"]
+        constraints = [
+            models.UniqueConstraint(fields=["currency", "date"], name="exchange_rate_currency_date_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
+
+
 class Broker(models.Model):
     name = models.CharField(max_length=100)
     account_number = models.CharField(max_length=500, null=True, blank=True)
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from app.metrics_cache import SCOPE_FX, bump_generations_on_commit
+from brokers.models import Currency, ExchangeRate
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def invalidate_fx_series(sender, instance, **kwargs):
+    bump_generations_on_commit([SCOPE_FX])
@@ -1,12 +1,19 @@
 """
 Tests for Broker and Currency models and views.
 """
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+import numpy as np
 import pytest
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import Client
 from django.urls import reverse
 
-from brokers.models import Broker, Currency
+from brokers.fx import FxRateMissing, FxSeries
+from brokers.models import Broker, Currency, ExchangeRate
 
 
 # ============================================================================
@@ -402,3 +409,77 @@ class TestBrokerDeleteView:
             reverse('broker_delete', kwargs={'pk': 99999})
         )
         assert response.status_code == 404
+
+
+FX_FIXTURES = Path(__file__).parent / "test_data"
+
+
+class TestExchangeRates:
+    """Tests for the FX series and the local-file rate loader."""
+
+    @pytest.fixture
+    def usd(self, db):
+        return Currency.objects.create(code="USD", name="Dolar", exchange_rate=Decimal("5.00"))
+
+    def test_loader_upserts_rates_and_latest_rate(self, usd):
+        """Test the CSV loader is idempotent and keeps Currency.exchange_rate current."""
+        path = FX_FIXTURES / "exchange_rates_usd.csv"
+        out = StringIO()
+        call_command("load_exchange_rates", str(path), stdout=out)
+        call_command("load_exchange_rates", str(path), stdout=StringIO())
+
+        assert ExchangeRate.objects.filter(currency=usd).count() == 24
+        assert ExchangeRate.objects.get(currency=usd, date=date(2024, 1, 2)).rate == Decimal("4.892")
+        usd.refresh_from_db()
+        assert usd.exchange_rate == Decimal("4.9290")
+        assert "24 cotacoes carregadas, 0 linhas com erro" in out.getvalue()
+
+    def test_loader_reports_invalid_rows(self, usd, tmp_path):
+        """Test unknown currencies and bad values are reported, not raised."""
+        path = tmp_path / "rates.csv"
+        path.write_text("date,currency,rate\n02/01/2024,USD,4.89\n2024-01-02,EUR,5.3\n2024-01-03,USD,abc\n")
+        out, err = StringIO(), StringIO()
+
+        call_command("load_exchange_rates", str(path), stdout=out, stderr=err)
+
+        assert "1 cotacoes carregadas, 2 linhas com erro" in out.getvalue()
+        assert "Linha 3" in err.getvalue() and "Linha 4" in err.getvalue()
+
+    def test_series_uses_last_rate_up_to_each_date(self, usd):
+        """Test rates are looked up as-of each date, vectorized."""
+        ExchangeRate.objects.create(currency=usd, date=date(2024, 1, 2), rate=Decimal("4.9"))
+        ExchangeRate.objects.create(currency=usd, date=date(2024, 1, 5), rate=Decimal("5.1"))
+        fx = FxSeries.load()
+
+        rates = fx.rates("USD", [date(2023, 12, 1), date(2024, 1, 2), date(2024, 1, 4), date(2024, 2, 1)])
+
+        np.testing.assert_allclose(rates, [4.9, 4.9, 4.9, 5.1])
+        assert fx.latest("USD") == 5.1
+        np.testing.assert_allclose(
+            fx.convert([10, 49], ["USD", "BRL"], [date(2024, 1, 3), date(2024, 1, 3)], "USD"), [10, 10]
+        )
+
+    def test_series_falls_back_to_currency_rate(self, usd):
+        """Test currencies without a series use exchange_rate and unknown ones raise."""
+        Currency.objects.create(code="EUR", name="Euro")
+        fx = FxSeries.load()
+
+        np.testing.assert_allclose(fx.convert([2], ["USD"], [date(2024, 1, 3)], "BRL"), [10])
+        with pytest.raises(FxRateMissing):
+            fx.latest("EUR")
+
+    def test_convert_leaves_currencies_without_rate_unconverted(self, usd, caplog):
+        """Test amounts in a currency with no rate at all are kept as is, unless strict."""
+        Currency.objects.create(code="EUR", name="Euro")
+        fx = FxSeries.load()
+        dates = [date(2024, 1, 3), date(2024, 1, 3)]
+
+        with caplog.at_level("WARNING", logger="app"):
+            converted = fx.convert([2, 7], ["USD", "EUR"], dates, "BRL")
+
+        np.testing.assert_allclose(converted, [10, 7])
+        assert "EUR" in caplog.text
+        assert fx.missing({"USD", "EUR", "BRL"}) == ["EUR"]
+        np.testing.assert_allclose(fx.convert([2, 7], ["USD", "EUR"], dates, "EUR"), [2, 7])
+        with pytest.raises(FxRateMissing):
+            fx.convert([7], ["EUR"], dates[:1], "BRL", strict=True)
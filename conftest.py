@@ -1,8 +1,12 @@
 """
 Pytest configuration and shared fixtures for InvestSIO tests.
 """
+import json
+import threading
+import time
 from datetime import date, timedelta
 from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
 
 from brokers.models import Broker, Currency
@@ -13,6 +17,15 @@ from outflows.models import Outflow
 from dividends.models import Dividend
 
 
+@pytest.fixture(autouse=True)
+def clear_local_metrics_cache():
+    """Drop the in-process metrics cache tier between tests."""
+    from app.metrics_cache import local_cache
+    local_cache.clear()
+    yield
+    local_cache.clear()
+
+
 # ============================================================================
 # Currency Fixtures
 # ============================================================================
@@ -118,6 +131,18 @@ def ticker_stock(db, category_stock, currency_usd):
     )
 
 
+@pytest.fixture
+def ticker_unrated(db, category_stock):
+    """Create a ticker in a currency without any exchange rate (EUR)."""
+    currency = Currency.objects.create(code="EUR", name="Euro")
+    return Ticker.objects.create(
+        name="SAP",
+        category=category_stock,
+        currency=currency,
+        sector="Tecnologia",
+    )
+
+
 # ============================================================================
 # Inflow Fixtures
 # ============================================================================
@@ -204,3 +229,95 @@ def tomorrow():
 def one_month_ago():
     """Return the date one month ago."""
     return date.today() - timedelta(days=30)
+
+
+# ============================================================================
+# External API Fixtures
+# ============================================================================
+
+class StubServer:
+    """
+    Serves JSON responses registered per path and records every request.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.delay = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append(self.path)
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                path = self.path.split("?")[0]
+                if stub.fail or path not in stub.routes:
+                    self.send_response(500 if stub.fail else 404)
+                    self.end_headers()
+                    return
+
+                body = json.dumps(stub.routes[path]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def hits(self, prefix):
+        return [path for path in self.requests if path.startswith(prefix)]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Start a local stub server for the duration of the test."""
+    server = StubServer()
+    yield server
+    server.close()
+
+
+# ============================================================================
+# Query Budget Fixtures
+# ============================================================================
+
+@pytest.fixture
+def assert_query_budget(client, django_user_model, django_assert_max_num_queries):
+    """
+    Return a checker that GETs a url as a logged-in user, with cold caches,
+    and fails when the request runs more than 'budget' queries.
+
+    The checker returns the number of queries, so tests can also assert that
+    it does not grow with the number of rows.
+    """
+    from django.core.cache import cache
+    from app.metrics_cache import local_cache
+
+    user = django_user_model.objects.create_user(username="budget", password="budget123", is_staff=True)
+    client.force_login(user)
+
+    def check(url, budget):
+        cache.clear()
+        local_cache.clear()
+        with django_assert_max_num_queries(budget) as captured:
+            response = client.get(url)
+        assert response.status_code == 200, f"{url} returned {response.status_code}"
+        return len(captured)
+
+    return check
@@ -7,3 +7,12 @@ class DividendAdmin(admin.ModelAdmin):
 
 
 admin.site.register(models.Dividend, DividendAdmin)
+
+
+
+class ProjectedIncomeAdmin(admin.ModelAdmin):
+    list_display = ("ticker", "payment_date", "currency", "quantity", "value_per_share", "expected_value")
+    search_fields = ("ticker__name", )
+
+
+admin.site.register(models.ProjectedIncome, ProjectedIncomeAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DividendsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dividends"
+
+    def ready(self):
+        import dividends.signals # noqa:F401
@@ -0,0 +1,35 @@
+from app.utils.validators import (
+    validate_ticker_name,
+    validate_year,
+    validate_month,
+    validate_currency_code,
+)
+
+
+def filter_dividends(queryset, params):
+    """
+    Aplica os filtros da listagem de dividendos (ticker, year, month e
+    currency) a um queryset de Dividend. Usado tambem na exportacao.
+
+    Raises:
+        Http404: Se algum filtro for invalido
+    """
+    # Validate and sanitize input parameters
+    ticker = validate_ticker_name(params.get("ticker"))
+    year = validate_year(params.get("year"))
+    month = validate_month(params.get("month"))
+    currency = validate_currency_code(params.get("currency"))
+
+    if ticker:
+        queryset = queryset.filter(ticker__name=ticker)
+
+    if year:
+        queryset = queryset.filter(date__year=year)
+
+    if month:
+        queryset = queryset.filter(date__month=month)
+
+    if currency:
+        queryset = queryset.filter(currency=currency)
+
+    return queryset
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Round
+from app.metrics import invalidate_metrics_cache
+from dividends.models import Dividend
+from tickers.models import PositionHistory
+from tickers.positions import rebuild_position_history
+
+
+class Command(BaseCommand):
+    help = "Recalcula quantity_quote e total_value dos dividendos pela posicao liquida na data de cada um."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ticker", action="append", default=[], help="restringe aos tickers informados")
+        parser.add_argument(
+            "--rebuild-history", action="store_true",
+            help="reconstroi o historico de posicoes antes do recalculo"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        dividends = Dividend.objects.all()
+        if options["ticker"]:
+            dividends = dividends.filter(ticker__name__in=[name.upper() for name in options["ticker"]])
+
+        with transaction.atomic():
+            if options["rebuild_history"]:
+                rebuild_position_history(ticker_ids=set(dividends.values_list("ticker_id", flat=True)))
+            total = self.recompute(dividends)
+
+        invalidate_metrics_cache()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"{total} dividendos recalculados em {elapsed:.2f}s"))
+
+    def recompute(self, dividends):
+        """
+        Atualiza todos os dividendos em duas instrucoes UPDATE: a quantidade
+        vem da ultima linha de PositionHistory ate a data do dividendo.
+        """
+        quantity_as_of = (
+            PositionHistory.objects
+            .filter(ticker=OuterRef("ticker"), date__lte=OuterRef("date"))
+            .order_by("-date")
+            .values("quantity")[:1]
+        )
+        total = dividends.update(quantity_quote=Greatest(Coalesce(Subquery(quantity_as_of), 0), 0))
+        dividends.update(total_value=Round(
+            ExpressionWrapper(F("value") * F("quantity_quote"), output_field=DecimalField()),
+            2,
+        ))
+        return total
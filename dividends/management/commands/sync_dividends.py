@@ -0,0 +1,244 @@
+import logging
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from app.metrics import invalidate_metrics_cache
+from dividends.models import DeclaredDividend, Dividend
+from dividends.projections import refresh_projections
+from services.get_ticker_details import Get_ticker_data
+from services.rate_limiter import RateLimiter
+from tickers.models import PositionHistory, Ticker
+
+logger = logging.getLogger('services')
+
+# Rotulos da BrAPI -> Dividend.income_type
+INCOME_TYPES = {
+    "JCP": "J",
+    "JUROS SOBRE CAPITAL PROPRIO": "J",
+    "JUROS SOBRE CAPITAL PRÓPRIO": "J",
+    "AMORTIZACAO": "A",
+    "AMORTIZAÇÃO": "A",
+}
+DIVIDEND_CURRENCIES = {code for code, _ in Dividend.CURRENCY_CHOICES}
+
+
+class Command(BaseCommand):
+    help = "Sincroniza dividendos pagos e anunciados dos tickers em carteira a partir da BrAPI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="requisicoes em paralelo")
+        parser.add_argument("--rate", type=float, default=5, help="maximo de requisicoes por segundo (0 = sem limite)")
+        parser.add_argument("--ticker", action="append", default=[], help="restringe aos tickers informados")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        tickers = self.held_tickers(options["ticker"])
+        unsupported = self.unsupported_currencies(tickers)
+        payments = self.fetch(tickers, options["concurrency"], options["rate"])
+
+        with transaction.atomic():
+            stats = self.sync(tickers, payments)
+        if stats["created"] or stats["updated"]:
+            invalidate_metrics_cache()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} dividendos criados, {stats['updated']} atualizados, "
+            f"{stats['declared_created']} anuncios criados, {stats['declared_updated']} atualizados, "
+            f"{stats['failures']} tickers com falha, {len(unsupported)} ignorados pela moeda "
+            f"({len(tickers)} tickers em {elapsed:.2f}s)"
+        ))
+        logger.info(f"sync_dividends: {stats}")
+
+    def held_tickers(self, names):
+        """Retorna {codigo: ticker} dos tickers em carteira (ou dos informados)."""
+        tickers = Ticker.objects.select_related("currency")
+        if names:
+            tickers = tickers.filter(name__in=[name.upper() for name in names])
+        else:
+            tickers = tickers.annotate(position_quantity=Sum("positions__quantity")).filter(position_quantity__gt=0)
+        return {ticker.name.upper(): ticker for ticker in tickers}
+
+    def unsupported_currencies(self, tickers):
+        """
+        Remove de 'tickers' (com um aviso) os tickers em moedas que Dividend
+        nao aceita, em vez de gravar os valores com outra moeda.
+
+        Returns:
+            list: Codigos dos tickers removidos
+        """
+        unsupported = sorted(
+            code for code, ticker in tickers.items() if ticker.currency.code not in DIVIDEND_CURRENCIES
+        )
+        if unsupported:
+            names = ", ".join(f"{code} ({tickers[code].currency.code})" for code in unsupported)
+            self.stderr.write(self.style.WARNING(f"Tickers ignorados, moeda sem suporte em Dividend: {names}"))
+            logger.warning(f"sync_dividends: tickers ignorados pela moeda: {names}")
+            for code in unsupported:
+                del tickers[code]
+        return unsupported
+
+    def fetch(self, tickers, concurrency, rate):
+        """
+        Busca os dividendos de cada ticker em paralelo, respeitando o limite
+        de requisicoes. Retorna {codigo: lista de pagamentos} (None em falhas).
+        """
+        service = Get_ticker_data()
+        limiter = RateLimiter(rate)
+
+        def fetch_one(code):
+            limiter.acquire()
+            return code, self.parse_payments(service.get_ticker_dividends(code))
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            return dict(executor.map(fetch_one, list(tickers)))
+
+    def parse_payments(self, data):
+        """
+        Extrai os proventos em dinheiro da resposta da BrAPI. Proventos do
+        mesmo dia e tipo sao somados.
+
+        Returns:
+            list: dicts com payment_date, record_date, income_type e rate, ou
+            None se a resposta for invalida
+        """
+        try:
+            cash_dividends = (data["results"][0].get("dividendsData") or {}).get("cashDividends") or []
+        except (KeyError, IndexError, TypeError):
+            return None
+
+        payments = {}
+        for item in cash_dividends:
+            payment_date = self._date(item.get("paymentDate"))
+            rate = self._decimal(item.get("rate"))
+            if payment_date is None or not rate:
+                continue
+            income_type = INCOME_TYPES.get((item.get("label") or "").strip().upper(), "D")
+            record_date = self._date(item.get("lastDatePrior")) or payment_date
+
+            key = (payment_date, income_type)
+            if key in payments:
+                payments[key]["rate"] += rate
+            else:
+                payments[key] = dict(
+                    payment_date=payment_date, record_date=record_date, income_type=income_type, rate=rate
+                )
+        return list(payments.values())
+
+    def sync(self, tickers, payments):
+        """
+        Compara os proventos com Dividend/DeclaredDividend e grava apenas as
+        diferencas com bulk_create/bulk_update.
+        """
+        stats = dict(created=0, updated=0, declared_created=0, declared_updated=0, failures=0)
+        today = timezone.localdate()
+        ticker_ids = [ticker.id for ticker in tickers.values()]
+        positions = self._position_history(ticker_ids)
+
+        existing = {
+            (dividend.ticker_id, dividend.date, dividend.income_type): dividend
+            for dividend in Dividend.objects.filter(ticker_id__in=ticker_ids)
+        }
+        existing_declared = {
+            (declared.ticker_id, declared.payment_date): declared
+            for declared in DeclaredDividend.objects.filter(ticker_id__in=ticker_ids, payment_date__gt=today)
+        }
+
+        to_create, to_update = [], []
+        declared_to_create, declared_to_update = [], []
+        for code, ticker_payments in payments.items():
+            if ticker_payments is None:
+                stats["failures"] += 1
+                continue
+            ticker = tickers[code]
+            currency = ticker.currency.code
+
+            for payment in ticker_payments:
+                if payment["payment_date"] > today:
+                    value_per_share = payment["rate"].quantize(Decimal("0.01"))
+                    declared = existing_declared.get((ticker.id, payment["payment_date"]))
+                    if declared is None:
+                        declared_to_create.append(DeclaredDividend(
+                            ticker=ticker, value_per_share=value_per_share, payment_date=payment["payment_date"]
+                        ))
+                    elif declared.value_per_share != value_per_share:
+                        declared.value_per_share = value_per_share
+                        declared_to_update.append(declared)
+                    continue
+
+                # Posicao na data com, nao na data de pagamento
+                quantity = max(self._quantity_as_of(positions.get(ticker.id), payment["record_date"]), 0)
+                if not quantity:
+                    continue
+                value = payment["rate"].quantize(Decimal("1e-10"))
+                total_value = (value * quantity).quantize(Decimal("0.01"))
+
+                dividend = existing.get((ticker.id, payment["payment_date"], payment["income_type"]))
+                if dividend is None:
+                    to_create.append(Dividend(
+                        ticker=ticker, value=value, date=payment["payment_date"], currency=currency,
+                        quantity_quote=quantity, total_value=total_value, income_type=payment["income_type"],
+                    ))
+                elif (dividend.value, dividend.quantity_quote, dividend.total_value) != (value, quantity, total_value):
+                    dividend.value = value
+                    dividend.quantity_quote = quantity
+                    dividend.total_value = total_value
+                    to_update.append(dividend)
+
+        Dividend.objects.bulk_create(to_create, batch_size=500)
+        Dividend.objects.bulk_update(to_update, ["value", "quantity_quote", "total_value"], batch_size=500)
+        DeclaredDividend.objects.bulk_create(declared_to_create, batch_size=500)
+        DeclaredDividend.objects.bulk_update(declared_to_update, ["value_per_share"], batch_size=500)
+        # bulk_create/bulk_update nao disparam os signals de DeclaredDividend
+        if declared_to_create or declared_to_update:
+            refresh_projections(ticker_ids={declared.ticker_id for declared in declared_to_create + declared_to_update})
+
+        stats.update(
+            created=len(to_create), updated=len(to_update),
+            declared_created=len(declared_to_create), declared_updated=len(declared_to_update),
+        )
+        return stats
+
+    def _position_history(self, ticker_ids):
+        """Historico acumulado de todos os tickers, lido em uma unica query."""
+        history = {}
+        rows = (
+            PositionHistory.objects
+            .filter(ticker_id__in=ticker_ids)
+            .order_by("ticker_id", "date")
+            .values_list("ticker_id", "date", "quantity")
+        )
+        for ticker_id, day, quantity in rows:
+            dates, quantities = history.setdefault(ticker_id, ([], []))
+            dates.append(day)
+            quantities.append(quantity)
+        return history
+
+    def _quantity_as_of(self, history, day):
+        if not history:
+            return 0
+        dates, quantities = history
+        index = bisect_right(dates, day)
+        return quantities[index - 1] if index else 0
+
+    def _date(self, value):
+        if not isinstance(value, str):
+            return None
+        try:
+            return parse_date(value[:10])
+        except ValueError:
+            return None
+
+    def _decimal(self, value):
+        if value is None:
+            return None
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:10
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_projected_income(apps, schema_editor):
+    DeclaredDividend = apps.get_model("dividends", "DeclaredDividend")
+    ProjectedIncome = apps.get_model("dividends", "ProjectedIncome")
+    Position = apps.get_model("tickers", "Position")
+
+    quantities = dict(
+        Position.objects
+        .order_by()
+        .values("ticker_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("ticker_id", "total")
+    )
+    rows = []
+    for declared in DeclaredDividend.objects.values("id", "ticker_id", "payment_date", "value_per_share", "ticker__currency__code"):
+        quantity = quantities.get(declared["ticker_id"]) or 0
+        if quantity <= 0:
+            continue
+        rows.append(ProjectedIncome(
+            declared_dividend_id=declared["id"],
+            ticker_id=declared["ticker_id"],
+            payment_date=declared["payment_date"],
+            currency=declared["ticker__currency__code"],
+            quantity=quantity,
+            value_per_share=declared["value_per_share"],
+            expected_value=(declared["value_per_share"] * quantity).quantize(Decimal("0.01")),
+        ))
+    ProjectedIncome.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dividends", "0009_fix_related_name_typo"),
+        ("tickers", "0007_position_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectedIncome",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("payment_date", models.DateField()),
+                ("currency", models.CharField(max_length=3)),
+                ("quantity", models.IntegerField(default=0)),
+                ("value_per_share", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("expected_value", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("declared_dividend", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="projection", to="dividends.declareddividend")),
+                ("ticker", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="projected_incomes", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["payment_date", "ticker"],
+                "indexes": [models.Index(fields=["payment_date", "currency"], name="projected_income_date_idx")],
+            },
+        ),
+        migrations.RunPython(populate_projected_income, migrations.RunPython.noop),
+    ]
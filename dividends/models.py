@@ -1,9 +1,10 @@
+from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from tickers.models import Ticker
-from inflows.models import Inflow
+from tickers.positions import position_as_of
 
 
 class Dividend(models.Model):
@@ -47,12 +48,13 @@ class Dividend(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.quantity_quote:
-            self.quantity_quote = Inflow.objects.filter(
-                ticker=self.ticker,
-                date__lte=self.date
-            ).aggregate(total=models.Sum("quantity"))["total"] or 0
+            # Posicao liquida (compras - vendas) na data, lida do historico acumulado
+            self.quantity_quote = max(position_as_of(self.ticker_id, self.date)["quantity"], 0)
 
-            self.total_value = float(self.value) * float(self.quantity_quote) if self.value and self.quantity_quote else 0
+            self.total_value = (
+                (Decimal(str(self.value)) * self.quantity_quote).quantize(Decimal("0.01"))
+                if self.value and self.quantity_quote else 0
+            )
         super().save(*args, **kwargs)
 
     class Meta:
@@ -84,3 +86,33 @@ class DeclaredDividend(models.Model):
 
     def __str__(self):
         return f"Dividendo anunciado de {self.ticker.name}"
+
+
+class ProjectedIncome(models.Model):
+    """
+    Renda esperada de um dividendo anunciado, pela posicao atual do ticker.
+
+    Tabela derivada de DeclaredDividend e Position, atualizada por ticker
+    (ver dividends/projections.py) sempre que as posicoes ou os anuncios
+    mudam. O calendario de proventos e lido dela com uma unica query.
+    """
+    declared_dividend = models.OneToOneField(
+        DeclaredDividend,
+        on_delete=models.CASCADE,
+        related_name="projection"
+    )
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name="projected_incomes")
+    payment_date = models.DateField()
+    currency = models.CharField(max_length=3)
+    quantity = models.IntegerField(default=0)
+    value_per_share = models.DecimalField(max_digits=10, decimal_places=2)
+    expected_value = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        ordering = ["payment_date", "ticker"]
+        indexes = [
+            models.Index(fields=['payment_date', 'currency'], name='projected_income_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Renda esperada de {self.ticker.name} em {self.payment_date}"
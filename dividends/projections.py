@@ -0,0 +1,111 @@
+"""
+Projecao de renda com base nos dividendos anunciados (DeclaredDividend).
+
+A renda esperada de cada anuncio (valor por cota x posicao atual) fica
+materializada em ProjectedIncome, refeita por ticker quando as posicoes ou
+os anuncios mudam. O calendario e montado a partir de uma unica query.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from tickers.models import Position
+from .models import DeclaredDividend, ProjectedIncome
+
+
+# Sem savepoint: roda dentro das transacoes da importacao e do historico de
+# posicoes (signal positions_changed), que ja desfazem tudo em caso de erro
+@transaction.atomic(savepoint=False)
+def refresh_projections(ticker_ids=None):
+    """
+    Recalcula a renda esperada dos anuncios dos tickers informados (ou de
+    todos). Le os anuncios junto com a posicao de cada ticker em uma query.
+    Retorna o numero de linhas criadas.
+    """
+    declared = DeclaredDividend.objects.all()
+    projections = ProjectedIncome.objects.all()
+    if ticker_ids is not None:
+        ticker_ids = set(ticker_ids)
+        declared = declared.filter(ticker_id__in=ticker_ids)
+        projections = projections.filter(ticker_id__in=ticker_ids)
+
+    position = (
+        Position.objects
+        .filter(ticker_id=OuterRef("ticker_id"))
+        .order_by()
+        .values("ticker_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+
+    rows = []
+    for item in declared.annotate(position=Subquery(position)).values(
+        "id", "ticker_id", "payment_date", "value_per_share", "ticker__currency__code", "position"
+    ):
+        quantity = item["position"] or 0
+        if quantity <= 0:
+            continue
+        rows.append(ProjectedIncome(
+            declared_dividend_id=item["id"],
+            ticker_id=item["ticker_id"],
+            payment_date=item["payment_date"],
+            currency=item["ticker__currency__code"],
+            quantity=quantity,
+            value_per_share=item["value_per_share"],
+            expected_value=(item["value_per_share"] * quantity).quantize(Decimal("0.01")),
+        ))
+
+    projections.delete()
+    ProjectedIncome.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def income_calendar(start=None, months=12, currency=None):
+    """
+    Monta o calendario de renda esperada a partir do mes de 'start' (mes
+    atual por padrao), com uma unica query em ProjectedIncome.
+
+    Returns:
+        dict: 'months' (lista com month, entries e totals por moeda) e
+        'totals' (renda esperada no periodo por moeda)
+    """
+    start = (start or timezone.localdate()).replace(day=1)
+    end = start + relativedelta(months=months)
+
+    incomes = (
+        ProjectedIncome.objects
+        .filter(payment_date__gte=start, payment_date__lt=end)
+        .order_by("payment_date", "ticker__name")
+        .values("payment_date", "currency", "quantity", "value_per_share", "expected_value", "ticker__name")
+    )
+    if currency:
+        incomes = incomes.filter(currency=currency)
+
+    calendar = {
+        start + relativedelta(months=offset): dict(entries=[], totals=defaultdict(Decimal))
+        for offset in range(months)
+    }
+    totals = defaultdict(Decimal)
+    for income in incomes:
+        month = calendar[income["payment_date"].replace(day=1)]
+        month["entries"].append(dict(
+            ticker=income["ticker__name"],
+            payment_date=income["payment_date"],
+            currency=income["currency"],
+            quantity=income["quantity"],
+            value_per_share=income["value_per_share"],
+            expected_value=income["expected_value"],
+        ))
+        month["totals"][income["currency"]] += income["expected_value"]
+        totals[income["currency"]] += income["expected_value"]
+
+    return dict(
+        months=[
+            dict(month=month, entries=data["entries"], totals=dict(data["totals"]))
+            for month, data in calendar.items()
+        ],
+        totals=dict(totals),
+    )
@@ -0,0 +1,45 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from app.metrics import invalidate_dividend_metrics
+from dividends.models import DeclaredDividend, Dividend
+from dividends.projections import refresh_projections
+from tickers.models import Ticker
+from tickers.positions import positions_changed
+
+
+@receiver(pre_save, sender=Dividend)
+def snapshot_metrics_values(sender, instance, **kwargs):
+    # Guarda ticker e data persistidos para invalidar tambem os escopos antigos
+    instance._metrics_snapshot = None
+    if instance.pk:
+        instance._metrics_snapshot = sender.objects.filter(pk=instance.pk).values("ticker_id", "date").first()
+
+
+@receiver([post_save, post_delete], sender=Dividend)
+def invalidate_metrics(sender, instance, **kwargs):
+    ticker_ids = {instance.ticker_id}
+    dates = [instance.date]
+    snapshot = getattr(instance, "_metrics_snapshot", None)
+    if snapshot:
+        ticker_ids.add(snapshot["ticker_id"])
+        dates.append(snapshot["date"])
+    invalidate_dividend_metrics(ticker_ids, dates)
+
+
+@receiver(positions_changed)
+def refresh_projections_on_positions(sender, ticker_ids=None, **kwargs):
+    # A renda esperada depende da posicao atual de cada ticker
+    refresh_projections(ticker_ids)
+
+
+@receiver([post_save, post_delete], sender=DeclaredDividend)
+def refresh_projections_on_declaration(sender, instance, **kwargs):
+    refresh_projections({instance.ticker_id})
+
+
+@receiver(post_save, sender=Ticker)
+def refresh_projections_on_ticker(sender, instance, created, update_fields=None, **kwargs):
+    # A moeda da projecao vem do ticker; atualizacoes so de quantidade nao a alteram
+    if created or (update_fields is not None and "currency" not in update_fields):
+        return
+    refresh_projections({instance.id})
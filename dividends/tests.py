@@ -1,16 +1,24 @@
 """
 Tests for Dividend model validators.
 """
+import json
 from datetime import date, timedelta
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 import pytest
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
 
 from brokers.models import Broker, Currency
 from categories.models import Category
 from tickers.models import Ticker
 from inflows.models import Inflow
-from dividends.models import Dividend, DeclaredDividend
+from outflows.models import Outflow
+from dividends.models import Dividend, DeclaredDividend, ProjectedIncome
+from dividends.projections import income_calendar
 
 
 @pytest.fixture
@@ -305,3 +313,230 @@ class TestDeclaredDividendModel:
         declared_list = list(DeclaredDividend.objects.all())
         assert declared_list[0] == declared2
         assert declared_list[1] == declared1
+
+
+class TestDividendQuantities:
+    """Tests for the net position used as quantity_quote."""
+
+    @pytest.fixture
+    def trades(self, ticker, broker):
+        Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=100,
+            date=date.today() - timedelta(days=60),
+        )
+        Outflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("12.00"), quantity=40,
+            date=date.today() - timedelta(days=30),
+        )
+
+    def test_quantity_quote_discounts_outflows(self, ticker, trades):
+        """Test sales before the dividend date reduce the quantity."""
+        dividend = Dividend.objects.create(ticker=ticker, value=Decimal("0.5000000000"), date=date.today())
+        assert dividend.quantity_quote == 60
+        assert dividend.total_value == Decimal("30.00")
+
+        earlier = Dividend.objects.create(
+            ticker=ticker, value=Decimal("0.5000000000"), date=date.today() - timedelta(days=45)
+        )
+        assert earlier.quantity_quote == 100
+
+    def test_save_cost_does_not_grow_with_history(self, ticker, broker, trades, django_assert_num_queries):
+        """Test saving a dividend costs the same queries however many trades exist."""
+        for days in range(20):
+            Inflow.objects.create(
+                ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today() - timedelta(days=90 + days),
+            )
+        # Posicao na data, INSERT e categoria do ticker para invalidar o cache
+        with django_assert_num_queries(3):
+            Dividend.objects.create(ticker=ticker, value=Decimal("0.5000000000"), date=date.today())
+
+    def test_recompute_command_updates_all_dividends(self, ticker, trades):
+        """Test the bulk command fixes stale quantities and totals in one pass."""
+        stale = Dividend.objects.create(
+            ticker=ticker, value=Decimal("0.5000000000"), date=date.today(), quantity_quote=100,
+        )
+        before_sale = Dividend.objects.create(
+            ticker=ticker, value=Decimal("1.0000000000"), date=date.today() - timedelta(days=45),
+            quantity_quote=1,
+        )
+        out = StringIO()
+        call_command("recompute_dividend_quantities", stdout=out)
+
+        stale.refresh_from_db()
+        before_sale.refresh_from_db()
+        assert stale.quantity_quote == 60
+        assert stale.total_value == Decimal("30.00")
+        assert before_sale.quantity_quote == 100
+        assert before_sale.total_value == Decimal("100.00")
+        assert "2 dividendos recalculados" in out.getvalue()
+
+    def test_recompute_command_is_set_based(self, ticker, trades, django_assert_max_num_queries):
+        """Test the number of queries does not grow with the number of dividends."""
+        for days in range(10):
+            Dividend.objects.create(
+                ticker=ticker, value=Decimal("0.1000000000"), date=date.today() - timedelta(days=days),
+            )
+        with django_assert_max_num_queries(4):
+            call_command("recompute_dividend_quantities", stdout=StringIO())
+
+
+BRAPI_FIXTURES = Path(__file__).parent / "test_data"
+
+
+class TestSyncDividendsCommand:
+    """Tests for the BrAPI dividend sync, using recorded responses."""
+
+    @pytest.fixture
+    def brapi(self, stub_server, settings, monkeypatch):
+        settings.BRAPI_URL = f"{stub_server.url}/quote"
+        settings.BRAPI_TOKEN = ""
+        # Resposta gravada em 20/06/2024
+        monkeypatch.setattr("django.utils.timezone.localdate", lambda *args, **kwargs: date(2024, 6, 20))
+        cache.clear()
+        yield stub_server
+        cache.clear()
+
+    @pytest.fixture
+    def hglg(self, brapi, category, currency, broker):
+        ticker = Ticker.objects.create(name="HGLG11", category=category, currency=currency)
+        Inflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("150"), quantity=100, date=date(2023, 1, 10))
+        Inflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("160"), quantity=20, date=date(2024, 5, 20))
+        Outflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("165"), quantity=10, date=date(2024, 6, 5))
+        brapi.routes["/quote/HGLG11"] = json.loads((BRAPI_FIXTURES / "brapi_dividends_HGLG11.json").read_text())
+        return ticker
+
+    def test_sync_creates_paid_and_declared_dividends(self, hglg):
+        """Test paid dividends use the position on the record date and future ones become declared."""
+        out = StringIO()
+        call_command("sync_dividends", "--rate=0", stdout=out)
+
+        dividends = {
+            (dividend.date, dividend.income_type): dividend
+            for dividend in Dividend.objects.filter(ticker=hglg)
+        }
+        assert set(dividends) == {(date(2024, 5, 15), "D"), (date(2024, 5, 15), "A"), (date(2024, 6, 14), "D")}
+        assert dividends[(date(2024, 5, 15), "D")].quantity_quote == 100
+        assert dividends[(date(2024, 5, 15), "A")].total_value == Decimal("35.00")
+        assert dividends[(date(2024, 6, 14), "D")].quantity_quote == 120
+        assert dividends[(date(2024, 6, 14), "D")].total_value == Decimal("132.00")
+
+        declared = DeclaredDividend.objects.get(ticker=hglg)
+        assert declared.payment_date == date(2024, 7, 12)
+        assert declared.value_per_share == Decimal("1.10")
+        assert declared.projection.expected_value == Decimal("121.00")
+        assert "3 dividendos criados, 0 atualizados, 1 anuncios criados" in out.getvalue()
+
+    def test_sync_only_writes_changes(self, hglg):
+        """Test a second run is a no-op and a drifted row is updated in place."""
+        call_command("sync_dividends", "--rate=0", stdout=StringIO())
+        Dividend.objects.filter(date=date(2024, 6, 14)).update(quantity_quote=1, total_value=Decimal("1.10"))
+
+        out = StringIO()
+        call_command("sync_dividends", "--rate=0", stdout=out)
+
+        assert Dividend.objects.count() == 3
+        assert Dividend.objects.get(date=date(2024, 6, 14)).quantity_quote == 120
+        assert "0 dividendos criados, 1 atualizados, 0 anuncios criados, 0 atualizados" in out.getvalue()
+
+    def test_sync_fetches_held_tickers_concurrently(self, hglg, brapi, category, currency, broker):
+        """Test every held ticker is requested once and API failures are counted, not raised."""
+        other = Ticker.objects.create(name="XPML11", category=category, currency=currency)
+        Inflow.objects.create(ticker=other, broker=broker, cost_price=Decimal("100"), quantity=5, date=date(2024, 1, 2))
+        Ticker.objects.create(name="SOLD11", category=category, currency=currency)
+
+        out = StringIO()
+        call_command("sync_dividends", "--rate=0", "--concurrency=4", stdout=out)
+
+        assert sorted(path.split("?")[0] for path in brapi.requests) == ["/quote/HGLG11", "/quote/XPML11"]
+        assert "1 tickers com falha" in out.getvalue()
+        assert Dividend.objects.filter(ticker=hglg).count() == 3
+
+    def test_sync_skips_tickers_in_unsupported_currencies(self, hglg, brapi, category, broker):
+        """Test a ticker in a currency Dividend does not accept is skipped with a warning, not stored as BRL."""
+        euro = Currency.objects.create(code="EUR", name="Euro")
+        sap = Ticker.objects.create(name="SAP", category=category, currency=euro)
+        Inflow.objects.create(ticker=sap, broker=broker, cost_price=Decimal("100"), quantity=5, date=date(2024, 1, 2))
+        brapi.routes["/quote/SAP"] = brapi.routes["/quote/HGLG11"]
+
+        out, err = StringIO(), StringIO()
+        call_command("sync_dividends", "--rate=0", stdout=out, stderr=err)
+
+        assert [path.split("?")[0] for path in brapi.requests] == ["/quote/HGLG11"]
+        assert not Dividend.objects.filter(ticker=sap).exists()
+        assert "SAP (EUR)" in err.getvalue()
+        assert "1 ignorados pela moeda" in out.getvalue()
+
+
+class TestProjectedIncome:
+    """Tests for the projected income table and the dividend calendar."""
+
+    @pytest.fixture
+    def held(self, ticker, broker):
+        Inflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("100"), quantity=10, date=date(2024, 1, 10))
+        return ticker
+
+    def test_projection_uses_current_position(self, held):
+        """Test a declared dividend is projected with the current position."""
+        declared = DeclaredDividend.objects.create(
+            ticker=held, value_per_share=Decimal("1.25"), payment_date=date.today() + timedelta(days=10)
+        )
+
+        projection = ProjectedIncome.objects.get(declared_dividend=declared)
+        assert projection.quantity == 10
+        assert projection.currency == "BRL"
+        assert projection.expected_value == Decimal("12.50")
+
+    def test_projection_follows_trades_and_declarations(self, held, broker):
+        """Test trades, value changes and deletions keep the projections in sync."""
+        declared = DeclaredDividend.objects.create(
+            ticker=held, value_per_share=Decimal("1.00"), payment_date=date.today() + timedelta(days=10)
+        )
+
+        Inflow.objects.create(ticker=held, broker=broker, cost_price=Decimal("100"), quantity=5, date=date(2024, 2, 10))
+        assert ProjectedIncome.objects.get().expected_value == Decimal("15.00")
+
+        Outflow.objects.create(ticker=held, broker=broker, cost_price=Decimal("100"), quantity=15, date=date(2024, 3, 10))
+        assert not ProjectedIncome.objects.exists()
+
+        Inflow.objects.create(ticker=held, broker=broker, cost_price=Decimal("100"), quantity=2, date=date(2024, 4, 10))
+        declared.value_per_share = Decimal("3.00")
+        declared.save()
+        assert ProjectedIncome.objects.get().expected_value == Decimal("6.00")
+
+        declared.delete()
+        assert not ProjectedIncome.objects.exists()
+
+    def test_calendar_groups_by_month_and_currency(self, held, broker, category, django_assert_num_queries):
+        """Test the calendar is built in one query and totals are split by currency."""
+        usd = Currency.objects.create(code="USD", name="Dolar")
+        stock = Ticker.objects.create(name="O", category=category, currency=usd)
+        Inflow.objects.create(ticker=stock, broker=broker, cost_price=Decimal("50"), quantity=4, date=date(2024, 1, 10))
+
+        start = date.today().replace(day=1)
+        DeclaredDividend.objects.create(ticker=held, value_per_share=Decimal("1.00"), payment_date=start + timedelta(days=40))
+        DeclaredDividend.objects.create(ticker=stock, value_per_share=Decimal("0.25"), payment_date=start + timedelta(days=40))
+        DeclaredDividend.objects.create(ticker=held, value_per_share=Decimal("2.00"), payment_date=start + timedelta(days=70))
+
+        with django_assert_num_queries(1):
+            calendar = income_calendar(start=start, months=3)
+
+        assert [len(month["entries"]) for month in calendar["months"]] == [0, 2, 1]
+        assert calendar["months"][1]["totals"] == {"BRL": Decimal("10.00"), "USD": Decimal("1.00")}
+        assert calendar["totals"] == {"BRL": Decimal("30.00"), "USD": Decimal("1.00")}
+        assert income_calendar(start=start, months=3, currency="USD")["totals"] == {"USD": Decimal("1.00")}
+
+    def test_calendar_view(self, client, held, django_user_model):
+        """Test the calendar page lists the expected income."""
+        DeclaredDividend.objects.create(
+            ticker=held, value_per_share=Decimal("1.00"), payment_date=date.today() + timedelta(days=10)
+        )
+        django_user_model.objects.create_user(username="testuser", password="testpass123")
+        client.login(username="testuser", password="testpass123")
+
+        response = client.get(reverse("dividend_calendar"))
+
+        assert response.status_code == 200
+        assert response.context["totals"] == {"BRL": Decimal("10.00")}
+        assert "TEST11" in response.content.decode()
+        assert client.get(reverse("dividend_calendar"), {"currency": "XX1"}).status_code == 404
@@ -3,15 +3,12 @@ from django.db.models import Sum
 from collections import defaultdict
 from django.db.models.functions import ExtractMonth, ExtractYear
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from . import models, forms
+from .filters import filter_dividends
+from .projections import income_calendar
 from app import metrics
-from app.utils.validators import (
-    validate_ticker_name,
-    validate_year,
-    validate_month,
-    validate_currency_code,
-)
+from app.utils.validators import validate_currency_code
 
 
 class DividendListView(LoginRequiredMixin, ListView):
@@ -26,26 +23,7 @@ class DividendListView(LoginRequiredMixin, ListView):
             'ticker__category',
             'ticker__currency'
         )
-
-        # Validate and sanitize input parameters
-        ticker = validate_ticker_name(self.request.GET.get("ticker"))
-        year = validate_year(self.request.GET.get("year"))
-        month = validate_month(self.request.GET.get("month"))
-        currency = validate_currency_code(self.request.GET.get("currency"))
-
-        if ticker:
-            queryset = queryset.filter(ticker__name=ticker)
-
-        if year:
-            queryset = queryset.filter(date__year=year)
-
-        if month:
-            queryset = queryset.filter(date__month=month)
-
-        if currency:
-            queryset = queryset.filter(currency=currency)
-
-        return queryset
+        return filter_dividends(queryset, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -65,6 +43,25 @@ class DividendListView(LoginRequiredMixin, ListView):
         return context
 
 
+class DividendCalendarView(LoginRequiredMixin, TemplateView):
+    """
+    Calendario de proventos anunciados e renda esperada por mes e moeda,
+    lido da tabela ProjectedIncome.
+    """
+    template_name = "dividend_calendar.html"
+    months = 12
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        currency = validate_currency_code(self.request.GET.get("currency"))
+
+        calendar = income_calendar(months=self.months, currency=currency)
+        context["calendar"] = calendar["months"]
+        context["totals"] = calendar["totals"]
+        context["selected_currency"] = currency
+        return context
+
+
 class DividendCreateView(LoginRequiredMixin, CreateView):
     model = models.Dividend
     template_name = "dividend_create.html"
@@ -0,0 +1,25 @@
+def filter_trades(queryset, params):
+    """
+    Aplica os filtros da listagem de compras (ticker, broker, date_from e
+    date_to) a um queryset de Inflow ou Outflow. Usado tambem na exportacao.
+    """
+    # Filter by ticker
+    ticker_id = params.get("ticker")
+    if ticker_id:
+        queryset = queryset.filter(ticker_id=ticker_id)
+
+    # Filter by broker
+    broker_id = params.get("broker")
+    if broker_id:
+        queryset = queryset.filter(broker_id=broker_id)
+
+    # Filter by date range
+    date_from = params.get("date_from")
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+
+    date_to = params.get("date_to")
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+
+    return queryset
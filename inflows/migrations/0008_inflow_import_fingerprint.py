@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inflows", "0007_alter_inflow_cost_price_alter_inflow_quantity_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inflow",
+            name="import_fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
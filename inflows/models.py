@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -43,6 +43,8 @@ class Inflow(models.Model):
         validators=[MinValueValidator(0, message="A taxa nao pode ser negativa.")]
     )
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="Compra")
+    # Impressao digital da linha de origem em importacoes (import_fiis)
+    import_fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def clean(self):
         """Valida os dados antes de salvar."""
@@ -57,7 +59,13 @@ class Inflow(models.Model):
             self.total_price = self.cost_price * self.quantity
         else:
             self.total_price = 0
-        super().save(*args, **kwargs)
+        # A posicao (tickers.Position) e atualizada por signal na mesma transacao
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     class Meta:
         ordering = ["-date"]
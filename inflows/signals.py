@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from app.metrics import invalidate_trade_metrics
 from inflows.models import Inflow
+from tickers.positions import INFLOW, apply_trade, refresh_position_history, trade_values
+
 
 @receiver(post_save, sender=Inflow)
 def update_ticker_quantity(sender, instance, created, **kwargs):
@@ -8,4 +11,41 @@ def update_ticker_quantity(sender, instance, created, **kwargs):
         if instance.quantity > 0:
             ticker = instance.ticker
             ticker.quantity += instance.quantity
-            ticker.save()
\ No newline at end of file
+            ticker.save(update_fields=["quantity"])
+
+
+@receiver(pre_save, sender=Inflow)
+def snapshot_position_values(sender, instance, **kwargs):
+    # Guarda os valores persistidos para desfazer o delta antigo no update
+    instance._position_snapshot = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._position_snapshot = trade_values(previous)
+
+
+@receiver(post_save, sender=Inflow)
+def update_position(sender, instance, **kwargs):
+    snapshot = getattr(instance, "_position_snapshot", None)
+    if snapshot:
+        apply_trade(snapshot, INFLOW, removing=True)
+    values = trade_values(instance)
+    apply_trade(values, INFLOW)
+    refresh_position_history(snapshot, values)
+
+
+@receiver(post_delete, sender=Inflow)
+def remove_position(sender, instance, **kwargs):
+    values = trade_values(instance)
+    apply_trade(values, INFLOW, removing=True)
+    refresh_position_history(values)
+
+
+@receiver([post_save, post_delete], sender=Inflow)
+def invalidate_metrics(sender, instance, **kwargs):
+    # Apenas os escopos do ticker (e do ticker anterior, se mudou) sao invalidados
+    ticker_ids = {instance.ticker_id}
+    snapshot = getattr(instance, "_position_snapshot", None)
+    if snapshot:
+        ticker_ids.add(snapshot["ticker_id"])
+    invalidate_trade_metrics(ticker_ids, inflow=True)
@@ -2,6 +2,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from .filters import filter_trades
 from .models import Inflow
 from . import forms
 from tickers.models import Ticker
@@ -22,27 +23,7 @@ class InflowListView(LoginRequiredMixin, ListView):
             'broker',
             'broker__currency'
         )
-
-        # Filter by ticker
-        ticker_id = self.request.GET.get("ticker")
-        if ticker_id:
-            queryset = queryset.filter(ticker_id=ticker_id)
-
-        # Filter by broker
-        broker_id = self.request.GET.get("broker")
-        if broker_id:
-            queryset = queryset.filter(broker_id=broker_id)
-
-        # Filter by date range
-        date_from = self.request.GET.get("date_from")
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-
-        date_to = self.request.GET.get("date_to")
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
-
-        return queryset
+        return filter_trades(queryset, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -6,4 +6,13 @@ class OutflowAdmin(admin.ModelAdmin):
     list_display = ("ticker", "quantity", "total_price",)
     search_fields = ("ticker",)
 
-admin.site.register(models.Outflow, OutflowAdmin)
\ No newline at end of file
+admin.site.register(models.Outflow, OutflowAdmin)
+
+
+class RealizedGainAdmin(admin.ModelAdmin):
+    list_display = ("ticker", "date", "asset_class", "quantity", "sale_value", "cost", "gain")
+    list_filter = ("asset_class", )
+    search_fields = ("ticker__name", )
+
+
+admin.site.register(models.RealizedGain, RealizedGainAdmin)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from outflows.taxes import recompute_realized_gains
+from tickers.models import Ticker
+
+
+class Command(BaseCommand):
+    help = "Recalcula o ganho de capital (custo medio) de todas as vendas, ou das vendas de um ticker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ticker", type=str, help="recalcula apenas o ticker informado")
+
+    def handle(self, *args, **options):
+        ticker_ids = None
+        if options["ticker"]:
+            ticker = Ticker.objects.filter(name__iexact=options["ticker"].strip()).first()
+            if ticker is None:
+                raise CommandError(f"Ticker '{options['ticker']}' não encontrado.")
+            ticker_ids = [ticker.id]
+
+        total = recompute_realized_gains(ticker_ids)
+        self.stdout.write(self.style.SUCCESS(f"{total} vendas apuradas"))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outflows", "0005_alter_outflow_cost_price_alter_outflow_quantity_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outflow",
+            name="import_fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:40
+
+import unicodedata
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada das regras de outflows.taxes na data desta migracao
+CATEGORY_ASSET_CLASSES = {"ACAO": "acao", "ACOES": "acao", "ETF": "etf", "ETFS": "etf", "FII": "fii", "FIIS": "fii"}
+CENTS = Decimal("0.01")
+BUY = 0
+SELL = 1
+
+
+def asset_class(category_title, currency_code):
+    if currency_code and currency_code != "BRL":
+        return "exterior"
+    key = unicodedata.normalize("NFKD", category_title or "").encode("ascii", "ignore").decode().strip().upper()
+    return CATEGORY_ASSET_CLASSES.get(key, "acao")
+
+
+def replay(trades):
+    """Vendas de um ticker pelo custo medio, com as negociacoes em ordem."""
+    quantity, cost = 0, Decimal("0")
+    sales = []
+    for trade in trades:
+        if trade["kind"] == BUY:
+            quantity += trade["quantity"]
+            cost += trade["value"]
+            continue
+
+        if quantity <= 0:
+            sold_cost = Decimal("0")
+        elif trade["quantity"] >= quantity:
+            sold_cost = cost
+        else:
+            sold_cost = cost * trade["quantity"] / quantity
+        quantity -= trade["quantity"]
+        cost -= sold_cost
+        if quantity <= 0:
+            quantity, cost = 0, Decimal("0")
+
+        sold_cost = sold_cost.quantize(CENTS)
+        sales.append(dict(
+            outflow_id=trade["id"],
+            date=trade["date"],
+            quantity=trade["quantity"],
+            sale_value=trade["value"],
+            cost=sold_cost,
+            gain=trade["value"] - sold_cost,
+            position_after=quantity,
+            average_cost_after=(cost / quantity).quantize(Decimal("1e-8")) if quantity else Decimal("0"),
+        ))
+    return sales
+
+
+def populate_realized_gains(apps, schema_editor):
+    Inflow = apps.get_model("inflows", "Inflow")
+    Outflow = apps.get_model("outflows", "Outflow")
+    RealizedGain = apps.get_model("outflows", "RealizedGain")
+
+    trades = {}
+    for row in Inflow.objects.values("id", "ticker_id", "date", "quantity", "total_price", "tax"):
+        trades.setdefault(row["ticker_id"], []).append(dict(
+            kind=BUY, id=row["id"], date=row["date"], quantity=row["quantity"],
+            value=(row["total_price"] or Decimal("0")) + row["tax"],
+        ))
+    classes = {}
+    for row in Outflow.objects.values(
+        "id", "ticker_id", "date", "quantity", "total_price", "tax", "ticker__category__title", "ticker__currency__code"
+    ):
+        classes[row["ticker_id"]] = asset_class(row["ticker__category__title"], row["ticker__currency__code"])
+        trades.setdefault(row["ticker_id"], []).append(dict(
+            kind=SELL, id=row["id"], date=row["date"], quantity=row["quantity"],
+            value=(row["total_price"] or Decimal("0")) - row["tax"],
+        ))
+
+    rows = []
+    for ticker_id, ticker_trades in trades.items():
+        if ticker_id in classes:
+            # Compras antes das vendas no mesmo dia
+            ordered = sorted(ticker_trades, key=lambda trade: (trade["date"], trade["kind"], trade["id"]))
+            rows.extend(
+                RealizedGain(ticker_id=ticker_id, asset_class=classes[ticker_id], **sale)
+                for sale in replay(ordered)
+            )
+    RealizedGain.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outflows", "0006_outflow_import_fingerprint"),
+        ("inflows", "0008_inflow_import_fingerprint"),
+        ("tickers", "0007_position_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RealizedGain",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("asset_class", models.CharField(choices=[("acao", "Ação"), ("etf", "ETF"), ("fii", "FII"), ("exterior", "Exterior")], max_length=10)),
+                ("quantity", models.IntegerField()),
+                ("sale_value", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("cost", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("gain", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("position_after", models.IntegerField()),
+                ("average_cost_after", models.DecimalField(decimal_places=8, max_digits=20)),
+                ("outflow", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="realized_gain", to="outflows.outflow")),
+                ("ticker", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="realized_gains", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["date", "outflow"],
+                "indexes": [models.Index(fields=["date", "asset_class"], name="realized_gain_date_class_idx"), models.Index(fields=["ticker", "date"], name="realized_gain_ticker_date_idx")],
+            },
+        ),
+        migrations.RunPython(populate_realized_gains, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:40
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def recompute_import_fingerprints(apps, schema_editor):
+    # Mesma chave de import_fiis: valores convertidos em vez do texto do CSV
+    Inflow = apps.get_model("inflows", "Inflow")
+    Outflow = apps.get_model("outflows", "Outflow")
+
+    for model, kind in ((Inflow, None), (Outflow, "Venda")):
+        occurrences = {}
+        rows = list(model.objects.filter(import_fingerprint__isnull=False).select_related("ticker").order_by("id"))
+        for row in rows:
+            key = "|".join((
+                row.ticker.name.upper(),
+                row.date.isoformat(),
+                kind or row.type,
+                str(row.quantity),
+                str(row.cost_price.quantize(Decimal("0.01"))),
+                str(row.broker_id or ""),
+            ))
+            occurrence = occurrences.get(key, 0) + 1
+            occurrences[key] = occurrence
+            row.import_fingerprint = hashlib.sha256(f"{key}|{occurrence}".encode("utf-8")).hexdigest()
+        model.objects.bulk_update(rows, ["import_fingerprint"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outflows", "0007_realized_gain"),
+        ("inflows", "0008_inflow_import_fingerprint"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_import_fingerprints, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -37,6 +37,8 @@ class Outflow(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(0, message="A taxa nao pode ser negativa.")]
     )
+    # Impressao digital da linha de origem em importacoes (import_fiis)
+    import_fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     def clean(self):
         """Valida os dados antes de salvar."""
@@ -51,7 +53,13 @@ class Outflow(models.Model):
             self.total_price = self.cost_price * self.quantity
         else:
             self.total_price = 0
-        super().save(*args, **kwargs)
+        # A posicao (tickers.Position) e atualizada por signal na mesma transacao
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     class Meta:
         ordering = ["-date"]
@@ -67,3 +75,39 @@ class Outflow(models.Model):
     @property
     def transaction_type(self):
         return "Venda"
+
+
+class RealizedGain(models.Model):
+    """
+    Resultado de uma venda apurado pelo custo medio (outflows.taxes).
+
+    Guarda tambem a posicao e o custo medio apos a venda: e o ponto de
+    partida para recalcular apenas as vendas posteriores a uma alteracao.
+    """
+    ASSET_CLASS_CHOICES = [
+        ("acao", "Ação"),
+        ("etf", "ETF"),
+        ("fii", "FII"),
+        ("exterior", "Exterior"),
+    ]
+
+    outflow = models.OneToOneField(Outflow, on_delete=models.CASCADE, related_name="realized_gain")
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name="realized_gains")
+    date = models.DateField()
+    asset_class = models.CharField(max_length=10, choices=ASSET_CLASS_CHOICES)
+    quantity = models.IntegerField()
+    sale_value = models.DecimalField(max_digits=14, decimal_places=2)
+    cost = models.DecimalField(max_digits=14, decimal_places=2)
+    gain = models.DecimalField(max_digits=14, decimal_places=2)
+    position_after = models.IntegerField()
+    average_cost_after = models.DecimalField(max_digits=20, decimal_places=8)
+
+    class Meta:
+        ordering = ["date", "outflow"]
+        indexes = [
+            models.Index(fields=["date", "asset_class"], name="realized_gain_date_class_idx"),
+            models.Index(fields=["ticker", "date"], name="realized_gain_ticker_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} {self.date}: {self.gain}"
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from app.metrics import invalidate_trade_metrics
 from outflows.models import Outflow
+from outflows.taxes import recompute_realized_gains
+from tickers.positions import OUTFLOW, apply_trade, positions_changed, refresh_position_history, trade_values
 
 
 @receiver(post_save, sender=Outflow)
@@ -9,4 +12,47 @@ def update_ticker_quantity(sender, instance, created, **kwargs):
         if instance.quantity > 0:
             ticker = instance.ticker
             ticker.quantity -= instance.quantity
-            ticker.save()
+            ticker.save(update_fields=["quantity"])
+
+
+@receiver(pre_save, sender=Outflow)
+def snapshot_position_values(sender, instance, **kwargs):
+    # Guarda os valores persistidos para desfazer o delta antigo no update
+    instance._position_snapshot = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._position_snapshot = trade_values(previous)
+
+
+@receiver(post_save, sender=Outflow)
+def update_position(sender, instance, **kwargs):
+    snapshot = getattr(instance, "_position_snapshot", None)
+    if snapshot:
+        apply_trade(snapshot, OUTFLOW, removing=True)
+    values = trade_values(instance)
+    apply_trade(values, OUTFLOW)
+    refresh_position_history(snapshot, values)
+
+
+@receiver(post_delete, sender=Outflow)
+def remove_position(sender, instance, **kwargs):
+    values = trade_values(instance)
+    apply_trade(values, OUTFLOW, removing=True)
+    refresh_position_history(values)
+
+
+@receiver([post_save, post_delete], sender=Outflow)
+def invalidate_metrics(sender, instance, **kwargs):
+    # Apenas os escopos do ticker (e do ticker anterior, se mudou) sao invalidados
+    ticker_ids = {instance.ticker_id}
+    snapshot = getattr(instance, "_position_snapshot", None)
+    if snapshot:
+        ticker_ids.add(snapshot["ticker_id"])
+    invalidate_trade_metrics(ticker_ids, inflow=False)
+
+
+@receiver(positions_changed)
+def recompute_gains(sender, ticker_ids=None, since=None, **kwargs):
+    # Compras e vendas (inclusive em lote) passam pelo historico de posicoes
+    recompute_realized_gains(ticker_ids, since)
@@ -0,0 +1,246 @@
+"""
+Apuracao de ganho de capital nas vendas (regras brasileiras, swing trade).
+
+As negociacoes de cada ticker sao reprocessadas em ordem de data (compras
+antes das vendas no mesmo dia) mantendo o custo medio; o resultado de cada
+venda fica em RealizedGain, junto com a posicao e o custo medio apos ela.
+Uma alteracao recalcula apenas a partir da sua data, partindo da ultima
+venda anterior (checkpoint) e das compras entre ela e a data alterada.
+
+O relatorio mensal (DARF) e montado somente a partir de RealizedGain:
+- Acoes: 15%, isentas no mes em que o total vendido nao passa de R$ 20 mil;
+- ETFs: 15%, sem isencao, compensando prejuizos com acoes (operacoes comuns);
+- FIIs: 20%, sem isencao, com prejuizos compensados apenas entre FIIs;
+- Ativos no exterior sao apurados, mas ficam fora do DARF mensal.
+DARF abaixo de R$ 10,00 e acumulado para os meses seguintes.
+"""
+import calendar
+import unicodedata
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+
+from inflows.models import Inflow
+from .models import Outflow, RealizedGain
+
+EXEMPTION_LIMIT = Decimal("20000.00")
+MINIMUM_DARF = Decimal("10.00")
+TAX_RATES = {"comum": Decimal("0.15"), "fii": Decimal("0.20")}
+# Classe do ativo -> grupo de compensacao de prejuizos
+LOSS_POOLS = {"acao": "comum", "etf": "comum", "fii": "fii"}
+# Titulo da categoria (sem acentos, maiusculo) -> classe do ativo
+CATEGORY_ASSET_CLASSES = {"ACAO": "acao", "ACOES": "acao", "ETF": "etf", "ETFS": "etf", "FII": "fii", "FIIS": "fii"}
+CENTS = Decimal("0.01")
+
+BUY = 0
+SELL = 1
+
+
+def asset_class(category_title, currency_code):
+    """Classe tributaria do ativo pela categoria e moeda do ticker."""
+    if currency_code and currency_code != "BRL":
+        return "exterior"
+    key = unicodedata.normalize("NFKD", category_title or "").encode("ascii", "ignore").decode().strip().upper()
+    return CATEGORY_ASSET_CLASSES.get(key, "acao")
+
+
+def replay(trades, quantity=0, cost=Decimal("0")):
+    """
+    Reprocessa as negociacoes de um ticker a partir da posicao informada.
+
+    Args:
+        trades: dicts com kind (BUY/SELL), id, date, quantity e value (compras
+            com as taxas somadas, vendas com as taxas descontadas), em ordem
+        quantity: Quantidade em carteira antes da primeira negociacao
+        cost: Custo total da posicao antes da primeira negociacao
+
+    Returns:
+        list: um dict por venda com outflow_id, date, quantity, sale_value,
+        cost, gain, position_after e average_cost_after
+    """
+    sales = []
+    for trade in trades:
+        if trade["kind"] == BUY:
+            quantity += trade["quantity"]
+            cost += trade["value"]
+            continue
+
+        if quantity <= 0:
+            sold_cost = Decimal("0")
+        elif trade["quantity"] >= quantity:
+            sold_cost = cost
+        else:
+            sold_cost = cost * trade["quantity"] / quantity
+        quantity -= trade["quantity"]
+        cost -= sold_cost
+        if quantity <= 0:
+            quantity, cost = 0, Decimal("0")
+
+        sold_cost = sold_cost.quantize(CENTS)
+        sales.append(dict(
+            outflow_id=trade["id"],
+            date=trade["date"],
+            quantity=trade["quantity"],
+            sale_value=trade["value"],
+            cost=sold_cost,
+            gain=trade["value"] - sold_cost,
+            position_after=quantity,
+            average_cost_after=(cost / quantity).quantize(Decimal("1e-8")) if quantity else Decimal("0"),
+        ))
+    return sales
+
+
+def sort_key(trade):
+    return (trade["date"], trade["kind"], trade["id"])
+
+
+# Chamada quase sempre pelo receiver de positions_changed, ja dentro de uma
+# transacao: um erro desfaz a operacao inteira, entao o savepoint e dispensavel
+@transaction.atomic(savepoint=False)
+def recompute_realized_gains(ticker_ids=None, since=None):
+    """
+    Recalcula RealizedGain dos tickers informados (ou de todos) a partir de
+    'since' (ou de todo o historico). Retorna o numero de vendas apuradas.
+    """
+    gains = RealizedGain.objects.all()
+    inflows = Inflow.objects.all()
+    outflows = Outflow.objects.all()
+    if ticker_ids is not None:
+        ticker_ids = set(ticker_ids)
+        gains = gains.filter(ticker_id__in=ticker_ids)
+        inflows = inflows.filter(ticker_id__in=ticker_ids)
+        outflows = outflows.filter(ticker_id__in=ticker_ids)
+
+    # Posicao de cada ticker antes de 'since': ultima venda anterior mais as compras depois dela
+    state = {}
+    if since is not None:
+        latest_before = (
+            RealizedGain.objects
+            .filter(ticker_id=OuterRef("ticker_id"), date__lt=since)
+            .order_by("-date", "-outflow_id")
+        )
+        for row in gains.filter(date__lt=since, id=Subquery(latest_before.values("id")[:1])).values(
+            "ticker_id", "position_after", "average_cost_after"
+        ):
+            state[row["ticker_id"]] = [row["position_after"], row["position_after"] * row["average_cost_after"]]
+
+        buys_before = (
+            inflows
+            .filter(date__lt=since)
+            .annotate(checkpoint=Subquery(latest_before.values("date")[:1]))
+            .filter(Q(checkpoint__isnull=True) | Q(date__gt=F("checkpoint")))
+            .order_by()
+            .values("ticker_id")
+            .annotate(quantity_total=Sum("quantity"), value=Sum(F("total_price") + F("tax")))
+        )
+        for row in buys_before:
+            entry = state.setdefault(row["ticker_id"], [0, Decimal("0")])
+            entry[0] += row["quantity_total"] or 0
+            entry[1] += row["value"] or Decimal("0")
+
+        gains = gains.filter(date__gte=since)
+        inflows = inflows.filter(date__gte=since)
+        outflows = outflows.filter(date__gte=since)
+    gains.delete()
+
+    trades = {}
+    for row in inflows.values("id", "ticker_id", "date", "quantity", "total_price", "tax"):
+        trades.setdefault(row["ticker_id"], []).append(dict(
+            kind=BUY, id=row["id"], date=row["date"], quantity=row["quantity"],
+            value=(row["total_price"] or Decimal("0")) + row["tax"],
+        ))
+    classes = {}
+    for row in outflows.values(
+        "id", "ticker_id", "date", "quantity", "total_price", "tax", "ticker__category__title", "ticker__currency__code"
+    ):
+        classes[row["ticker_id"]] = asset_class(row["ticker__category__title"], row["ticker__currency__code"])
+        trades.setdefault(row["ticker_id"], []).append(dict(
+            kind=SELL, id=row["id"], date=row["date"], quantity=row["quantity"],
+            value=(row["total_price"] or Decimal("0")) - row["tax"],
+        ))
+
+    rows = []
+    for ticker_id, ticker_trades in trades.items():
+        if ticker_id not in classes:
+            continue
+        quantity, cost = state.get(ticker_id, (0, Decimal("0")))
+        for sale in replay(sorted(ticker_trades, key=sort_key), quantity, cost):
+            rows.append(RealizedGain(ticker_id=ticker_id, asset_class=classes[ticker_id], **sale))
+    RealizedGain.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def darf_due_date(month):
+    """Vencimento do DARF: ultimo dia util (seg-sex) do mes seguinte."""
+    following = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    due = following.replace(day=calendar.monthrange(following.year, following.month)[1])
+    while due.weekday() >= 5:
+        due -= timedelta(days=1)
+    return due
+
+
+def darf_report(year):
+    """
+    Apuracao mensal do imposto sobre vendas do ano, a partir de RealizedGain
+    (uma query agrupada por mes e classe; os meses anteriores entram apenas
+    para acumular prejuizos e DARFs abaixo do minimo).
+
+    Returns:
+        dict: 'months' (um item por mes com vendas no ano: month, classes,
+        pools, compensated, tax, darf e due_date), 'totals' (sales, gain, tax e darf do
+        ano) e 'losses' (prejuizo a compensar ao fim do ano por grupo)
+    """
+    rows = (
+        RealizedGain.objects
+        .filter(date__lt=date(year + 1, 1, 1))
+        .exclude(asset_class="exterior")
+        .order_by("date__year", "date__month")
+        .values("date__year", "date__month", "asset_class")
+        .annotate(sales=Sum("sale_value"), gain=Sum("gain"))
+    )
+    by_month = {}
+    for row in rows:
+        month = date(row["date__year"], row["date__month"], 1)
+        by_month.setdefault(month, {})[row["asset_class"]] = dict(sales=row["sales"], gain=row["gain"])
+
+    losses = dict.fromkeys(TAX_RATES, Decimal("0"))
+    pending = Decimal("0")
+    months = []
+    totals = dict(sales=Decimal("0"), gain=Decimal("0"), tax=Decimal("0"), darf=Decimal("0"))
+    for month, classes in by_month.items():
+        stock_sales = classes.get("acao", {}).get("sales", Decimal("0"))
+        exempt = stock_sales <= EXEMPTION_LIMIT
+
+        results = dict.fromkeys(TAX_RATES, Decimal("0"))
+        for name, values in classes.items():
+            values["exempt"] = name == "acao" and exempt and values["gain"] > 0
+            if not values["exempt"]:
+                results[LOSS_POOLS[name]] += values["gain"]
+
+        pools = {}
+        tax = Decimal("0")
+        for pool, result in results.items():
+            compensated = min(losses[pool], max(result, Decimal("0")))
+            taxable = max(result, Decimal("0")) - compensated
+            losses[pool] += -compensated + max(-result, Decimal("0"))
+            pool_tax = (taxable * TAX_RATES[pool]).quantize(CENTS)
+            tax += pool_tax
+            pools[pool] = dict(result=result, compensated=compensated, taxable=taxable, tax=pool_tax,
+                               losses=losses[pool])
+
+        due = tax + pending
+        darf, pending = (due, Decimal("0")) if due >= MINIMUM_DARF else (Decimal("0"), due)
+        if month.year != year:
+            continue
+
+        months.append(dict(
+            month=month, classes=classes, pools=pools, tax=tax, darf=darf, due_date=darf_due_date(month),
+            compensated=sum(values["compensated"] for values in pools.values()),
+        ))
+        totals["sales"] += sum(values["sales"] for values in classes.values())
+        totals["gain"] += sum(values["gain"] for values in classes.values())
+        totals["tax"] += tax
+        totals["darf"] += darf
+
+    return dict(months=months, totals=totals, losses=losses, pending=pending)
@@ -1,15 +1,19 @@
 """
-Tests for Outflow model validators.
+Tests for Outflow model validators and capital gains.
 """
 from datetime import date, timedelta
 from decimal import Decimal
 import pytest
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
 
 from brokers.models import Broker, Currency
 from categories.models import Category
 from tickers.models import Ticker
-from outflows.models import Outflow
+from inflows.models import Inflow
+from outflows.models import Outflow, RealizedGain
+from outflows.taxes import asset_class, darf_due_date, darf_report
 
 
 @pytest.fixture
@@ -248,3 +252,142 @@ class TestOutflowModel:
         outflows = list(Outflow.objects.all())
         assert outflows[0] == outflow2
         assert outflows[1] == outflow1
+
+
+class TestRealizedGains:
+    """Tests for the average cost capital gains and the DARF report."""
+
+    @pytest.fixture
+    def stock(self, db, currency):
+        """Create a stock ticker (Ação)."""
+        category = Category.objects.create(title="Ação", description="Acoes")
+        return Ticker.objects.create(name="PETR4", category=category, currency=currency)
+
+    def buy(self, ticker, broker, day, quantity, price, tax=Decimal("0")):
+        return Inflow.objects.create(
+            ticker=ticker, broker=broker, date=day, quantity=quantity, cost_price=Decimal(price), tax=tax
+        )
+
+    def sell(self, ticker, broker, day, quantity, price, tax=Decimal("0")):
+        return Outflow.objects.create(
+            ticker=ticker, broker=broker, date=day, quantity=quantity, cost_price=Decimal(price), tax=tax
+        )
+
+    def test_sale_uses_average_cost(self, ticker, broker):
+        """Test the gain of a sale uses the average cost including fees."""
+        self.buy(ticker, broker, date(2024, 1, 10), 100, "10.00", tax=Decimal("10.00"))
+        self.buy(ticker, broker, date(2024, 1, 20), 100, "20.00", tax=Decimal("10.00"))
+        outflow = self.sell(ticker, broker, date(2024, 2, 5), 50, "30.00", tax=Decimal("5.00"))
+
+        gain = outflow.realized_gain
+        assert gain.asset_class == "fii"
+        assert gain.sale_value == Decimal("1495.00")
+        assert gain.cost == Decimal("755.00")
+        assert gain.gain == Decimal("740.00")
+        assert gain.position_after == 150
+        assert gain.average_cost_after == Decimal("15.10000000")
+
+    def test_recompute_from_edited_trade(self, ticker, broker):
+        """Test editing or deleting an earlier trade updates the later sales."""
+        first = self.buy(ticker, broker, date(2024, 1, 10), 100, "10.00")
+        self.sell(ticker, broker, date(2024, 2, 5), 50, "12.00")
+        later = self.buy(ticker, broker, date(2024, 3, 1), 50, "16.00")
+        self.sell(ticker, broker, date(2024, 4, 1), 100, "20.00")
+        assert list(RealizedGain.objects.values_list("gain", flat=True)) == [Decimal("100.00"), Decimal("700.00")]
+
+        later.cost_price = Decimal("14.00")
+        later.save()
+        assert list(RealizedGain.objects.values_list("gain", flat=True)) == [Decimal("100.00"), Decimal("800.00")]
+
+        first.cost_price = Decimal("8.00")
+        first.save()
+        assert list(RealizedGain.objects.values_list("gain", flat=True)) == [Decimal("200.00"), Decimal("900.00")]
+
+        first.delete()
+        gains = list(RealizedGain.objects.order_by("date"))
+        assert [gain.cost for gain in gains] == [Decimal("0.00"), Decimal("700.00")]
+        assert gains[-1].position_after == 0
+
+    def test_recompute_command(self, ticker, broker):
+        """Test the command rebuilds every realized gain."""
+        self.buy(ticker, broker, date(2024, 1, 10), 10, "10.00")
+        self.sell(ticker, broker, date(2024, 2, 5), 10, "11.00")
+        RealizedGain.objects.all().delete()
+
+        call_command("recompute_realized_gains", ticker="test11")
+
+        assert RealizedGain.objects.get().gain == Decimal("10.00")
+
+    def test_asset_class(self):
+        """Test the tax class comes from the category and the currency."""
+        assert asset_class("Ação", "BRL") == "acao"
+        assert asset_class("FIIs", "BRL") == "fii"
+        assert asset_class("ETF", "BRL") == "etf"
+        assert asset_class("Stock", "USD") == "exterior"
+
+    def test_stock_exemption_and_fii_rate(self, ticker, stock, broker):
+        """Test stock gains are exempt up to R$ 20 mil of monthly sales and FIIs pay 20%."""
+        self.buy(stock, broker, date(2024, 1, 5), 2000, "10.00")
+        self.buy(ticker, broker, date(2024, 1, 5), 100, "100.00")
+        self.sell(stock, broker, date(2024, 1, 20), 1000, "20.00")
+        self.sell(ticker, broker, date(2024, 1, 20), 10, "150.00")
+        self.sell(stock, broker, date(2024, 2, 20), 1000, "21.00")
+
+        report = darf_report(2024)
+
+        january, february = report["months"]
+        assert january["classes"]["acao"]["exempt"] is True
+        assert january["tax"] == Decimal("100.00")
+        assert january["darf"] == Decimal("100.00")
+        assert january["due_date"] == date(2024, 2, 29)
+        assert february["classes"]["acao"]["exempt"] is False
+        assert february["tax"] == Decimal("1650.00")
+        assert report["totals"]["darf"] == Decimal("1750.00")
+
+    def test_losses_and_minimum_darf(self, ticker, broker):
+        """Test losses offset later gains and DARFs under R$ 10 accumulate."""
+        self.buy(ticker, broker, date(2023, 11, 1), 100, "100.00")
+        self.sell(ticker, broker, date(2023, 12, 1), 10, "90.00")
+        self.sell(ticker, broker, date(2024, 1, 10), 10, "115.00")
+        self.sell(ticker, broker, date(2024, 2, 10), 10, "102.00")
+        self.sell(ticker, broker, date(2024, 3, 10), 10, "103.00")
+
+        report = darf_report(2024)
+
+        january, february, march = report["months"]
+        assert january["compensated"] == Decimal("100.00")
+        assert january["tax"] == Decimal("10.00")
+        assert (february["tax"], february["darf"]) == (Decimal("4.00"), Decimal("0"))
+        assert (march["tax"], march["darf"]) == (Decimal("6.00"), Decimal("10.00"))
+        assert report["losses"]["fii"] == Decimal("0")
+        assert report["pending"] == Decimal("0")
+
+    def test_report_uses_one_query(self, ticker, broker, django_assert_num_queries):
+        """Test the report is built from a single grouped query."""
+        self.buy(ticker, broker, date(2024, 1, 5), 100, "10.00")
+        for month in range(1, 7):
+            self.sell(ticker, broker, date(2024, month, 15), 5, "12.00")
+
+        with django_assert_num_queries(1):
+            report = darf_report(2024)
+
+        assert len(report["months"]) == 6
+
+    def test_darf_due_date(self):
+        """Test the DARF is due on the last weekday of the following month."""
+        assert darf_due_date(date(2024, 1, 1)) == date(2024, 2, 29)
+        assert darf_due_date(date(2024, 7, 1)) == date(2024, 8, 30)
+        assert darf_due_date(date(2024, 12, 1)) == date(2025, 1, 31)
+
+    def test_report_view(self, client, ticker, broker, django_user_model):
+        """Test the report page renders the selected year."""
+        self.buy(ticker, broker, date(2024, 1, 5), 100, "10.00")
+        self.sell(ticker, broker, date(2024, 1, 15), 50, "12.00")
+        django_user_model.objects.create_user(username="testuser", password="testpass123")
+        client.login(username="testuser", password="testpass123")
+
+        response = client.get(reverse("darf_report"), {"year": "2024"})
+
+        assert response.status_code == 200
+        assert response.context["totals"]["darf"] == Decimal("20.00")
+        assert client.get(reverse("darf_report"), {"year": "abc"}).status_code == 404
@@ -7,4 +7,5 @@ urlpatterns = [
     path("outflow/<int:pk>/details/", views.OutflowDetailsView.as_view(), name="outflow_details"),
     path("outflow/<int:pk>/update/", views.OutflowUpdateView.as_view(), name="outflow_update"),
     path("outflow/<int:pk>/delete", views.OutflowDeleteView.as_view(), name="outflow_delete"),
+    path("darf/", views.DarfReportView.as_view(), name="darf_report"),
 ]
\ No newline at end of file
@@ -1,8 +1,11 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.utils import timezone
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from app.utils.validators import validate_year
 from .models import Outflow
+from .taxes import darf_report
 from . import forms
 
 
@@ -61,3 +64,23 @@ class OutflowDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView):
 
     def get_queryset(self):
         return super().get_queryset().select_related('ticker', 'broker')
+
+
+class DarfReportView(LoginRequiredMixin, TemplateView):
+    """
+    Apuracao mensal do imposto de renda sobre vendas (DARF) de um ano,
+    montada a partir dos ganhos realizados.
+    """
+    template_name = "darf_report.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        year = validate_year(self.request.GET.get("year")) or timezone.localdate().year
+
+        report = darf_report(year)
+        context["months"] = report["months"]
+        context["totals"] = report["totals"]
+        context["losses"] = report["losses"]
+        context["pending"] = report["pending"]
+        context["selected_year"] = year
+        return context
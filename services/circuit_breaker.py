@@ -0,0 +1,44 @@
+import logging
+from django.core.cache import cache
+from django.conf import settings
+
+logger = logging.getLogger('services')
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker compartilhado entre workers via cache.
+
+    Apos 'failure_threshold' falhas consecutivas o circuito abre e as
+    chamadas ao upstream sao puladas por 'cooldown' segundos.
+    """
+
+    def __init__(self, name, failure_threshold=None, cooldown=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or getattr(settings, 'API_CIRCUIT_FAILURES', 3)
+        self.cooldown = cooldown or getattr(settings, 'API_CIRCUIT_COOLDOWN', 60)
+        self._failures_key = f"circuit_{name}_failures"
+        self._open_key = f"circuit_{name}_open"
+
+    def is_open(self):
+        """Indica se o upstream deve ser pulado."""
+        return cache.get(self._open_key) is not None
+
+    def record_success(self):
+        cache.delete(self._failures_key)
+
+    def record_failure(self):
+        cache.add(self._failures_key, 0, self.cooldown)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            failures = 1
+            cache.set(self._failures_key, failures, self.cooldown)
+
+        if failures >= self.failure_threshold:
+            logger.warning(f"Circuito {self.name} aberto apos {failures} falhas consecutivas")
+            cache.set(self._open_key, True, self.cooldown)
+            cache.delete(self._failures_key)
+
+    def reset(self):
+        cache.delete_many([self._failures_key, self._open_key])
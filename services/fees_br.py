@@ -1,19 +1,40 @@
+import contextvars
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout, ConnectionError
 from django.conf import settings
+from django.core.cache import cache
+from app.instrumentation import external_call
+from .circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger('services')
 
+# Sessao HTTP compartilhada: reaproveita conexoes entre requisicoes
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Executor para buscas em paralelo e revalidacao em segundo plano
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fees_br")
+
 
 class GetFeeBr:
     def __init__(self):
-        self.__base_url = "https://brasilapi.com.br/api/taxas/v1"
+        self.__base_url = getattr(settings, 'BRASILAPI_TAXAS_URL', "https://brasilapi.com.br/api/taxas/v1")
         self.__timeout = getattr(settings, 'API_TIMEOUT', 10)
+        self.__fresh_ttl = getattr(settings, 'FEE_CACHE_TTL', 3600)
+        self.__stale_ttl = getattr(settings, 'FEE_CACHE_STALE_TTL', 86400)
+        self.__circuit = CircuitBreaker("brasilapi")
 
     def get_taxa(self, sigla):
         """
-        Busca uma taxa economica na BrasilAPI.
+        Busca uma taxa economica, servindo do cache quando possivel.
+
+        Entradas mais antigas que FEE_CACHE_TTL continuam sendo servidas
+        enquanto uma atualizacao roda em segundo plano.
 
         Args:
             sigla: Sigla da taxa (ex: SELIC, CDI, IPCA)
@@ -21,13 +42,92 @@ class GetFeeBr:
         Returns:
             dict: Dados da taxa ou dict com valor padrao em caso de erro
         """
+        entry = cache.get(self._cache_key(sigla))
+        if entry is not None:
+            self._revalidate_if_stale(sigla, entry)
+            return entry["data"]
+        return self._fetch_and_store(sigla)
+
+    def get_taxas(self, siglas):
+        """
+        Busca varias taxas de uma vez: as que estao em cache sao lidas com
+        um unico get_many e as demais sao buscadas em paralelo.
+
+        Args:
+            siglas: Lista de siglas (ex: ["IPCA", "SELIC", "CDI"])
+
+        Returns:
+            dict: Sigla -> dados da taxa
+        """
+        entries = cache.get_many([self._cache_key(sigla) for sigla in siglas])
+
+        results = {}
+        missing = []
+        for sigla in siglas:
+            entry = entries.get(self._cache_key(sigla))
+            if entry is None:
+                missing.append(sigla)
+                continue
+            self._revalidate_if_stale(sigla, entry)
+            results[sigla] = entry["data"]
+
+        if missing:
+            # Cada busca roda com uma copia do contexto, para ser contabilizada na requisicao atual
+            contexts = [contextvars.copy_context() for _ in missing]
+            fetched = _executor.map(lambda context, sigla: context.run(self._fetch_and_store, sigla), contexts, missing)
+            for sigla, data in zip(missing, fetched):
+                results[sigla] = data
+
+        return results
+
+    def _revalidate_if_stale(self, sigla, entry):
+        """Dispara a atualizacao em segundo plano se a entrada estiver vencida."""
+        if time.time() - entry["fetched_at"] <= self.__fresh_ttl:
+            return None
+
+        # Apenas um worker revalida cada taxa por vez
+        lock_key = f"{self._cache_key(sigla)}_refreshing"
+        if not cache.add(lock_key, True, self.__timeout * 2):
+            return None
+
+        def refresh():
+            try:
+                self._fetch_and_store(sigla)
+            finally:
+                cache.delete(lock_key)
+
+        return _executor.submit(refresh)
+
+    def _fetch_and_store(self, sigla):
+        """Busca a taxa no upstream e grava no cache em caso de sucesso."""
+        if self.__circuit.is_open():
+            logger.warning(f"Circuito da BrasilAPI aberto, ignorando busca da taxa {sigla}")
+            return self._default_response(sigla)
+
+        data = self._request_taxa(sigla)
+        if data is None:
+            self.__circuit.record_failure()
+            return self._default_response(sigla)
+
+        self.__circuit.record_success()
+        cache.set(self._cache_key(sigla), {"data": data, "fetched_at": time.time()}, self.__stale_ttl)
+        return data
+
+    def _request_taxa(self, sigla):
+        """
+        Busca uma taxa economica na BrasilAPI.
+
+        Returns:
+            dict: Dados da taxa ou None em caso de erro
+        """
         logger.info(f"Buscando taxa: {sigla}")
 
         try:
-            response = requests.get(
-                url=f"{self.__base_url}/{sigla}",
-                timeout=self.__timeout
-            )
+            with external_call("brasilapi"):
+                response = _session.get(
+                    url=f"{self.__base_url}/{sigla}",
+                    timeout=self.__timeout
+                )
             response.raise_for_status()
 
             data = response.json()
@@ -36,16 +136,19 @@ class GetFeeBr:
 
         except Timeout:
             logger.error(f"Timeout ao buscar taxa {sigla}")
-            return self._default_response(sigla)
+            return None
         except ConnectionError:
             logger.error(f"Erro de conexao ao buscar taxa {sigla}")
-            return self._default_response(sigla)
+            return None
         except RequestException as e:
             logger.error(f"Erro de requisicao ao buscar taxa {sigla}: {str(e)}")
-            return self._default_response(sigla)
+            return None
         except Exception as e:
             logger.exception(f"Erro inesperado ao buscar taxa {sigla}: {str(e)}")
-            return self._default_response(sigla)
+            return None
+
+    def _cache_key(self, sigla):
+        return f"fee_br_{sigla}"
 
     def _default_response(self, sigla):
         """Retorna uma resposta padrao quando a API falha."""
@@ -1,25 +1,64 @@
 import logging
+from datetime import time, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout, ConnectionError
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from app.instrumentation import external_call
+from .circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger('services')
 
+# Sessao HTTP compartilhada: reaproveita conexoes com a BrAPI
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Pregao da B3 (horario de Brasilia)
+MARKET_OPEN = time(10, 0)
+MARKET_CLOSE = time(18, 0)
+
 
 class APIError(Exception):
     """Excecao customizada para erros de API."""
     pass
 
 
+def quote_cache_ttl(now=None):
+    """
+    Retorna o TTL (em segundos) de uma cotacao no cache.
+
+    Durante o pregao as cotacoes vencem rapido (CACHE_TTL_SHORT); fora dele
+    ficam validas ate a proxima abertura do mercado.
+    """
+    short_ttl = getattr(settings, 'CACHE_TTL_SHORT', 60)
+    now = timezone.localtime(now)
+
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE:
+        return short_ttl
+
+    next_open = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if now.time() >= MARKET_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+
+    return max(short_ttl, int((next_open - now).total_seconds()))
+
+
 class Get_ticker_data:
     def __init__(self):
-        self.__base_url = "https://brapi.dev/api/quote"
+        self.__base_url = getattr(settings, 'BRAPI_URL', "https://brapi.dev/api/quote")
         self.__base_token = settings.BRAPI_TOKEN
         self.__timeout = getattr(settings, 'API_TIMEOUT', 10)
+        self.__batch_size = getattr(settings, 'BRAPI_BATCH_SIZE', 20)
+        self.__circuit = CircuitBreaker("brapi")
 
     def get_ticker(self, code_ticker):
         """
-        Busca dados de um ticker na BrAPI.
+        Busca dados de um ticker, lendo do cache de cotacoes quando possivel.
 
         Args:
             code_ticker: Codigo do ticker (ex: PETR4)
@@ -27,40 +66,115 @@ class Get_ticker_data:
         Returns:
             dict: Dados do ticker ou None em caso de erro
         """
-        logger.info(f"Buscando dados do ticker: {code_ticker}")
+        code_ticker = str(code_ticker).upper()
+        return self.get_quotes([code_ticker]).get(code_ticker)
 
-        try:
-            response = requests.get(
-                url=f"{self.__base_url}/{code_ticker}?token={self.__base_token}",
-                timeout=self.__timeout
+    def get_quotes(self, tickers):
+        """
+        Busca cotacoes de varios tickers de uma vez.
+
+        As cotacoes em cache sao lidas com um unico get_many; as demais sao
+        buscadas na BrAPI em lotes de BRAPI_BATCH_SIZE tickers separados por
+        virgula e gravadas no cache com TTL de acordo com o horario do pregao.
+
+        Args:
+            tickers: Lista de codigos (ex: ["PETR4", "HGLG11"])
+
+        Returns:
+            dict: Codigo -> dados da cotacao (tickers sem resultado sao omitidos)
+        """
+        codes = list(dict.fromkeys(str(ticker).upper() for ticker in tickers))
+        cached = cache.get_many([self._cache_key(code) for code in codes])
+
+        quotes = {}
+        missing = []
+        for code in codes:
+            quote = cached.get(self._cache_key(code))
+            if quote is None:
+                missing.append(code)
+            else:
+                quotes[code] = quote
+
+        if missing:
+            fetched = self.fetch_quotes(missing)
+            self.cache_quotes(fetched)
+            quotes.update(fetched)
+
+        return quotes
+
+    def cache_quotes(self, quotes):
+        """Grava cotacoes no cache com TTL de acordo com o horario do pregao."""
+        if quotes:
+            cache.set_many(
+                {self._cache_key(code): quote for code, quote in quotes.items()},
+                quote_cache_ttl()
             )
-            response.raise_for_status()
 
-            data = response.json()
-            results = data.get("results")
+    @property
+    def batch_size(self):
+        return self.__batch_size
 
-            if not results:
-                logger.warning(f"Nenhum resultado encontrado para ticker: {code_ticker}")
-                return None
+    def fetch_quotes(self, tickers):
+        """
+        Busca cotacoes diretamente na BrAPI, sem passar pelo cache.
 
-            logger.info(f"Dados do ticker {code_ticker} obtidos com sucesso")
-            return results[0]
+        Returns:
+            dict: Codigo -> dados da cotacao
+        """
+        quotes = {}
+        for start in range(0, len(tickers), self.__batch_size):
+            chunk = tickers[start:start + self.__batch_size]
+            for result in self._request_quotes(chunk) or []:
+                symbol = result.get("symbol")
+                if symbol:
+                    quotes[symbol.upper()] = result
+
+        for code in tickers:
+            if code not in quotes:
+                logger.warning(f"Nenhum resultado encontrado para ticker: {code}")
+        return quotes
+
+    def _request_quotes(self, chunk):
+        """
+        Busca um lote de tickers na BrAPI.
 
-        except Timeout:
-            logger.error(f"Timeout ao buscar ticker {code_ticker}")
+        Returns:
+            list: Resultados da API ou None em caso de erro
+        """
+        codes = ",".join(chunk)
+        if self.__circuit.is_open():
+            logger.warning(f"Circuito da BrAPI aberto, ignorando busca de {codes}")
             return None
+
+        logger.info(f"Buscando dados dos tickers: {codes}")
+
+        try:
+            with external_call("brapi"):
+                response = _session.get(
+                    url=f"{self.__base_url}/{codes}",
+                    params={"token": self.__base_token},
+                    timeout=self.__timeout
+                )
+            response.raise_for_status()
+
+            results = response.json().get("results") or []
+            self.__circuit.record_success()
+            logger.info(f"Dados de {len(results)} tickers obtidos com sucesso")
+            return results
+
+        except Timeout:
+            logger.error(f"Timeout ao buscar tickers {codes}")
         except ConnectionError:
-            logger.error(f"Erro de conexao ao buscar ticker {code_ticker}")
-            return None
+            logger.error(f"Erro de conexao ao buscar tickers {codes}")
         except RequestException as e:
-            logger.error(f"Erro de requisicao ao buscar ticker {code_ticker}: {str(e)}")
-            return None
-        except (KeyError, IndexError, TypeError) as e:
-            logger.error(f"Erro ao processar resposta do ticker {code_ticker}: {str(e)}")
-            return None
+            logger.error(f"Erro de requisicao ao buscar tickers {codes}: {str(e)}")
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            logger.error(f"Erro ao processar resposta dos tickers {codes}: {str(e)}")
         except Exception as e:
-            logger.exception(f"Erro inesperado ao buscar ticker {code_ticker}: {str(e)}")
-            return None
+            logger.exception(f"Erro inesperado ao buscar tickers {codes}: {str(e)}")
+
+        self.__circuit.record_failure()
+        return None
 
     def get_ticker_dividends(self, code_ticker):
         """
@@ -72,28 +186,37 @@ class Get_ticker_data:
         Returns:
             dict: Dados de dividendos ou None em caso de erro
         """
+        if self.__circuit.is_open():
+            logger.warning(f"Circuito da BrAPI aberto, ignorando dividendos de {code_ticker}")
+            return None
+
         logger.info(f"Buscando dividendos do ticker: {code_ticker}")
 
         try:
-            response = requests.get(
-                url=f"{self.__base_url}/{code_ticker}?fundamental=true&dividends=true&token={self.__base_token}",
-                timeout=self.__timeout
-            )
+            with external_call("brapi"):
+                response = _session.get(
+                    url=f"{self.__base_url}/{code_ticker}",
+                    params={"fundamental": "true", "dividends": "true", "token": self.__base_token},
+                    timeout=self.__timeout
+                )
             response.raise_for_status()
 
             data = response.json()
+            self.__circuit.record_success()
             logger.info(f"Dividendos do ticker {code_ticker} obtidos com sucesso")
             return data
 
         except Timeout:
             logger.error(f"Timeout ao buscar dividendos do ticker {code_ticker}")
-            return None
         except ConnectionError:
             logger.error(f"Erro de conexao ao buscar dividendos do ticker {code_ticker}")
-            return None
         except RequestException as e:
             logger.error(f"Erro de requisicao ao buscar dividendos do ticker {code_ticker}: {str(e)}")
-            return None
         except Exception as e:
             logger.exception(f"Erro inesperado ao buscar dividendos do ticker {code_ticker}: {str(e)}")
-            return None
+
+        self.__circuit.record_failure()
+        return None
+
+    def _cache_key(self, code_ticker):
+        return f"quote_{code_ticker}"
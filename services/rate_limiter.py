@@ -0,0 +1,24 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Limita chamadas a no maximo 'rate' por segundo, compartilhado entre threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia ate o proximo horario livre."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
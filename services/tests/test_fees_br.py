@@ -0,0 +1,82 @@
+"""
+Tests for GetFeeBr against a local stub server.
+"""
+import time
+import pytest
+from django.core.cache import cache
+
+from services.fees_br import GetFeeBr
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def brasilapi(stub_server, settings):
+    """Point GetFeeBr to the stub server with the three rates registered."""
+    settings.BRASILAPI_TAXAS_URL = f"{stub_server.url}/taxas"
+    settings.API_TIMEOUT = 2
+    for sigla, valor in (("IPCA", 4.5), ("SELIC", 10.5), ("CDI", 10.4)):
+        stub_server.routes[f"/taxas/{sigla}"] = {"nome": sigla, "valor": valor}
+    return stub_server
+
+
+class TestGetFeeBr:
+    """Tests for the cached, concurrent rate fetching."""
+
+    def test_get_taxa_returns_upstream_data(self, brasilapi):
+        """Test a cold get_taxa reads the upstream."""
+        assert GetFeeBr().get_taxa("SELIC") == {"nome": "SELIC", "valor": 10.5}
+
+    def test_get_taxa_is_cached(self, brasilapi):
+        """Test a second call is served from the cache."""
+        fee = GetFeeBr()
+        fee.get_taxa("SELIC")
+        fee.get_taxa("SELIC")
+        assert len(brasilapi.hits("/taxas/SELIC")) == 1
+
+    def test_get_taxas_fetches_in_parallel(self, brasilapi):
+        """Test the three rates are fetched concurrently."""
+        brasilapi.delay = 0.3
+        start = time.monotonic()
+        taxas = GetFeeBr().get_taxas(["IPCA", "SELIC", "CDI"])
+        elapsed = time.monotonic() - start
+
+        assert [taxas[s]["valor"] for s in ("IPCA", "SELIC", "CDI")] == [4.5, 10.5, 10.4]
+        assert elapsed < 0.8
+
+    def test_stale_entry_is_served_while_revalidating(self, brasilapi, settings):
+        """Test a stale value is returned immediately and refreshed in background."""
+        fee = GetFeeBr()
+        fee.get_taxa("CDI")
+        brasilapi.routes["/taxas/CDI"] = {"nome": "CDI", "valor": 11.0}
+
+        entry = cache.get("fee_br_CDI")
+        entry["fetched_at"] -= settings.FEE_CACHE_TTL + 1
+        cache.set("fee_br_CDI", entry)
+
+        assert fee.get_taxa("CDI")["valor"] == 10.4
+
+        deadline = time.monotonic() + 2
+        while cache.get("fee_br_CDI")["data"]["valor"] != 11.0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert fee.get_taxa("CDI")["valor"] == 11.0
+
+    def test_failure_returns_default_response(self, brasilapi):
+        """Test upstream errors return the default payload."""
+        brasilapi.fail = True
+        assert GetFeeBr().get_taxa("IPCA") == {"nome": "IPCA", "valor": None, "error": True}
+
+    def test_circuit_opens_after_repeated_failures(self, brasilapi, settings):
+        """Test the upstream is skipped once the circuit is open."""
+        settings.API_CIRCUIT_FAILURES = 2
+        brasilapi.fail = True
+        fee = GetFeeBr()
+        for _ in range(4):
+            fee.get_taxa("IPCA")
+        assert len(brasilapi.hits("/taxas/IPCA")) == 2
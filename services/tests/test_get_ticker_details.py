@@ -0,0 +1,84 @@
+"""
+Tests for the BrAPI quote fetching and cache.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import pytest
+from django.core.cache import cache
+
+from services.get_ticker_details import Get_ticker_data, quote_cache_ttl
+
+SAO_PAULO = ZoneInfo("America/Sao_Paulo")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def brapi(stub_server, settings):
+    """Point Get_ticker_data to the stub server."""
+    settings.BRAPI_URL = f"{stub_server.url}/quote"
+    settings.BRAPI_BATCH_SIZE = 2
+    settings.API_TIMEOUT = 2
+
+    def quote(*symbols):
+        return {"results": [{"symbol": s, "regularMarketPrice": 10.0 + i} for i, s in enumerate(symbols)]}
+
+    stub_server.routes["/quote/PETR4,VALE3"] = quote("PETR4", "VALE3")
+    stub_server.routes["/quote/HGLG11"] = quote("HGLG11")
+    stub_server.routes["/quote/PETR4"] = quote("PETR4")
+    return stub_server
+
+
+class TestGetQuotes:
+    """Tests for the batched quote API."""
+
+    def test_get_quotes_chunks_requests(self, brapi):
+        """Test tickers are fetched in comma separated batches."""
+        quotes = Get_ticker_data().get_quotes(["PETR4", "VALE3", "HGLG11"])
+
+        assert set(quotes) == {"PETR4", "VALE3", "HGLG11"}
+        assert quotes["VALE3"]["regularMarketPrice"] == 11.0
+        assert len(brapi.requests) == 2
+
+    def test_get_quotes_reads_from_cache(self, brapi):
+        """Test cached quotes do not hit the API again."""
+        service = Get_ticker_data()
+        service.get_quotes(["PETR4", "VALE3"])
+        service.get_quotes(["PETR4", "VALE3"])
+        assert len(brapi.requests) == 1
+
+    def test_get_ticker_uses_quote_cache(self, brapi):
+        """Test get_ticker returns a single quote through the cache."""
+        service = Get_ticker_data()
+        assert service.get_ticker("petr4")["symbol"] == "PETR4"
+        assert service.get_ticker("PETR4")["symbol"] == "PETR4"
+        assert len(brapi.requests) == 1
+
+    def test_unknown_ticker_returns_none(self, brapi):
+        """Test tickers without results are omitted."""
+        assert Get_ticker_data().get_ticker("XXXX3") is None
+
+
+class TestQuoteCacheTTL:
+    """Tests for the market hours aware TTL."""
+
+    def test_short_ttl_during_market_hours(self, settings):
+        """Test quotes expire quickly while the market is open."""
+        now = datetime(2026, 10, 14, 11, 0, tzinfo=SAO_PAULO)
+        assert quote_cache_ttl(now) == settings.CACHE_TTL_SHORT
+
+    def test_ttl_until_next_open_after_close(self):
+        """Test quotes fetched after the close last until the next open."""
+        now = datetime(2026, 10, 14, 20, 0, tzinfo=SAO_PAULO)
+        assert quote_cache_ttl(now) == 14 * 3600
+
+    def test_weekend_ttl_until_monday(self):
+        """Test quotes fetched on Saturday last until Monday's open."""
+        now = datetime(2026, 10, 17, 10, 0, tzinfo=SAO_PAULO)
+        assert quote_cache_ttl(now) == 48 * 3600
@@ -2,8 +2,41 @@ from django.contrib import admin
 from . import models
 
 class TickerAdmin(admin.ModelAdmin):
-    list_display = ("name", "quantity",)
+    list_display = ("name", "quantity", "lot_size",)
     search_fields = ("name",)
     
 
-admin.site.register(models.Ticker, TickerAdmin)
\ No newline at end of file
+admin.site.register(models.Ticker, TickerAdmin)
+
+
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ("ticker", "broker", "quantity", "cost_basis", "average_price", "last_trade_date",)
+    search_fields = ("ticker__name",)
+
+
+admin.site.register(models.Position, PositionAdmin)
+
+
+class PositionHistoryAdmin(admin.ModelAdmin):
+    list_display = ("ticker", "date", "quantity", "cost_basis",)
+    search_fields = ("ticker__name",)
+    date_hierarchy = "date"
+
+
+admin.site.register(models.PositionHistory, PositionHistoryAdmin)
+
+
+class QuoteAdmin(admin.ModelAdmin):
+    list_display = ("ticker", "price", "change_percent", "market_time", "updated_at",)
+    search_fields = ("ticker__name",)
+
+
+admin.site.register(models.Quote, QuoteAdmin)
+
+
+class TargetAllocationAdmin(admin.ModelAdmin):
+    list_display = ("category", "ticker", "weight",)
+    search_fields = ("category__title", "ticker__name",)
+
+
+admin.site.register(models.TargetAllocation, TargetAllocationAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TickersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tickers"
+
+    def ready(self):
+        import tickers.signals # noqa:F401
@@ -1,5 +1,5 @@
 from django import forms
-from app.widgets import TailwindTextInput, TailwindSelect, TailwindTextarea
+from app.widgets import TailwindTextInput, TailwindNumberInput, TailwindSelect, TailwindTextarea
 from . import models
 
 
@@ -7,12 +7,13 @@ class TickerForms(forms.ModelForm):
 
     class Meta:
         model = models.Ticker
-        fields = ["name", "category", "currency", "sector", "description"]
+        fields = ["name", "category", "currency", "lot_size", "sector", "description"]
 
         widgets = {
             "name": TailwindTextInput(),
             "category": TailwindSelect(),
             "currency": TailwindSelect(),
+            "lot_size": TailwindNumberInput(),
             "sector": TailwindTextInput(),
             "description": TailwindTextarea(),
         }
@@ -21,6 +22,7 @@ class TickerForms(forms.ModelForm):
             "name": "Código do Ticker",
             "category": "Categoria",
             "currency": "Moeda",
+            "lot_size": "Lote",
             "sector": "Setor",
             "description": "Descrição"
         }
@@ -0,0 +1,45 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.http import Http404
+from app.exports import DATASETS, STREAMS, export_stream
+
+# Opcao do comando -> parametro de filtro das listagens
+FILTERS = ("ticker", "broker", "date_from", "date_to", "year", "month", "currency")
+
+
+class Command(BaseCommand):
+    help = "Exporta compras, vendas ou dividendos em CSV ou XLSX, com os filtros das listagens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS), help="conjunto exportado")
+        parser.add_argument("--format", choices=sorted(STREAMS), default="csv", help="formato do arquivo")
+        parser.add_argument("--output", type=str, help="arquivo de destino (padrao: saida padrao, apenas CSV)")
+        parser.add_argument("--ticker", type=str, help="id do ticker (compras/vendas) ou codigo (dividendos)")
+        parser.add_argument("--broker", type=str, help="id da corretora (compras/vendas)")
+        parser.add_argument("--date-from", type=str, help="data inicial, AAAA-MM-DD (compras/vendas)")
+        parser.add_argument("--date-to", type=str, help="data final, AAAA-MM-DD (compras/vendas)")
+        parser.add_argument("--year", type=str, help="ano (dividendos)")
+        parser.add_argument("--month", type=str, help="mes (dividendos)")
+        parser.add_argument("--currency", type=str, help="moeda (dividendos)")
+
+    def handle(self, *args, **options):
+        file_format = options["format"]
+        if file_format == "xlsx" and not options["output"]:
+            raise CommandError("Informe --output para exportar em XLSX.")
+
+        params = {name: options[name] for name in FILTERS if options[name]}
+        try:
+            chunks = export_stream(options["dataset"], file_format, params)
+        except (Http404, ValueError, ValidationError) as e:
+            raise CommandError(f"Filtro inválido: {e}")
+
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        mode, encoding = ("wb", None) if file_format == "xlsx" else ("w", "utf-8")
+        with open(options["output"], mode, encoding=encoding, newline="" if encoding else None) as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Extrato exportado em {options['output']}"))
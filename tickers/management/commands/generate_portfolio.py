@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from app import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera uma carteira sintetica (tickers nas quatro categorias, compras, vendas e dividendos mensais) "
+        "para testes de carga e benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickers", type=int, default=40, help="numero de tickers (padrao: 40)")
+        parser.add_argument("--years", type=int, default=5, help="anos de historico mensal (padrao: 5)")
+        parser.add_argument("--seed", type=int, default=0, help="semente do gerador aleatorio")
+        parser.add_argument(
+            "--csv", type=str, metavar="ARQUIVO",
+            help="cria apenas os tickers e grava as negociacoes no formato de lista_de_fiis.csv, para o 'import_fiis'",
+        )
+
+    def handle(self, *args, **options):
+        if options["tickers"] <= 0 or options["years"] <= 0:
+            raise CommandError("--tickers e --years devem ser positivos.")
+
+        if not options["csv"]:
+            stats = synthetic.generate_portfolio(options["tickers"], options["years"], options["seed"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{stats['tickers']} tickers, {stats['inflows']} compras, {stats['outflows']} vendas "
+                f"e {stats['dividends']} dividendos criados"
+            ))
+            return
+
+        tickers = synthetic.create_tickers(options["tickers"])
+        trades, _ = synthetic.ledger(tickers, options["years"], options["seed"])
+        with open(options["csv"], "w", encoding="utf-8", newline="") as file:
+            synthetic.write_trades_csv(file, trades)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(tickers)} tickers criados e {len(trades)} negociacoes gravadas em {options['csv']}"
+        ))
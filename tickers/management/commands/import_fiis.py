@@ -1,64 +1,199 @@
 import csv
+import hashlib
+import time
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.metrics import invalidate_metrics_cache
 from brokers.models import Broker
 from inflows.models import Inflow
 from outflows.models import Outflow
 from tickers.models import Ticker
+from tickers.positions import rebuild_positions
+
+INFLOW_TYPES = {
+    "compra": "Compra",
+    "subscrição": "Subscrição",
+    "subscricao": "Subscrição",
+}
+OUTFLOW_TYPES = {"venda"}
+
+
+class RowError(Exception):
+    """Linha do CSV invalida."""
+    pass
+
 
 class Command(BaseCommand):
-    help = "create a new transaction."
-    
+    help = "Importa compras e vendas de um arquivo CSV (ticker,date,type,quantity,cost_price,broker)."
+
     def add_arguments(self, parser):
-        parser.add_argument("file_name", type=str, help="nome do arquivo com Fiis")
-    
+        parser.add_argument("file_name", type=str, help="nome do arquivo com as transacoes")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="linhas validadas e gravadas por lote")
+        parser.add_argument("--dry-run", action="store_true", help="valida e conta as linhas sem gravar nada")
+        parser.add_argument(
+            "--resume-from", type=int, default=0, metavar="LINHA",
+            help="ignora as linhas do arquivo anteriores a LINHA (a linha 2 e a primeira transacao)"
+        )
+
     def handle(self, *args, **options):
-        print(f"Argumento recebido {options}")
         file_name = options["file_name"]
+        self.verbosity = options["verbosity"]
+        chunk_size = options["chunk_size"]
+        self.dry_run = options["dry_run"]
+        resume_from = options["resume_from"]
+        started = time.monotonic()
+
+        # Lookups carregados uma unica vez
+        self.tickers = {name.upper(): pk for pk, name in Ticker.objects.values_list("id", "name")}
+        self.ticker_names = {pk: name for name, pk in self.tickers.items()}
+        self.brokers = dict(Broker.objects.values_list("name", "id"))
 
-        with open(file_name, "r", encoding="utf-8") as file:
+        stats = dict(rows=0, inflows=0, outflows=0, errors=0, duplicates=0, skipped=0)
+        touched_tickers = set()
+        # Ocorrencias de linhas identicas no arquivo: mantem a impressao
+        # digital estavel entre execucoes mesmo com negociacoes repetidas
+        self.occurrences = {}
+
+        with open(file_name, "r", encoding="utf-8") as file, transaction.atomic():
             reader = csv.DictReader(file)
-            for row in reader:
-                print(row)
-                ticker = row.get("ticker").upper()
-                date = row.get("date")
-                type = row.get("type").lower()
-                quantity = int(row.get("quantity", 0))
-                cost_price = float(row.get("cost_price", 0))
-                broker_name = row.get("broker", None)
+            chunk = []
+            for line_number, row in enumerate(reader, start=2):
                 try:
-                    # Convertendo a data para YYYY-MM-DD
-                    date = datetime.strptime(date, "%d/%m/%Y").date()
-
-                    ticker = Ticker.objects.get(name=ticker)
-                    broker = Broker.objects.get(name=broker_name) if broker_name else None
-                    print(f"corretora passando em aqui {broker}")
-                    if type in ["compra", "subscrição"]:
-                    
-                        Inflow.objects.create(
-                            ticker=ticker,
-                            date=date,
-                            type=type,
-                            quantity=(quantity),
-                            broker=broker,
-                            cost_price=(cost_price),
-                        )
-                    elif type == "venda":
-                        print(f"corretora passando em venda {broker}")
-                        Outflow.objects.create(
-                            ticker=ticker,
-                            date=date,
-                            
-                            quantity=quantity,
-                            broker=broker,
-                            cost_price=cost_price,
-                        )
-                    self.stdout.write(self.style.SUCCESS(f"Transação de {ticker} ({type} importada)"))
-                    
-                except Ticker.DoesNotExist:
-                    self.stderr.write(self.style.ERROR(
-                        f"Ticker '{ticker}' não encontrado."))
-                except Broker.DoesNotExist:
-                    self.stderr.write(self.style.ERROR(
-                        f"Corretora '{broker}' não encontrada."))
-        self.stdout.write(self.style.SUCCESS("Conlcuido"))
+                    values, error = self.parse_row(row), None
+                except RowError as e:
+                    values, error = None, e
+                fingerprint = self.fingerprint(values) if values else None
+                if line_number < resume_from:
+                    stats["skipped"] += 1
+                    continue
+                chunk.append((line_number, values, error, fingerprint))
+                if len(chunk) >= chunk_size:
+                    self.import_chunk(chunk, stats, touched_tickers)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk, stats, touched_tickers)
+
+            # Derivados recalculados uma unica vez, apos todas as gravacoes
+            if touched_tickers and not self.dry_run:
+                rebuild_positions(ticker_ids=touched_tickers)
+
+        if touched_tickers and not self.dry_run:
+            invalidate_metrics_cache()
+
+        elapsed = time.monotonic() - started
+        rate = stats["rows"] / elapsed if elapsed else 0
+        action = "seriam importadas (dry-run)" if self.dry_run else "importadas"
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['inflows']} compras e {stats['outflows']} vendas {action}, "
+            f"{stats['duplicates']} ja importadas, {stats['skipped']} ignoradas por --resume-from, "
+            f"{stats['errors']} linhas com erro, {stats['rows']} linhas em {elapsed:.2f}s ({rate:.0f} linhas/s)"
+        ))
+
+    def fingerprint(self, values):
+        """
+        Gera a impressao digital de uma linha valida a partir dos valores ja
+        convertidos por parse_row (ticker, data, tipo, quantidade, preco,
+        corretora e ocorrencia da mesma combinacao no arquivo): "10", "10.0"
+        e "10.00" sao a mesma negociacao.
+        """
+        key = "|".join((
+            self.ticker_names[values["ticker_id"]],
+            values["date"].isoformat(),
+            INFLOW_TYPES.get(values["type"], "Venda"),
+            str(values["quantity"]),
+            str(values["cost_price"]),
+            str(values["broker_id"] or ""),
+        ))
+        occurrence = self.occurrences.get(key, 0) + 1
+        self.occurrences[key] = occurrence
+        return hashlib.sha256(f"{key}|{occurrence}".encode("utf-8")).hexdigest()
+
+    def import_chunk(self, chunk, stats, touched_tickers):
+        """
+        Registra os erros de um lote de linhas ja convertidas, descarta as ja
+        importadas (pela impressao digital) e grava o restante com bulk_create.
+        """
+        fingerprints = [fingerprint for *_, fingerprint in chunk if fingerprint]
+        existing = set(
+            Inflow.objects.filter(import_fingerprint__in=fingerprints).values_list("import_fingerprint", flat=True)
+        )
+        existing.update(
+            Outflow.objects.filter(import_fingerprint__in=fingerprints).values_list("import_fingerprint", flat=True)
+        )
+
+        inflows = []
+        outflows = []
+        for line_number, values, error, fingerprint in chunk:
+            stats["rows"] += 1
+            if error is not None:
+                stats["errors"] += 1
+                self.stderr.write(self.style.ERROR(f"Linha {line_number}: {error}"))
+                continue
+            if fingerprint in existing:
+                stats["duplicates"] += 1
+                continue
+
+            touched_tickers.add(values["ticker_id"])
+            trade_type = values.pop("type")
+            values["import_fingerprint"] = fingerprint
+            if trade_type in INFLOW_TYPES:
+                inflows.append(Inflow(type=INFLOW_TYPES[trade_type], **values))
+            else:
+                outflows.append(Outflow(**values))
+
+        if not self.dry_run:
+            Inflow.objects.bulk_create(inflows)
+            Outflow.objects.bulk_create(outflows)
+        stats["inflows"] += len(inflows)
+        stats["outflows"] += len(outflows)
+
+        if self.verbosity >= 2:
+            self.stdout.write(f"Lote processado ate a linha {chunk[-1][0]}")
+
+    def parse_row(self, row):
+        """
+        Converte uma linha do CSV nos campos de Inflow/Outflow.
+
+        Raises:
+            RowError: Se algum campo for invalido
+        """
+        ticker_name = (row.get("ticker") or "").strip().upper()
+        broker_name = (row.get("broker") or "").strip()
+        trade_type = (row.get("type") or "").strip().lower()
+
+        ticker_id = self.tickers.get(ticker_name)
+        if ticker_id is None:
+            raise RowError(f"Ticker '{ticker_name}' não encontrado.")
+
+        broker_id = None
+        if broker_name:
+            broker_id = self.brokers.get(broker_name)
+            if broker_id is None:
+                raise RowError(f"Corretora '{broker_name}' não encontrada.")
+
+        if trade_type not in INFLOW_TYPES and trade_type not in OUTFLOW_TYPES:
+            raise RowError(f"Tipo '{trade_type}' inválido.")
+
+        try:
+            # Convertendo a data para YYYY-MM-DD
+            date = datetime.strptime((row.get("date") or "").strip(), "%d/%m/%Y").date()
+            quantity = int(row.get("quantity") or 0)
+            cost_price = Decimal((row.get("cost_price") or "0").strip()).quantize(Decimal("0.01"))
+        except (ValueError, InvalidOperation) as e:
+            raise RowError(f"Valor inválido: {e}")
+
+        if quantity <= 0 or cost_price <= 0:
+            raise RowError("Quantidade e preço devem ser maiores que zero.")
+
+        return dict(
+            ticker_id=ticker_id,
+            broker_id=broker_id,
+            date=date,
+            type=trade_type,
+            quantity=quantity,
+            cost_price=cost_price,
+            # bulk_create nao chama save(), entao o total e calculado aqui
+            total_price=cost_price * quantity,
+        )
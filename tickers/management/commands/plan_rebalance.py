@@ -0,0 +1,54 @@
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.http import Http404
+from app.rebalance import plan_rebalance
+from app.utils.validators import validate_currency_code
+from brokers.fx import FxRateMissing
+
+
+class Command(BaseCommand):
+    help = "Sugere as compras (em lotes) para aproximar a carteira dos pesos alvo com um aporte."
+
+    def add_arguments(self, parser):
+        parser.add_argument("cash", type=str, help="valor do aporte na moeda base")
+        parser.add_argument("--currency", type=str, help="moeda do aporte (BASE_CURRENCY por padrao)")
+        parser.add_argument(
+            "--quote", action="append", default=[], metavar="TICKER=PRECO",
+            help="cotacao a usar no lugar da gravada (pode ser repetido)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            cash = Decimal(options["cash"].replace(",", "."))
+        except InvalidOperation:
+            raise CommandError(f"Valor '{options['cash']}' inválido.")
+        try:
+            currency = validate_currency_code(options["currency"])
+        except Http404:
+            raise CommandError(f"Moeda '{options['currency']}' inválida.")
+
+        quotes = dict(self.parse_quote(value) for value in options["quote"])
+        try:
+            plan = plan_rebalance(cash, currency, quotes)
+        except (ValueError, FxRateMissing) as e:
+            raise CommandError(str(e))
+
+        currency = plan["base_currency"]
+        for order in plan["orders"]:
+            self.stdout.write(
+                f"{order['ticker']:<10} {order['quantity']:>8} x {order['price']:>12.2f} = {currency} {order['value']:.2f}"
+            )
+        for title, weights in plan["allocation"].items():
+            self.stdout.write(
+                f"{title}: atual {weights['current']:.2f}%, apos compras {weights['planned']:.2f}%, alvo {weights['target']:.2f}%"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plan['orders'])} ordens, {currency} {plan['spent']:.2f} investidos, {currency} {plan['leftover']:.2f} de sobra"
+        ))
+
+    def parse_quote(self, value):
+        name, _, price = value.partition("=")
+        try:
+            return name.strip().upper(), Decimal(price.strip().replace(",", "."))
+        except InvalidOperation:
+            raise CommandError(f"Cotação '{value}' inválida.")
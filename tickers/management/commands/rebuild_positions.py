@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tickers.positions import rebuild_positions
+
+
+class Command(BaseCommand):
+    help = "Recalcula a tabela de posicoes e o historico acumulado a partir de todas as compras e vendas."
+
+    def handle(self, *args, **options):
+        total = rebuild_positions()
+        self.stdout.write(self.style.SUCCESS(f"{total} posicoes recalculadas"))
@@ -0,0 +1,124 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from app.metrics_cache import SCOPE_QUOTES, bump_generations
+from services.get_ticker_details import Get_ticker_data
+from services.rate_limiter import RateLimiter
+from tickers.models import Quote, Ticker
+
+logger = logging.getLogger('services')
+
+
+class Command(BaseCommand):
+    help = "Atualiza as cotacoes dos tickers em carteira na tabela Quote e no cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="lotes buscados em paralelo")
+        parser.add_argument("--rate", type=float, default=5, help="maximo de requisicoes por segundo (0 = sem limite)")
+        parser.add_argument("--loop", action="store_true", help="executa continuamente")
+        parser.add_argument("--interval", type=int, default=60, help="segundos entre execucoes no modo --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = self.refresh(options["concurrency"], options["rate"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{stats['updated']}/{stats['tickers']} cotacoes atualizadas em {stats['elapsed']:.2f}s "
+                f"({stats['tickers_per_second']:.1f} tickers/s, {stats['batches']} lotes, "
+                f"{stats['failures']} falhas, latencia media {stats['avg_latency']:.3f}s, "
+                f"maxima {stats['max_latency']:.3f}s)"
+            ))
+            logger.info(f"refresh_quotes: {stats}")
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def refresh(self, concurrency, rate):
+        """
+        Executa uma rodada de atualizacao e retorna as metricas da execucao.
+        """
+        started = time.monotonic()
+        service = Get_ticker_data()
+        limiter = RateLimiter(rate)
+
+        tickers = {
+            ticker.name.upper(): ticker.id
+            for ticker in (
+                Ticker.objects
+                .annotate(position_quantity=Sum("positions__quantity"))
+                .filter(position_quantity__gt=0)
+                .only("id", "name")
+            )
+        }
+        codes = list(tickers)
+        batches = [codes[i:i + service.batch_size] for i in range(0, len(codes), service.batch_size)]
+
+        def fetch(batch):
+            limiter.acquire()
+            batch_started = time.monotonic()
+            quotes = service.fetch_quotes(batch)
+            return quotes, time.monotonic() - batch_started
+
+        quotes = {}
+        latencies = []
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for batch_quotes, latency in executor.map(fetch, batches):
+                quotes.update(batch_quotes)
+                latencies.append(latency)
+
+        service.cache_quotes(quotes)
+        updated = self.save_quotes(tickers, quotes)
+        if updated:
+            # save_quotes grava em lote, sem signals
+            bump_generations([SCOPE_QUOTES])
+
+        elapsed = time.monotonic() - started
+        return dict(
+            tickers=len(codes),
+            batches=len(batches),
+            updated=updated,
+            failures=len(codes) - len(quotes),
+            elapsed=elapsed,
+            tickers_per_second=len(codes) / elapsed if elapsed else 0,
+            avg_latency=sum(latencies) / len(latencies) if latencies else 0,
+            max_latency=max(latencies, default=0),
+        )
+
+    def save_quotes(self, tickers, quotes):
+        """Grava as cotacoes na tabela Quote com um unico upsert em lote."""
+        now = timezone.now()
+        rows = []
+        for code, data in quotes.items():
+            price = self._decimal(data.get("regularMarketPrice"))
+            if code not in tickers or price is None:
+                continue
+            market_time = data.get("regularMarketTime")
+            rows.append(Quote(
+                ticker_id=tickers[code],
+                price=price,
+                change_percent=self._decimal(data.get("regularMarketChangePercent")),
+                market_time=parse_datetime(market_time) if isinstance(market_time, str) else None,
+                updated_at=now,
+            ))
+
+        Quote.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["ticker"],
+            update_fields=["price", "change_percent", "market_time", "updated_at"],
+        )
+        return len(rows)
+
+    def _decimal(self, value):
+        if value is None:
+            return None
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
@@ -0,0 +1,73 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from app import benchmarks
+
+# Cache proprio do processo: os benchmarks limpam o cache a cada repeticao
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmarks",
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede dashboard, negociacoes, listagem e detalhe de tickers, dividendos e importacao "
+        "sobre carteiras sinteticas de varios tamanhos, em um banco de testes descartavel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", action="append", default=[], metavar="TICKERSxANOS",
+            help="tamanho da carteira (pode ser repetido; padrao: 10x2, 50x5 e 200x10)",
+        )
+        parser.add_argument("--repeat", type=int, default=benchmarks.DEFAULT_REPEAT, help="repeticoes de cada etapa")
+        parser.add_argument("--seed", type=int, default=0, help="semente do gerador da carteira")
+        parser.add_argument("--output", type=str, help="arquivo JSON de destino (padrao: saida padrao)")
+        parser.add_argument("--compare", type=str, metavar="ARQUIVO", help="relatorio JSON anterior para comparacao")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [benchmarks.parse_scale(value) for value in options["scale"]] or benchmarks.DEFAULT_SCALES
+        except ValueError:
+            raise CommandError(f"Escala inválida em {options['scale']}; use TICKERSxANOS (ex: 50x5).")
+        if options["repeat"] <= 0:
+            raise CommandError("--repeat deve ser positivo.")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Não foi possível ler {options['compare']}: {e}")
+
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                old_config = setup_databases(verbosity=0, interactive=False)
+                try:
+                    report = benchmarks.run_benchmarks(
+                        scales, options["repeat"], options["seed"], progress=self.stderr.write,
+                    )
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            teardown_test_environment()
+
+        content = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(content + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Resultados gravados em {options['output']}"))
+        else:
+            self.stdout.write(content)
+
+        if baseline is not None:
+            for scale, name, old, new, change in benchmarks.compare(baseline, report):
+                change = "n/a" if change is None else f"{change:+.1f}%"
+                self.stderr.write(f"{scale:>8} {name:<14} {old:>10.1f} ms -> {new:>10.1f} ms ({change})")
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("brokers", "0003_alter_broker_options"),
+        ("tickers", "0003_alter_ticker_currency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Position",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("quantity", models.IntegerField(default=0)),
+                ("cost_basis", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("average_price", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("last_trade_date", models.DateField(blank=True, null=True)),
+                ("broker", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="positions", to="brokers.broker")),
+                ("ticker", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="positions", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["ticker", "broker"],
+                "constraints": [models.UniqueConstraint(fields=("ticker", "broker"), name="position_ticker_broker_uniq")],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:52
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Max, Sum
+
+
+def populate_positions(apps, schema_editor):
+    Inflow = apps.get_model("inflows", "Inflow")
+    Outflow = apps.get_model("outflows", "Outflow")
+    Position = apps.get_model("tickers", "Position")
+
+    totals = {}
+    for model, direction in ((Inflow, 1), (Outflow, -1)):
+        grouped = (
+            model.objects
+            .order_by()
+            .values("ticker_id", "broker_id")
+            .annotate(quantity=Sum("quantity"), total_price=Sum("total_price"), last_date=Max("date"))
+        )
+        for item in grouped:
+            entry = totals.setdefault(
+                (item["ticker_id"], item["broker_id"]),
+                {"quantity": 0, "cost_basis": Decimal("0"), "last_trade_date": None},
+            )
+            entry["quantity"] += direction * (item["quantity"] or 0)
+            entry["cost_basis"] += direction * (item["total_price"] or Decimal("0"))
+            if entry["last_trade_date"] is None or item["last_date"] > entry["last_trade_date"]:
+                entry["last_trade_date"] = item["last_date"]
+
+    Position.objects.bulk_create(
+        [
+            Position(
+                ticker_id=ticker_id,
+                broker_id=broker_id,
+                quantity=entry["quantity"],
+                cost_basis=entry["cost_basis"],
+                average_price=(
+                    (entry["cost_basis"] / entry["quantity"]).quantize(Decimal("0.01"))
+                    if entry["quantity"] else Decimal("0")
+                ),
+                last_trade_date=entry["last_trade_date"],
+            )
+            for (ticker_id, broker_id), entry in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickers", "0004_position"),
+        ("inflows", "0007_alter_inflow_cost_price_alter_inflow_quantity_and_more"),
+        ("outflows", "0005_alter_outflow_cost_price_alter_outflow_quantity_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickers", "0005_populate_positions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Quote",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("price", models.DecimalField(decimal_places=4, max_digits=14)),
+                ("change_percent", models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ("market_time", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField()),
+                ("ticker", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="quote", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["ticker"],
+            },
+        ),
+    ]
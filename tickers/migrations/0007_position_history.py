@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:05
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_position_history(apps, schema_editor):
+    Inflow = apps.get_model("inflows", "Inflow")
+    Outflow = apps.get_model("outflows", "Outflow")
+    PositionHistory = apps.get_model("tickers", "PositionHistory")
+
+    deltas = {}
+    for model, direction in ((Inflow, 1), (Outflow, -1)):
+        grouped = (
+            model.objects
+            .order_by()
+            .values("ticker_id", "date")
+            .annotate(quantity=Sum("quantity"), total_price=Sum("total_price"))
+        )
+        for item in grouped:
+            entry = deltas.setdefault((item["ticker_id"], item["date"]), [0, Decimal("0")])
+            entry[0] += direction * (item["quantity"] or 0)
+            entry[1] += direction * (item["total_price"] or Decimal("0"))
+
+    rows = []
+    running = {}
+    for (ticker_id, date), (quantity, cost_basis) in sorted(deltas.items()):
+        total = running.setdefault(ticker_id, [0, Decimal("0")])
+        total[0] += quantity
+        total[1] += cost_basis
+        rows.append(PositionHistory(ticker_id=ticker_id, date=date, quantity=total[0], cost_basis=total[1]))
+
+    PositionHistory.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickers", "0006_quote"),
+        ("inflows", "0008_inflow_import_fingerprint"),
+        ("outflows", "0006_outflow_import_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PositionHistory",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("quantity", models.IntegerField(default=0)),
+                ("cost_basis", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("ticker", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="position_history", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["ticker", "date"],
+                "constraints": [models.UniqueConstraint(fields=("ticker", "date"), name="position_history_ticker_date_uniq")],
+            },
+        ),
+        migrations.RunPython(populate_position_history, migrations.RunPython.noop),
+    ]
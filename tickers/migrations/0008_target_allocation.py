@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:10
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_category_description"),
+        ("tickers", "0007_position_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticker",
+            name="lot_size",
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.CreateModel(
+            name="TargetAllocation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("weight", models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0, message="O peso nao pode ser negativo."), django.core.validators.MaxValueValidator(100, message="O peso nao pode passar de 100.")])),
+                ("category", models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="target", to="categories.category")),
+                ("ticker", models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="target", to="tickers.ticker")),
+            ],
+            options={
+                "ordering": ["category", "ticker"],
+                "constraints": [models.CheckConstraint(condition=models.Q(models.Q(("category__isnull", False), ("ticker__isnull", True)), models.Q(("category__isnull", True), ("ticker__isnull", False)), _connector="OR"), name="target_allocation_category_xor_ticker")],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def merge_positions_without_broker(apps, schema_editor):
+    Position = apps.get_model("tickers", "Position")
+
+    merged = {}
+    for position in Position.objects.filter(broker__isnull=True).order_by("ticker_id", "id"):
+        kept = merged.get(position.ticker_id)
+        if kept is None:
+            merged[position.ticker_id] = position
+            continue
+        kept.quantity += position.quantity
+        kept.cost_basis += position.cost_basis
+        if position.last_trade_date and (kept.last_trade_date is None or position.last_trade_date > kept.last_trade_date):
+            kept.last_trade_date = position.last_trade_date
+        kept.average_price = (
+            (Decimal(kept.cost_basis) / kept.quantity).quantize(Decimal("0.01")) if kept.quantity else Decimal("0")
+        )
+        kept.save()
+        position.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tickers", "0008_target_allocation"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_positions_without_broker, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="position",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("broker__isnull", True)), fields=("ticker",), name="position_ticker_no_broker_uniq"
+            ),
+        ),
+    ]
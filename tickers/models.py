@@ -1,7 +1,8 @@
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from categories.models import Category
-from brokers.models import Currency
+from brokers.models import Broker, Currency
 
 
 
@@ -13,6 +14,8 @@ class Ticker(models.Model):
     currency = models.ForeignKey(Currency, on_delete=models.PROTECT, related_name="tickers")
     sector = models.CharField(max_length=100, null=True, blank=True)
     description = models.TextField(max_length=500, null=True, blank=True)
+    # Menor quantidade negociavel (ex: 100 no lote padrao da B3, 1 no fracionario)
+    lot_size = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     
     class Meta:
         ordering = ["name"]
@@ -22,6 +25,123 @@ class Ticker(models.Model):
     
     @property
     def total_quantity(self):
-        from app import metrics
-        metrics = metrics.get_ticker_metrics(self)
-        return metrics["total_quantity"]
+        # Listagens anotam 'position_quantity' para evitar uma query por linha
+        quantity = getattr(self, "position_quantity", None)
+        if quantity is None:
+            quantity = self.positions.aggregate(total=models.Sum("quantity"))["total"]
+        return quantity or 0
+
+
+class Position(models.Model):
+    """
+    Posicao consolidada de um ticker em uma corretora.
+
+    Mantida de forma incremental pelos signals de Inflow/Outflow e
+    reconstruida do zero pelo comando 'rebuild_positions'.
+    """
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name="positions")
+    broker = models.ForeignKey(
+        Broker,
+        on_delete=models.CASCADE,
+        related_name="positions",
+        null=True,
+        blank=True
+    )
+    quantity = models.IntegerField(default=0)
+    cost_basis = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    average_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_trade_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["ticker", "broker"]
+        constraints = [
+            models.UniqueConstraint(fields=["ticker", "broker"], name="position_ticker_broker_uniq"),
+            # NULLs sao distintos na constraint acima: uma posicao sem corretora por ticker
+            models.UniqueConstraint(
+                fields=["ticker"], condition=models.Q(broker__isnull=True), name="position_ticker_no_broker_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Posicao {self.ticker} - {self.quantity}"
+
+
+class PositionHistory(models.Model):
+    """
+    Posicao acumulada de um ticker (todas as corretoras) ao fim de cada dia
+    com negociacao.
+
+    A posicao em qualquer data e a ultima linha com date <= data: uma unica
+    leitura pelo indice (ticker, date). Mantida pelos signals de
+    Inflow/Outflow a partir da data alterada e reconstruida pelo comando
+    'rebuild_positions'.
+    """
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, related_name="position_history")
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    cost_basis = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["ticker", "date"]
+        constraints = [
+            models.UniqueConstraint(fields=["ticker", "date"], name="position_history_ticker_date_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Posicao {self.ticker} em {self.date} - {self.quantity}"
+
+
+class Quote(models.Model):
+    """
+    Ultima cotacao conhecida de um ticker, mantida pelo comando 'refresh_quotes'.
+    """
+    ticker = models.OneToOneField(Ticker, on_delete=models.CASCADE, related_name="quote")
+    price = models.DecimalField(max_digits=14, decimal_places=4)
+    change_percent = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    market_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["ticker"]
+
+    def __str__(self):
+        return f"Cotacao {self.ticker} - {self.price}"
+
+
+class TargetAllocation(models.Model):
+    """
+    Peso alvo de uma categoria na carteira ou de um ticker dentro da sua
+    categoria, usado pelo planejador de rebalanceamento (app/rebalance.py).
+
+    Os pesos sao relativos: os das categorias sao normalizados pela soma de
+    todas as categorias e os dos tickers pela soma da sua categoria.
+    """
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, related_name="target", null=True, blank=True
+    )
+    ticker = models.OneToOneField(
+        Ticker, on_delete=models.CASCADE, related_name="target", null=True, blank=True
+    )
+    weight = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        validators=[
+            MinValueValidator(0, message="O peso nao pode ser negativo."),
+            MaxValueValidator(100, message="O peso nao pode passar de 100."),
+        ],
+    )
+
+    class Meta:
+        ordering = ["category", "ticker"]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(category__isnull=False, ticker__isnull=True)
+                    | models.Q(category__isnull=True, ticker__isnull=False)
+                ),
+                name="target_allocation_category_xor_ticker",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Alvo {self.category or self.ticker} - {self.weight}%"
@@ -0,0 +1,275 @@
+"""
+Manutencao da tabela materializada de posicoes (Position).
+
+Cada Inflow soma e cada Outflow subtrai quantidade e custo da posicao
+(ticker, corretora). Os signals aplicam apenas o delta da operacao, e
+'rebuild_positions' recalcula a tabela inteira a partir do historico.
+
+O historico acumulado por ticker e data (PositionHistory) responde a posicao
+em qualquer data com uma leitura indexada; os signals o refazem a partir da
+data da operacao alterada.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+from django.db import transaction
+from django.dispatch import Signal
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Position, PositionHistory, Ticker
+
+# Direcao de cada tipo de operacao sobre a posicao
+INFLOW = 1
+OUTFLOW = -1
+
+# Enviado apos as posicoes e o historico de tickers mudarem (argumentos
+# 'ticker_ids', None quando todos foram recalculados, e 'since', a data a
+# partir da qual o historico mudou, None para todo o historico)
+positions_changed = Signal()
+
+
+def trade_values(trade):
+    """
+    Extrai de um Inflow/Outflow os campos relevantes para a posicao.
+    """
+    return dict(
+        ticker_id=trade.ticker_id,
+        broker_id=trade.broker_id,
+        quantity=trade.quantity or 0,
+        total_price=trade.total_price or Decimal("0"),
+        date=trade.date,
+    )
+
+
+def apply_trade(values, direction, removing=False):
+    """
+    Aplica (ou desfaz, com removing=True) o efeito de uma operacao na
+    posicao correspondente, travando a linha durante a atualizacao.
+    """
+    sign = -direction if removing else direction
+
+    with transaction.atomic():
+        position, _ = Position.objects.select_for_update().get_or_create(
+            ticker_id=values["ticker_id"],
+            broker_id=values["broker_id"],
+        )
+        position.quantity += sign * values["quantity"]
+        position.cost_basis += sign * Decimal(values["total_price"])
+        position.average_price = _average_price(position.cost_basis, position.quantity)
+
+        if removing:
+            if position.last_trade_date is None or values["date"] >= position.last_trade_date:
+                position.last_trade_date = _last_trade_date(values["ticker_id"], values["broker_id"])
+        elif position.last_trade_date is None or values["date"] > position.last_trade_date:
+            position.last_trade_date = values["date"]
+
+        position.save()
+    return position
+
+
+@transaction.atomic
+def rebuild_positions(ticker_ids=None):
+    """
+    Recalcula as posicoes a partir do historico de Inflows e Outflows.
+
+    Usa uma query agrupada por tabela e grava o resultado com bulk_create.
+    Com 'ticker_ids', apenas as posicoes desses tickers sao recalculadas.
+    Tambem sincroniza Ticker.quantity com o total das posicoes.
+    Retorna o numero de posicoes criadas.
+    """
+    from inflows.models import Inflow
+    from outflows.models import Outflow
+
+    totals = {}
+    for model, direction in ((Inflow, INFLOW), (Outflow, OUTFLOW)):
+        trades = model.objects.all()
+        if ticker_ids is not None:
+            trades = trades.filter(ticker_id__in=ticker_ids)
+        grouped = (
+            trades
+            .order_by()
+            .values("ticker_id", "broker_id")
+            .annotate(quantity=Sum("quantity"), total_price=Sum("total_price"), last_date=Max("date"))
+        )
+        for item in grouped:
+            key = (item["ticker_id"], item["broker_id"])
+            entry = totals.setdefault(key, dict(quantity=0, cost_basis=Decimal("0"), last_trade_date=None))
+            entry["quantity"] += direction * (item["quantity"] or 0)
+            entry["cost_basis"] += direction * (item["total_price"] or Decimal("0"))
+            if entry["last_trade_date"] is None or item["last_date"] > entry["last_trade_date"]:
+                entry["last_trade_date"] = item["last_date"]
+
+    positions_to_replace = Position.objects.all()
+    if ticker_ids is not None:
+        positions_to_replace = positions_to_replace.filter(ticker_id__in=ticker_ids)
+    positions_to_replace.delete()
+    positions = [
+        Position(
+            ticker_id=ticker_id,
+            broker_id=broker_id,
+            quantity=entry["quantity"],
+            cost_basis=entry["cost_basis"],
+            average_price=_average_price(entry["cost_basis"], entry["quantity"]),
+            last_trade_date=entry["last_trade_date"],
+        )
+        for (ticker_id, broker_id), entry in totals.items()
+    ]
+    Position.objects.bulk_create(positions, batch_size=1000)
+    _sync_ticker_quantities(ticker_ids)
+    rebuild_position_history(ticker_ids)
+    return len(positions)
+
+
+@transaction.atomic
+def rebuild_position_history(ticker_ids=None, since=None):
+    """
+    Recalcula o historico acumulado (PositionHistory) a partir das compras e
+    vendas, com uma query agrupada por tabela.
+
+    Com 'since', apenas as linhas a partir dessa data sao refeitas, partindo
+    da ultima posicao anterior a ela. Retorna o numero de linhas criadas.
+    """
+    from inflows.models import Inflow
+    from outflows.models import Outflow
+
+    if ticker_ids is not None:
+        ticker_ids = sorted(set(ticker_ids))
+        # Serializa reconstrucoes concorrentes dos mesmos tickers
+        list(Ticker.objects.select_for_update().filter(id__in=ticker_ids).values_list("id", flat=True))
+
+    deltas = {}
+    for model, direction in ((Inflow, INFLOW), (Outflow, OUTFLOW)):
+        trades = model.objects.all()
+        if ticker_ids is not None:
+            trades = trades.filter(ticker_id__in=ticker_ids)
+        if since is not None:
+            trades = trades.filter(date__gte=since)
+        grouped = (
+            trades
+            .order_by()
+            .values("ticker_id", "date")
+            .annotate(quantity=Sum("quantity"), total_price=Sum("total_price"))
+        )
+        for item in grouped:
+            entry = deltas.setdefault((item["ticker_id"], item["date"]), [0, Decimal("0")])
+            entry[0] += direction * (item["quantity"] or 0)
+            entry[1] += direction * (item["total_price"] or Decimal("0"))
+
+    history = PositionHistory.objects.all()
+    if ticker_ids is not None:
+        history = history.filter(ticker_id__in=ticker_ids)
+
+    running = {}
+    if since is not None:
+        # Ultima linha de cada ticker antes de 'since', em uma query
+        latest_before = (
+            PositionHistory.objects
+            .filter(ticker_id=OuterRef("ticker_id"), date__lt=since)
+            .order_by("-date")
+            .values("id")[:1]
+        )
+        for base in history.filter(date__lt=since, id=Subquery(latest_before)).values(
+            "ticker_id", "quantity", "cost_basis"
+        ):
+            running[base["ticker_id"]] = [base["quantity"], base["cost_basis"]]
+        history = history.filter(date__gte=since)
+    history.delete()
+
+    rows = []
+    for (ticker_id, day), (quantity, cost_basis) in sorted(deltas.items()):
+        total = running.setdefault(ticker_id, [0, Decimal("0")])
+        total[0] += quantity
+        total[1] += cost_basis
+        rows.append(PositionHistory(ticker_id=ticker_id, date=day, quantity=total[0], cost_basis=total[1]))
+    PositionHistory.objects.bulk_create(rows, batch_size=1000)
+    positions_changed.send(sender=PositionHistory, ticker_ids=ticker_ids, since=since)
+    return len(rows)
+
+
+def refresh_position_history(*trades):
+    """
+    Refaz o historico dos tickers das operacoes (valores de 'trade_values')
+    a partir da data mais antiga entre elas.
+    """
+    trades = [trade for trade in trades if trade]
+    if trades:
+        rebuild_position_history(
+            ticker_ids={trade["ticker_id"] for trade in trades},
+            since=min(trade["date"] for trade in trades),
+        )
+
+
+def position_as_of(ticker, target_date):
+    """
+    Retorna a posicao do ticker (todas as corretoras) ao fim de 'target_date'
+    com uma unica leitura indexada: dict com quantity e cost_basis.
+    """
+    row = (
+        PositionHistory.objects
+        .filter(ticker=ticker, date__lte=target_date)
+        .order_by("-date")
+        .values("quantity", "cost_basis")
+        .first()
+    )
+    return row or dict(quantity=0, cost_basis=Decimal("0"))
+
+
+def position_series(ticker, dates):
+    """
+    Retorna a posicao do ticker em cada uma das datas (mesma ordem), lendo o
+    historico uma unica vez. Util para graficos de evolucao da carteira.
+    """
+    dates = list(dates)
+    if not dates:
+        return []
+
+    rows = list(
+        PositionHistory.objects
+        .filter(ticker=ticker, date__lte=max(dates))
+        .order_by("date")
+        .values("date", "quantity", "cost_basis")
+    )
+    days = [row["date"] for row in rows]
+    series = []
+    for day in dates:
+        index = bisect_right(days, day)
+        if index:
+            series.append(dict(quantity=rows[index - 1]["quantity"], cost_basis=rows[index - 1]["cost_basis"]))
+        else:
+            series.append(dict(quantity=0, cost_basis=Decimal("0")))
+    return series
+
+
+def _sync_ticker_quantities(ticker_ids=None):
+    tickers = Ticker.objects.all()
+    if ticker_ids is not None:
+        tickers = tickers.filter(id__in=ticker_ids)
+    total_quantity = (
+        Position.objects
+        .filter(ticker=OuterRef("pk"))
+        .order_by()
+        .values("ticker")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    tickers.update(quantity=Coalesce(Subquery(total_quantity), 0))
+
+
+def _average_price(cost_basis, quantity):
+    if not quantity:
+        return Decimal("0")
+    return (Decimal(cost_basis) / quantity).quantize(Decimal("0.01"))
+
+
+def _last_trade_date(ticker_id, broker_id):
+    from inflows.models import Inflow
+    from outflows.models import Outflow
+
+    dates = [
+        model.objects
+        .filter(ticker_id=ticker_id, broker_id=broker_id)
+        .aggregate(last=Max("date"))["last"]
+        for model in (Inflow, Outflow)
+    ]
+    dates = [d for d in dates if d is not None]
+    return max(dates) if dates else None
@@ -0,0 +1,50 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from app.metrics import invalidate_ticker_metrics
+from app.metrics_cache import SCOPE_TARGETS, bump_generations_on_commit
+from tickers.models import TargetAllocation, Ticker
+
+# Campos que agrupam as metricas do dashboard
+GROUPING_FIELDS = ("category_id", "currency_id")
+
+
+@receiver(pre_save, sender=Ticker)
+def snapshot_grouping_values(sender, instance, update_fields=None, **kwargs):
+    # Atualizacoes parciais que nao tocam categoria/moeda nao precisam da leitura
+    instance._grouping_snapshot = None
+    if not instance.pk:
+        return
+    if update_fields is not None and not {"category", "currency"} & set(update_fields):
+        return
+    instance._grouping_snapshot = sender.objects.filter(pk=instance.pk).values(*GROUPING_FIELDS).first()
+
+
+@receiver(post_save, sender=Ticker)
+def invalidate_metrics(sender, instance, created, **kwargs):
+    current = {field: getattr(instance, field) for field in GROUPING_FIELDS}
+    snapshot = getattr(instance, "_grouping_snapshot", None)
+    if created:
+        invalidate_ticker_metrics({current["category_id"]}, {current["currency_id"]})
+    elif snapshot and snapshot != current:
+        invalidate_ticker_metrics(
+            {current["category_id"], snapshot["category_id"]},
+            {current["currency_id"], snapshot["currency_id"]},
+        )
+
+
+@receiver(post_delete, sender=Ticker)
+def invalidate_metrics_on_delete(sender, instance, **kwargs):
+    invalidate_ticker_metrics({instance.category_id}, {instance.currency_id})
+
+
+@receiver(post_save, sender=Ticker)
+def invalidate_lot_size(sender, instance, update_fields=None, **kwargs):
+    # O lote entra no planejador de rebalanceamento; saves so da quantidade nao o alteram
+    if update_fields is None or "lot_size" in update_fields:
+        bump_generations_on_commit([SCOPE_TARGETS])
+
+
+@receiver(post_save, sender=TargetAllocation)
+@receiver(post_delete, sender=TargetAllocation)
+def invalidate_targets(sender, instance, **kwargs):
+    bump_generations_on_commit([SCOPE_TARGETS])
@@ -3,13 +3,21 @@ Tests for Ticker model.
 """
 from datetime import date, timedelta
 from decimal import Decimal
+from io import StringIO
 import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.urls import reverse
 
 from brokers.models import Broker, Currency
 from categories.models import Category
-from tickers.models import Ticker
+from dividends.models import DeclaredDividend
+from tickers.models import Position, PositionHistory, Quote, Ticker
+from tickers.positions import position_as_of, position_series, rebuild_position_history
 from inflows.models import Inflow
-from outflows.models import Outflow
+from outflows.models import Outflow, RealizedGain
 
 
 @pytest.fixture
@@ -165,3 +173,466 @@ class TestTickerTotalQuantity:
         )
         # 100 - 30 + 20 = 90
         assert ticker.total_quantity == 90
+
+
+class TestPosition:
+    """Tests for the materialized Position table."""
+
+    def _position(self, ticker, broker):
+        return Position.objects.get(ticker=ticker, broker=broker)
+
+    def test_inflow_creates_position(self, currency, category, broker):
+        """Test creating an inflow creates the ticker/broker position."""
+        ticker = Ticker.objects.create(name="POS11", category=category, currency=currency)
+        Inflow.objects.create(
+            ticker=ticker,
+            broker=broker,
+            cost_price=Decimal("10.00"),
+            quantity=100,
+            date=date.today() - timedelta(days=10),
+        )
+        position = self._position(ticker, broker)
+        assert position.quantity == 100
+        assert position.cost_basis == Decimal("1000.00")
+        assert position.average_price == Decimal("10.00")
+        assert position.last_trade_date == date.today() - timedelta(days=10)
+
+    def test_outflow_reduces_position(self, currency, category, broker):
+        """Test an outflow subtracts quantity and cost from the position."""
+        ticker = Ticker.objects.create(name="POS12", category=category, currency=currency)
+        Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=100,
+            date=date.today() - timedelta(days=10),
+        )
+        Outflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("12.00"), quantity=40,
+            date=date.today() - timedelta(days=5),
+        )
+        position = self._position(ticker, broker)
+        assert position.quantity == 60
+        assert position.cost_basis == Decimal("520.00")
+        assert position.last_trade_date == date.today() - timedelta(days=5)
+
+    def test_update_moves_position_between_brokers(self, currency, category, broker):
+        """Test updating an inflow reverts the old values before applying the new ones."""
+        other_broker = Broker.objects.create(name="Other Broker", currency=currency)
+        ticker = Ticker.objects.create(name="POS13", category=category, currency=currency)
+        inflow = Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=100,
+            date=date.today() - timedelta(days=10),
+        )
+        inflow.broker = other_broker
+        inflow.quantity = 50
+        inflow.save()
+
+        assert self._position(ticker, broker).quantity == 0
+        assert self._position(ticker, broker).last_trade_date is None
+        assert self._position(ticker, other_broker).quantity == 50
+        assert self._position(ticker, other_broker).cost_basis == Decimal("500.00")
+
+    def test_delete_reverts_position(self, currency, category, broker):
+        """Test deleting the latest trade restores quantity and last trade date."""
+        ticker = Ticker.objects.create(name="POS14", category=category, currency=currency)
+        Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=100,
+            date=date.today() - timedelta(days=10),
+        )
+        outflow = Outflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("12.00"), quantity=40,
+            date=date.today() - timedelta(days=5),
+        )
+        outflow.delete()
+        position = self._position(ticker, broker)
+        assert position.quantity == 100
+        assert position.cost_basis == Decimal("1000.00")
+        assert position.last_trade_date == date.today() - timedelta(days=10)
+
+    def test_rebuild_positions_command(self, currency, category, broker):
+        """Test rebuild_positions recomputes the table from the trade history."""
+        ticker = Ticker.objects.create(name="POS15", category=category, currency=currency)
+        Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=100,
+            date=date.today() - timedelta(days=10),
+        )
+        Inflow.objects.create(
+            ticker=ticker, broker=None, cost_price=Decimal("20.00"), quantity=10,
+            date=date.today() - timedelta(days=3),
+        )
+        Position.objects.update(quantity=0, cost_basis=0)
+
+        call_command("rebuild_positions", stdout=StringIO())
+
+        assert Position.objects.count() == 2
+        assert self._position(ticker, broker).quantity == 100
+        assert self._position(ticker, None).cost_basis == Decimal("200.00")
+        assert ticker.total_quantity == 110
+
+    def test_one_position_without_broker_per_ticker(self, currency, category):
+        """Test trades without broker share a single position and duplicates are rejected."""
+        ticker = Ticker.objects.create(name="POS16", category=category, currency=currency)
+        for quantity in (10, 5):
+            Inflow.objects.create(
+                ticker=ticker, broker=None, cost_price=Decimal("10.00"), quantity=quantity,
+                date=date.today() - timedelta(days=3),
+            )
+
+        assert self._position(ticker, None).quantity == 15
+        assert ticker.total_quantity == 15
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Position.objects.create(ticker=ticker, broker=None, quantity=1)
+
+
+class TestPositionHistory:
+    """Tests for the cumulative point-in-time position history."""
+
+    @pytest.fixture
+    def ticker(self, currency, category):
+        return Ticker.objects.create(name="HIST11", category=category, currency=currency)
+
+    @pytest.fixture
+    def trades(self, ticker, broker):
+        day = date(2024, 1, 10)
+        Inflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=10, date=day)
+        Inflow.objects.create(
+            ticker=ticker, broker=None, cost_price=Decimal("20.00"), quantity=5, date=day + timedelta(days=5)
+        )
+        Outflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("12.00"), quantity=4, date=day + timedelta(days=10)
+        )
+        return day
+
+    def test_history_is_cumulative_per_trade_day(self, ticker, trades):
+        """Test each trade day stores the running quantity and cost."""
+        history = list(PositionHistory.objects.filter(ticker=ticker).values_list("date", "quantity", "cost_basis"))
+        assert history == [
+            (trades, 10, Decimal("100.00")),
+            (trades + timedelta(days=5), 15, Decimal("200.00")),
+            (trades + timedelta(days=10), 11, Decimal("152.00")),
+        ]
+
+    def test_position_as_of_uses_last_day_before_date(self, ticker, trades):
+        """Test any date resolves to the last trade day on or before it."""
+        assert position_as_of(ticker, trades - timedelta(days=1)) == dict(quantity=0, cost_basis=Decimal("0"))
+        assert position_as_of(ticker, trades + timedelta(days=7))["quantity"] == 15
+        assert position_as_of(ticker, date(2030, 1, 1))["quantity"] == 11
+
+    def test_position_as_of_is_single_query(self, ticker, trades, django_assert_num_queries):
+        """Test a historical date costs one indexed lookup."""
+        with django_assert_num_queries(1):
+            position_as_of(ticker, trades + timedelta(days=7))
+
+    def test_series_reads_history_once(self, ticker, trades, django_assert_num_queries):
+        """Test a series over many dates costs a single query."""
+        dates = [trades + timedelta(days=offset) for offset in range(-1, 30)]
+        with django_assert_num_queries(1):
+            series = position_series(ticker, dates)
+        assert [point["quantity"] for point in series[:2]] == [0, 10]
+        assert series[-1]["quantity"] == 11
+
+    def test_backdated_trade_updates_later_days(self, ticker, trades, broker):
+        """Test a trade in the past shifts every later row."""
+        Inflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("1.00"), quantity=1, date=trades + timedelta(days=2)
+        )
+        assert position_as_of(ticker, trades + timedelta(days=2))["quantity"] == 11
+        assert position_as_of(ticker, trades + timedelta(days=10))["quantity"] == 12
+
+    def test_update_and_delete_refresh_history(self, ticker, trades):
+        """Test moving or removing a trade rebuilds the affected days."""
+        outflow = Outflow.objects.get(ticker=ticker)
+        outflow.date = trades + timedelta(days=1)
+        outflow.save()
+        assert position_as_of(ticker, trades + timedelta(days=1))["quantity"] == 6
+        assert not PositionHistory.objects.filter(ticker=ticker, date=trades + timedelta(days=10)).exists()
+
+        outflow.delete()
+        assert position_as_of(ticker, trades + timedelta(days=20))["quantity"] == 15
+
+    def test_partial_rebuild_matches_full_rebuild(self, ticker, trades):
+        """Test rebuilding from a date gives the same rows as a full rebuild."""
+        full = list(PositionHistory.objects.values_list("ticker_id", "date", "quantity", "cost_basis"))
+        rebuild_position_history(ticker_ids=[ticker.id], since=trades + timedelta(days=5))
+        assert list(PositionHistory.objects.values_list("ticker_id", "date", "quantity", "cost_basis")) == full
+        rebuild_position_history()
+        assert list(PositionHistory.objects.values_list("ticker_id", "date", "quantity", "cost_basis")) == full
+
+
+class TestRefreshQuotesCommand:
+    """Tests for the refresh_quotes management command."""
+
+    @pytest.fixture
+    def brapi(self, stub_server, settings):
+        settings.BRAPI_URL = f"{stub_server.url}/quote"
+        settings.BRAPI_BATCH_SIZE = 2
+        settings.API_TIMEOUT = 2
+        cache.clear()
+        yield stub_server
+        cache.clear()
+
+    def test_refresh_only_held_tickers(self, brapi, currency, category, broker):
+        """Test only tickers with a position are fetched and stored."""
+        held = Ticker.objects.create(name="HELD11", category=category, currency=currency)
+        Ticker.objects.create(name="IDLE11", category=category, currency=currency)
+        Inflow.objects.create(
+            ticker=held, broker=broker, cost_price=Decimal("10.00"), quantity=10,
+            date=date.today() - timedelta(days=1),
+        )
+        brapi.routes["/quote/HELD11"] = {"results": [{
+            "symbol": "HELD11",
+            "regularMarketPrice": 12.34,
+            "regularMarketChangePercent": -0.5,
+            "regularMarketTime": "2026-10-16T20:07:00.000Z",
+        }]}
+
+        out = StringIO()
+        call_command("refresh_quotes", "--rate=0", stdout=out)
+
+        quote = Quote.objects.get(ticker=held)
+        assert quote.price == Decimal("12.3400")
+        assert quote.change_percent == Decimal("-0.5000")
+        assert not Quote.objects.filter(ticker__name="IDLE11").exists()
+        assert cache.get("quote_HELD11")["regularMarketPrice"] == 12.34
+        assert brapi.requests == ["/quote/HELD11?token="]
+        assert "1/1 cotacoes atualizadas" in out.getvalue()
+
+    def test_refresh_updates_existing_quotes_in_batches(self, brapi, currency, category, broker):
+        """Test quotes are fetched in batches and upserted."""
+        for name in ("AAA11", "BBB11", "CCC11"):
+            ticker = Ticker.objects.create(name=name, category=category, currency=currency)
+            Inflow.objects.create(
+                ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=1,
+                date=date.today() - timedelta(days=1),
+            )
+        brapi.routes["/quote/AAA11,BBB11"] = {"results": [
+            {"symbol": "AAA11", "regularMarketPrice": 1},
+            {"symbol": "BBB11", "regularMarketPrice": 2},
+        ]}
+
+        call_command("refresh_quotes", "--rate=0", "--concurrency=2", stdout=StringIO())
+        brapi.routes["/quote/AAA11,BBB11"]["results"][0]["regularMarketPrice"] = 5
+        out = StringIO()
+        call_command("refresh_quotes", "--rate=0", stdout=out)
+
+        assert Quote.objects.get(ticker__name="AAA11").price == Decimal("5")
+        assert Quote.objects.count() == 2
+        assert "1 falhas" in out.getvalue()
+
+
+@pytest.fixture
+def authenticated_client(client, db):
+    """Return an authenticated client."""
+    User.objects.create_user(username="testuser", password="testpass123")
+    client.login(username="testuser", password="testpass123")
+    return client
+
+
+class TestTickerListView:
+    """Tests for the paginated ticker list of a category."""
+
+    def test_pages_are_ordered_by_name(self, authenticated_client, currency, category, broker):
+        """Test the 25-row pages follow the ticker names, with positions annotated."""
+        for number in reversed(range(30)):
+            ticker = Ticker.objects.create(name=f"TK{number:02d}11", category=category, currency=currency)
+            Inflow.objects.create(ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=number + 1, date=date(2024, 1, 2))
+        url = reverse("ticker_list", kwargs={"category": "FII"})
+
+        first = authenticated_client.get(url).context["tickers"]
+        second = authenticated_client.get(url, {"page": 2}).context["tickers"]
+
+        names = [ticker.name for ticker in first] + [ticker.name for ticker in second]
+        assert names == [f"TK{number:02d}11" for number in range(30)]
+        assert first[0].position_quantity == 1
+
+
+class TestTickerDetailsView:
+    """Tests for the paginated transaction history of the ticker detail page."""
+
+    @pytest.fixture
+    def traded_ticker(self, stub_server, settings, currency, category, broker):
+        settings.BRAPI_URL = f"{stub_server.url}/quote"
+        cache.clear()
+        ticker = Ticker.objects.create(name="HIST11", category=category, currency=currency)
+        for day in range(25):
+            Inflow.objects.create(
+                ticker=ticker, broker=broker, cost_price=Decimal("10.00"), quantity=2,
+                date=date.today() - timedelta(days=day + 1),
+            )
+        Outflow.objects.create(
+            ticker=ticker, broker=broker, cost_price=Decimal("12.00"), quantity=1,
+            date=date.today(),
+        )
+        yield ticker
+        cache.clear()
+
+    def test_details_shows_first_page(self, authenticated_client, traded_ticker):
+        """Test the detail page renders only the first page of transactions."""
+        url = reverse("ticker_details", kwargs={"category": "FII", "pk": traded_ticker.pk})
+        response = authenticated_client.get(url)
+
+        page = response.context["transactions"]
+        assert response.status_code == 200
+        assert len(page) == 20
+        assert page.has_next
+        assert page.object_list[0]["transaction_type"] == "Venda"
+        assert "inflows" not in response.context
+
+    def test_load_more_returns_next_rows(self, authenticated_client, traded_ticker):
+        """Test the load more endpoint returns the remaining rows and no next page."""
+        details_url = reverse("ticker_details", kwargs={"category": "FII", "pk": traded_ticker.pk})
+        first = authenticated_client.get(details_url).context["transactions"]
+
+        url = reverse("ticker_transactions", kwargs={"category": "FII", "pk": traded_ticker.pk})
+        response = authenticated_client.get(url, {"after": first.next_cursor})
+
+        assert response.status_code == 200
+        assert len(response.context["transactions"]) == 6
+        assert response["X-Next-Page"] == ""
+        assert response.content.decode().count("<tr>") == 6
+
+    def test_load_more_checks_the_category(self, authenticated_client, traded_ticker):
+        """Test the load more endpoint returns 404 when the ticker is not in the URL category."""
+        url = reverse("ticker_transactions", kwargs={"category": "Acao", "pk": traded_ticker.pk})
+        assert authenticated_client.get(url).status_code == 404
+
+    def test_load_more_requires_login(self, client, traded_ticker):
+        """Test the load more endpoint redirects anonymous users."""
+        url = reverse("ticker_transactions", kwargs={"category": "FII", "pk": traded_ticker.pk})
+        assert client.get(url).status_code == 302
+
+
+class TestImportFiisCommand:
+    """Tests for the bulk CSV import command."""
+
+    @pytest.fixture
+    def csv_file(self, tmp_path, currency, category, broker):
+        Ticker.objects.create(name="XPML11", category=category, currency=currency)
+        Ticker.objects.create(name="HGLG11", category=category, currency=currency)
+        path = tmp_path / "trades.csv"
+        path.write_text(
+            "ticker,date,type,quantity,cost_price,broker\n"
+            "XPML11,04/12/2018,compra,5,103.2,Test Broker\n"
+            "xpml11,14/02/2019,subscrição,3,102.21,Test Broker\n"
+            "HGLG11,10/03/2019,compra ,10,150,\n"
+            "XPML11,20/05/2020,venda,2,110,Test Broker\n"
+            "FAKE11,20/05/2020,compra,2,110,Test Broker\n"
+            "HGLG11,20/05/2020,compra,2,110,Unknown Broker\n"
+            "HGLG11,31/02/2020,compra,2,110,Test Broker\n",
+            encoding="utf-8",
+        )
+        return path
+
+    def test_import_creates_trades_and_positions(self, csv_file, broker):
+        """Test valid rows are bulk created and positions rebuilt once."""
+        out, err = StringIO(), StringIO()
+        call_command("import_fiis", str(csv_file), "--chunk-size=2", stdout=out, stderr=err)
+
+        assert Inflow.objects.count() == 3
+        assert Outflow.objects.count() == 1
+        assert Inflow.objects.get(quantity=3).type == "Subscrição"
+        assert Inflow.objects.get(quantity=3).total_price == Decimal("306.63")
+
+        xpml = Ticker.objects.get(name="XPML11")
+        assert Position.objects.get(ticker=xpml, broker=broker).quantity == 6
+        assert xpml.quantity == 6
+        assert Position.objects.get(ticker__name="HGLG11", broker=None).cost_basis == Decimal("1500.00")
+
+        assert "3 compras e 1 vendas importadas" in out.getvalue()
+        assert "3 linhas com erro" in out.getvalue()
+        assert "FAKE11" in err.getvalue()
+        assert "Unknown Broker" in err.getvalue()
+
+    def test_import_is_idempotent(self, csv_file):
+        """Test re-running the same file does not duplicate trades."""
+        call_command("import_fiis", str(csv_file), stdout=StringIO(), stderr=StringIO())
+        out = StringIO()
+        call_command("import_fiis", str(csv_file), stdout=out, stderr=StringIO())
+
+        assert Inflow.objects.count() == 3
+        assert Outflow.objects.count() == 1
+        assert Ticker.objects.get(name="XPML11").quantity == 6
+        assert "0 compras e 0 vendas importadas, 4 ja importadas" in out.getvalue()
+
+    def test_import_keeps_identical_rows_in_same_file(self, tmp_path, currency, category, broker):
+        """Test identical trades in one file are imported once each, and only once."""
+        Ticker.objects.create(name="XPML11", category=category, currency=currency)
+        path = tmp_path / "repeated.csv"
+        path.write_text(
+            "ticker,date,type,quantity,cost_price,broker\n"
+            "XPML11,04/12/2018,compra,5,103.2,Test Broker\n"
+            "XPML11,04/12/2018,compra,5,103.2,Test Broker\n",
+            encoding="utf-8",
+        )
+        call_command("import_fiis", str(path), stdout=StringIO(), stderr=StringIO())
+        call_command("import_fiis", str(path), stdout=StringIO(), stderr=StringIO())
+
+        assert Inflow.objects.count() == 2
+
+    def test_import_ignores_number_formatting(self, tmp_path, currency, category, broker):
+        """Test the same trades saved with other number and text formatting are not imported again."""
+        Ticker.objects.create(name="XPML11", category=category, currency=currency)
+        first = tmp_path / "first.csv"
+        first.write_text(
+            "ticker,date,type,quantity,cost_price,broker\n"
+            "XPML11,04/12/2018,compra,5,10,Test Broker\n"
+            "XPML11,04/12/2018,compra,5,10,Test Broker\n"
+            "XPML11,14/02/2019,subscrição,3,102.2,Test Broker\n",
+            encoding="utf-8",
+        )
+        saved_again = tmp_path / "saved_again.csv"
+        saved_again.write_text(
+            "ticker,date,type,quantity,cost_price,broker\n"
+            "xpml11,04/12/2018,Compra,5,10.00,Test Broker\n"
+            "XPML11 ,4/12/2018,compra,5,10.0,Test Broker\n"
+            "XPML11,14/02/2019,subscricao,3,102.20,Test Broker\n",
+            encoding="utf-8",
+        )
+        call_command("import_fiis", str(first), stdout=StringIO(), stderr=StringIO())
+        out = StringIO()
+        call_command("import_fiis", str(saved_again), stdout=out, stderr=StringIO())
+
+        assert Inflow.objects.count() == 3
+        assert "3 ja importadas" in out.getvalue()
+
+    def test_dry_run_writes_nothing(self, csv_file):
+        """Test --dry-run validates and counts rows without saving them."""
+        out, err = StringIO(), StringIO()
+        call_command("import_fiis", str(csv_file), "--dry-run", stdout=out, stderr=err)
+
+        assert Inflow.objects.count() == 0
+        assert Outflow.objects.count() == 0
+        assert Position.objects.count() == 0
+        assert "3 compras e 1 vendas seriam importadas" in out.getvalue()
+        assert "FAKE11" in err.getvalue()
+
+    def test_resume_from_skips_previous_lines(self, csv_file):
+        """Test --resume-from ignores the lines before the given one."""
+        out = StringIO()
+        call_command("import_fiis", str(csv_file), "--resume-from=4", stdout=out, stderr=StringIO())
+
+        assert Inflow.objects.count() == 1
+        assert Outflow.objects.count() == 1
+        assert "2 ignoradas por --resume-from" in out.getvalue()
+
+        # A importacao completa depois do resume nao duplica as linhas ja gravadas
+        call_command("import_fiis", str(csv_file), stdout=StringIO(), stderr=StringIO())
+        assert Inflow.objects.count() == 3
+        assert Outflow.objects.count() == 1
+
+    def test_import_uses_constant_number_of_queries(self, tmp_path, currency, category, broker, django_assert_max_num_queries):
+        """Test importing N and 2N rows issues the same queries, within budget."""
+        counts = []
+        for size in (10, 20):
+            ticker = Ticker.objects.create(name=f"TEST{size}", category=category, currency=currency)
+            DeclaredDividend.objects.create(ticker=ticker, value_per_share=Decimal("0.80"), payment_date=date(2024, 3, 15))
+            rows = [f"TEST{size},{day:02d}/01/2024,compra,10,100,Test Broker" for day in range(1, size)]
+            rows.append(f"TEST{size},{size:02d}/02/2024,venda,5,110,Test Broker")
+            path = tmp_path / f"trades_{size}.csv"
+            path.write_text("ticker,date,type,quantity,cost_price,broker\n" + "\n".join(rows) + "\n", encoding="utf-8")
+
+            with django_assert_max_num_queries(29) as captured:
+                call_command("import_fiis", str(path), stdout=StringIO(), stderr=StringIO())
+            counts.append(len(captured))
+
+        assert counts[0] == counts[1]
+        assert Inflow.objects.filter(ticker__name="TEST20").count() == 19
+        assert RealizedGain.objects.filter(ticker__name="TEST20").count() == 1
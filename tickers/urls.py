@@ -5,6 +5,7 @@ urlpatterns = [
     path("tickers/<str:category>/", views.TickerListView.as_view(), name="ticker_list"),
     path("tickers/<str:category>/create/", views.TickerCreateView.as_view(), name="ticker_create"),
     path("tickers/<str:category>/<int:pk>/details/", views.TickerDetailsView.as_view(), name="ticker_details"),
+    path("tickers/<str:category>/<int:pk>/transactions/", views.TickerTransactionsView.as_view(), name="ticker_transactions"),
     path("tickers/<str:category>/<int:pk>/update/", views.TickerUpdateView.as_view(), name="ticker_update"),
     path("tickers/<str:category>/<int:pk>/delete/", views.TickerDeleteView.as_view(), name="ticker_delete"),
 ]
\ No newline at end of file
@@ -1,16 +1,16 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Sum
-from django.shortcuts import get_object_or_404
-from itertools import chain
-from django.urls import reverse_lazy
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse, reverse_lazy
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from services.get_ticker_details import Get_ticker_data
 from .models import Ticker
 from app import metrics
+from app.transactions import TransactionFeed
 from app.utils.validators import validate_category_title
 from categories.models import Category
-from inflows.models import Inflow
-from outflows.models import Outflow
 from . import forms
 
 get_ticker_details = Get_ticker_data()
@@ -26,7 +26,14 @@ class TickerListView(LoginRequiredMixin, ListView):
         # Validate category parameter and get object or 404
         category_title = validate_category_title(self.kwargs.get("category"))
         category = get_object_or_404(Category, title=category_title)
-        return Ticker.objects.filter(category=category).select_related('category', 'currency')
+        return (
+            Ticker.objects
+            .filter(category=category)
+            .select_related('category', 'currency')
+            .annotate(position_quantity=Coalesce(Sum('positions__quantity'), 0))
+            # O GROUP BY da anotacao descarta o Meta.ordering
+            .order_by('name')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -67,6 +74,7 @@ class TickerCreateView(LoginRequiredMixin, CreateView):
 class TickerDetailsView(LoginRequiredMixin, DetailView):
     model = Ticker
     template_name = "ticker_details.html"
+    transactions_per_page = 20
 
     def get_queryset(self):
         return super().get_queryset().select_related('category', 'currency')
@@ -77,21 +85,13 @@ class TickerDetailsView(LoginRequiredMixin, DetailView):
         # Validate category parameter
         category_title = validate_category_title(self.kwargs.get("category"))
 
-        # Optimized queries with select_related
-        inflows = Inflow.objects.filter(ticker=self.object).select_related('broker')
-        outflows = Outflow.objects.filter(ticker=self.object).select_related('broker')
         ticker_details_api = get_ticker_details.get_ticker(code_ticker=self.object)
 
-        transactions = sorted(
-            chain(inflows, outflows),
-            key=lambda obj: obj.date,
-            reverse=True
-        )
+        # Historico paginado por cursor, combinado e ordenado no banco
+        feed = TransactionFeed(ticker=self.object, page_size=self.transactions_per_page)
 
         context["category_title"] = category_title
-        context["inflows"] = inflows
-        context["outflows"] = outflows
-        context["transactions"] = transactions
+        context["transactions"] = feed.page(after=self.request.GET.get("after"))
         context["ticker_metrics"] = metrics.get_ticker_metrics(self.object)
 
         # Handle API errors gracefully
@@ -107,6 +107,29 @@ class TickerDetailsView(LoginRequiredMixin, DetailView):
         return context
 
 
+class TickerTransactionsView(LoginRequiredMixin, View):
+    """
+    Endpoint do botao "Carregar mais" do detalhe do ticker.
+
+    Retorna apenas as linhas da pagina seguinte ao cursor 'after' e a URL da
+    proxima pagina no header X-Next-Page (vazio quando nao ha mais linhas).
+    """
+    transactions_per_page = TickerDetailsView.transactions_per_page
+
+    def get(self, request, category, pk):
+        category = validate_category_title(category)
+        ticker = get_object_or_404(Ticker, pk=pk, category__title=category)
+        feed = TransactionFeed(ticker=ticker, page_size=self.transactions_per_page)
+        page = feed.page(after=request.GET.get("after"))
+
+        response = render(request, "_ticker_transaction_rows.html", {"transactions": page})
+        next_page = ""
+        if page.has_next:
+            next_page = f"{reverse('ticker_transactions', kwargs={'category': category, 'pk': pk})}?after={page.next_cursor}"
+        response["X-Next-Page"] = next_page
+        return response
+
+
 class TickerUpdateView(LoginRequiredMixin, UpdateView):
     model = Ticker
     template_name = "ticker_update.html"